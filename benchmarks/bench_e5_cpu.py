@@ -0,0 +1,88 @@
+"""Benchmarks E5 encoding on CPU across backends (torch, ONNX, int8 ONNX).
+
+Reports single-item latency, batched throughput and parity with the reference
+embeddings (GPU when available, else fp32 PyTorch on CPU).
+
+Usage:
+    SNAPR_CACHE_DIR=.cache uv run --group bench python -m benchmarks.bench_e5_cpu
+"""
+
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.modal_services.e5_model_base import (
+    PARITY_TEXTS,
+    load_e5_model,
+    parity_report,
+)
+
+
+def make_passages(n: int) -> List[str]:
+    """Build n product-like passages by cycling the parity texts."""
+    return [
+        f"passage: {PARITY_TEXTS[i % len(PARITY_TEXTS)]} (variant {i})"
+        for i in range(n)
+    ]
+
+
+def bench_single(model: Any, passages: List[str]) -> Dict[str, float]:  # noqa: ANN401
+    """Encode one passage at a time and report latency percentiles in ms."""
+    model.encode(passages[:2])  # warm-up
+    timings = []
+    for passage in passages:
+        start = time.perf_counter()
+        model.encode([passage])
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(0.95 * (len(timings) - 1))],
+    }
+
+
+def bench_batched(
+    model: Any,  # noqa: ANN401
+    passages: List[str],
+    batch_size: int,
+) -> Dict[str, float]:
+    """Encode all passages in batches and report throughput."""
+    model.encode(passages[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    model.encode(passages, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return {"items_per_s": len(passages) / elapsed}
+
+
+def main() -> None:
+    """Run the benchmark and print one line per backend."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--single", type=int, default=100)
+    parser.add_argument("--batched", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    reference = load_e5_model("auto", "torch")
+    parity_passages = make_passages(64)
+    reference_emb = np.asarray(reference.encode(parity_passages))
+    print(f"Reference: torch on {reference.device}")
+
+    for backend in args.backends:
+        model = load_e5_model("cpu", backend)
+        parity = parity_report(reference_emb, model.encode(parity_passages))
+        single = bench_single(model, make_passages(args.single))
+        batched = bench_batched(model, make_passages(args.batched), args.batch_size)
+        print(
+            f"cpu/{backend:<9} "
+            f"single p50={single['p50_ms']:.1f}ms p95={single['p95_ms']:.1f}ms | "
+            f"batch={args.batch_size} {batched['items_per_s']:.0f} items/s | "
+            f"min cosine={parity['min_cosine']:.5f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmarks end-to-end pricing latency and throughput on the local backend.
+
+Runs `EnsemblePriceAgent` with every service in-process on CPU (stand-in
+models by default, `SNAPR_LOCAL_MODELS=real` for the downloaded ones) and
+compares per-item calls with batched calls.
+
+Usage:
+    uv run python -m benchmarks.bench_pipeline --items 200
+"""
+
+import argparse
+import logging
+import statistics
+import time
+from unittest.mock import patch
+
+from src.agents.base_agent import Agent
+from src.agents.ensemble_price_agent import EnsemblePriceAgent
+from src.modal_services.stand_ins import synthetic_catalog
+
+
+def main() -> None:
+    """Time single-item and batched pricing through the whole agent stack."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--separate-e5", action="store_true")
+    args = parser.parse_args()
+
+    descriptions, _ = synthetic_catalog(args.items, seed=1)
+    logging.getLogger().setLevel(logging.WARNING)  # Service logs per item
+
+    with patch.object(Agent, "log"):  # Keep agent logs out of the timings
+        start = time.perf_counter()
+        agent = EnsemblePriceAgent(
+            shared_embedding=not args.separate_e5, backend="local"
+        )
+        agent.price(descriptions[0])  # Loads models and coefficients
+        load_s = time.perf_counter() - start
+
+        timings = []
+        for description in descriptions:
+            start = time.perf_counter()
+            agent.price(description)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+
+        start = time.perf_counter()
+        for i in range(0, len(descriptions), args.batch_size):
+            agent.price_batch(descriptions[i : i + args.batch_size])
+        batch_s = time.perf_counter() - start
+
+    print(f"{args.items} items, load {load_s:.2f}s")
+    print(
+        f"single  p50={statistics.median(timings):.2f}ms "
+        f"p95={timings[int(0.95 * (len(timings) - 1))]:.2f}ms | "
+        f"{len(timings) / (sum(timings) / 1000):.0f} items/s"
+    )
+    print(f"batch   size={args.batch_size} | {args.items / batch_s:.0f} items/s")
+
+
+if __name__ == "__main__":
+    main()
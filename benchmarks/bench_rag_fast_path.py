@@ -0,0 +1,112 @@
+"""Evaluates the RAG kNN fast path against always asking the LLM.
+
+For each test item, the neighbours are retrieved once; the always-LLM price
+and the fast-path price (kNN when the neighbours agree, else the LLM price)
+are compared with the true price. Reports the LLM-call rate and the errors of
+both modes.
+
+Uses the local backend: stand-in models and a synthetic test set by default.
+For the notebook test set (held-out 20% of the `test` split, shuffled with
+seed 42 as in `05_ensemble_model.ipynb`), use the real models:
+
+    SNAPR_LOCAL_MODELS=real uv run --group bench --group notebook \\
+        python -m benchmarks.bench_rag_fast_path --dataset <hf-user>/pricer-data
+"""
+
+import argparse
+import logging
+import math
+import statistics
+from typing import List, Tuple
+
+import numpy as np
+
+from src.agents.backends import local_service
+from src.modal_services.rag_pricer import (
+    KNN_MAX_DISPERSION,
+    KNN_MIN_SIMILARITY,
+    knn_price,
+)
+from src.modal_services.stand_ins import synthetic_catalog
+from src.utils.text_utils import extract_price
+
+
+def notebook_test_set(dataset: str, items: int) -> Tuple[List[str], List[float]]:
+    """Descriptions and prices of the notebook's held-out test items."""
+    from datasets import load_dataset
+
+    test = load_dataset(dataset)["test"]
+    np.random.seed(42)
+    indices = list(range(len(test)))
+    np.random.shuffle(indices)
+    indices = indices[int(0.8 * len(indices)) :][:items]
+
+    descriptions, prices = [], []
+    for i in indices:
+        text = test[i]["text"]
+        text = text.replace("How much does this cost to the nearest dollar?\n\n", "")
+        descriptions.append(text.split("\n\nPrice is $")[0])
+        prices.append(test[i]["price"])
+    return descriptions, prices
+
+
+def errors(guesses: List[float], truths: List[float]) -> str:
+    """Mean absolute error and RMSLE."""
+    mae = statistics.mean(abs(g - t) for g, t in zip(guesses, truths))
+    rmsle = math.sqrt(
+        statistics.mean(
+            (math.log(max(g, 0) + 1) - math.log(t + 1)) ** 2
+            for g, t in zip(guesses, truths)
+        )
+    )
+    return f"MAE={mae:.2f} RMSLE={rmsle:.3f}"
+
+
+def main() -> None:
+    """Price every test item both ways and compare."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", help="Hugging Face dataset with a test split")
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--min-similarity", type=float, default=KNN_MIN_SIMILARITY)
+    parser.add_argument("--max-dispersion", type=float, default=KNN_MAX_DISPERSION)
+    args = parser.parse_args()
+
+    if args.dataset:
+        descriptions, truths = notebook_test_set(args.dataset, args.items)
+    else:
+        descriptions, truths = synthetic_catalog(args.items, seed=1)
+        truths = truths.tolist()
+    logging.getLogger().setLevel(logging.WARNING)  # Service logs per item
+
+    service = local_service("RAGPricer").instance
+    llm_prices, fast_prices, knn_hits = [], [], []
+    for description in descriptions:
+        embedding = service.normalize(service.embed(description))
+        documents, prices, similarities = service._find_similar_items(embedding)
+        messages = service._build_messages(
+            {"description": description}, documents, prices
+        )
+        llm = extract_price(service.complete(messages))
+        knn = knn_price(prices, similarities, args.min_similarity, args.max_dispersion)
+        llm_prices.append(llm)
+        fast_prices.append(llm if knn is None else knn)
+        if knn is not None:
+            knn_hits.append((knn, llm))
+
+    n = len(descriptions)
+    print(
+        f"{n} items | min similarity {args.min_similarity} | "
+        f"max dispersion {args.max_dispersion}"
+    )
+    print(
+        f"LLM calls  always={n}  fast={n - len(knn_hits)} ({1 - len(knn_hits) / n:.0%})"
+    )
+    print(f"always-LLM {errors(llm_prices, truths)}")
+    print(f"fast path  {errors(fast_prices, truths)}")
+    if knn_hits:
+        gap = statistics.mean(abs(knn - llm) for knn, llm in knn_hits)
+        print(f"kNN vs LLM on skipped calls: mean |diff|={gap:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Benchmarks RAG retrieval: ChromaDB query vs the memory-mapped flat index.
+
+Each engine runs in its own process so peak RSS is measured in isolation.
+Without `--chroma-dir`, a synthetic `price_items` collection is built first.
+
+Usage:
+    uv run --group bench python -m benchmarks.bench_vector_index --items 50000
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import statistics
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+
+from src.modal_services.vector_index import FlatVectorIndex
+
+COLLECTION_NAME = "price_items"
+DIM = 384
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (Linux)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def build_synthetic_chroma(path: str, n_items: int) -> None:
+    """Create a Chroma collection of random normalized embeddings."""
+    import chromadb
+
+    rng = np.random.default_rng(0)
+    client = chromadb.PersistentClient(path=path)
+    collection = client.create_collection(COLLECTION_NAME)
+    for start in range(0, n_items, 5000):
+        n = min(5000, n_items - start)
+        vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        collection.add(
+            ids=[str(i) for i in range(start, start + n)],
+            embeddings=vectors.tolist(),
+            documents=[f"Synthetic product {i}" for i in range(start, start + n)],
+            metadatas=[{"price": float(p)} for p in rng.uniform(1, 999, n)],
+        )
+
+
+def make_queries(n: int, seed: int = 1) -> np.ndarray:
+    """Random normalized query vectors."""
+    queries = np.random.default_rng(seed).standard_normal((n, DIM))
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def run_engine(engine: str, args: argparse.Namespace, out: mp.Queue) -> None:
+    """Load one engine, time single and batched queries, report RSS."""
+    base_rss = rss_mb()
+    queries = make_queries(args.queries)
+
+    if engine == "chroma":
+        import chromadb
+
+        client = chromadb.PersistentClient(path=args.chroma_dir)
+        collection = client.get_collection(COLLECTION_NAME)
+
+        def single(q: np.ndarray) -> None:
+            collection.query(query_embeddings=[q.astype(float).tolist()], n_results=5)
+
+        def batch(qs: np.ndarray) -> None:
+            collection.query(query_embeddings=qs.astype(float).tolist(), n_results=5)
+
+    else:
+        index = FlatVectorIndex.load(args.index_dir)
+
+        def single(q: np.ndarray) -> None:
+            index.query(q, k=5)
+
+        def batch(qs: np.ndarray) -> None:
+            index.query_batch(qs, k=5)
+
+    single(queries[0])  # warm-up
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        single(q)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    start = time.perf_counter()
+    batch(queries)
+    batch_s = time.perf_counter() - start
+
+    out.put(
+        {
+            "engine": engine,
+            "p50_ms": statistics.median(timings),
+            "p95_ms": timings[int(0.95 * (len(timings) - 1))],
+            "batch_qps": len(queries) / batch_s,
+            "rss_mb": rss_mb() - base_rss,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+    )
+
+
+def measure(engine: str, args: argparse.Namespace) -> Dict[str, float]:
+    """Run an engine in a fresh process and collect its results."""
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=run_engine, args=(engine, args, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def main() -> None:
+    """Prepare the data, then benchmark both engines."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chroma-dir", help="Existing Chroma directory to use")
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="snapr-bench-")
+    if not args.chroma_dir:
+        args.chroma_dir = os.path.join(workdir, "chroma")
+        build_synthetic_chroma(args.chroma_dir, args.items)
+
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=args.chroma_dir).get_collection(
+        COLLECTION_NAME
+    )
+    args.index_dir = os.path.join(workdir, "flat_index")
+    FlatVectorIndex.export_from_chroma(collection, args.index_dir, args.dtype)
+
+    print(f"{collection.count()} items, {args.queries} queries, k=5")
+    for engine in ("chroma", "flat"):
+        r = measure(engine, args)
+        print(
+            f"{r['engine']:<7} single p50={r['p50_ms']:.2f}ms "
+            f"p95={r['p95_ms']:.2f}ms | batch {r['batch_qps']:.0f} q/s | "
+            f"RSS +{r['rss_mb']:.0f}MB (peak {r['peak_rss_mb']:.0f}MB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Benchmarks XGBoost inference engines on CPU (sklearn, in-place, compiled).
+
+Trains a synthetic regressor shaped like the production one (E5-sized inputs)
+unless `--model` points at the real `xgboost_model.pkl`, then reports
+single-row latency and batched throughput per engine.
+
+Usage:
+    uv run --group bench python -m benchmarks.bench_xgb
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict
+
+import numpy as np
+
+from src.modal_services.tree_predictor import (
+    COMPILED_LIB_NAME,
+    CompiledPredictor,
+    InplacePredictor,
+    SklearnPredictor,
+    TreePredictor,
+)
+
+DIM = 384
+
+
+def train_synthetic(n_trees: int, depth: int) -> Any:  # noqa: ANN401
+    """Fit an `XGBRegressor` on random embedding-like rows."""
+    from xgboost import XGBRegressor
+
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((5000, DIM)).astype(np.float32)
+    y = np.abs(x[:, :8].sum(axis=1) * 50 + 200)
+    return XGBRegressor(n_estimators=n_trees, max_depth=depth).fit(x, y)
+
+
+def bench(predictor: TreePredictor, rows: np.ndarray, batch: int) -> Dict[str, float]:
+    """Single-row latency percentiles (ms) and batched rows per second."""
+    predictor.predict(rows[:1])  # warm-up
+    timings = []
+    for row in rows[:500]:
+        start = time.perf_counter()
+        predictor.predict(row)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    start = time.perf_counter()
+    for i in range(0, len(rows), batch):
+        predictor.predict(rows[i : i + batch])
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(0.95 * (len(timings) - 1))],
+        "batch_rps": len(rows) / (time.perf_counter() - start),
+    }
+
+
+def main() -> None:
+    """Build each engine and benchmark it on the same rows."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", help="Path to xgboost_model.pkl")
+    parser.add_argument("--trees", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.model:
+        import joblib
+
+        model = joblib.load(args.model)
+    else:
+        model = train_synthetic(args.trees, args.depth)
+    rows = np.random.default_rng(1).standard_normal((args.rows, DIM))
+
+    engines = {
+        "sklearn": SklearnPredictor(model),
+        "inplace": InplacePredictor(model.get_booster()),
+    }
+    try:
+        lib_path = os.path.join(tempfile.mkdtemp(), COMPILED_LIB_NAME)
+        start = time.perf_counter()
+        CompiledPredictor.build(model.get_booster(), lib_path)
+        print(f"compiled in {time.perf_counter() - start:.1f}s")
+        engines["compiled"] = CompiledPredictor(lib_path)
+    except Exception as e:
+        print(f"compiled engine skipped: {e}")
+
+    reference = engines["sklearn"].predict(rows[:100])
+    print(f"{args.rows} rows, batch size {args.batch_size}")
+    for name, predictor in engines.items():
+        drift = np.abs(predictor.predict(rows[:100]) - reference).max()
+        r = bench(predictor, rows, args.batch_size)
+        print(
+            f"{name:<9} single p50={r['p50_ms']:.3f}ms p95={r['p95_ms']:.3f}ms | "
+            f"batch {r['batch_rps']:.0f} rows/s | max diff {drift:.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
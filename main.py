@@ -6,10 +6,14 @@ import gradio as gr
 import uvicorn
 from fastapi import FastAPI
 
+from src.api import scans
 from src.ui.gradio_app import build_ui
 
 app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
 
+# Headless scan jobs, routed before Gradio takes over the root path
+app.include_router(scans.router)
+
 demo = build_ui()
 app = gr.mount_gradio_app(app, demo, path="")
 
@@ -0,0 +1,102 @@
+"""Execution backends for the pricing services.
+
+"modal" looks up the deployed Modal classes; "local" instantiates the same
+service logic in-process on CPU, with small stand-in models by default. Both
+return objects with Modal's call shape: `service.method.remote(*args)`.
+"""
+
+import importlib
+import os
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+import modal
+
+from src.modal_services.app_config import APP_NAME
+
+# "modal" (deployed services) or "local" (in-process, CPU)
+PRICING_BACKEND = os.getenv("SNAPR_PRICING_BACKEND", "modal")
+
+# Models used by the local backend: "stand-in" (synthetic, no downloads) or
+# "real" (the service's own setup(), resolving artifacts into SNAPR_CACHE_DIR)
+LOCAL_MODELS = os.getenv("SNAPR_LOCAL_MODELS", "stand-in")
+
+# Modal class name -> (module, plain service class it is built on)
+LOCAL_SERVICES: Dict[str, Tuple[str, str]] = {
+    "FTPricer": ("src.modal_services.ft_pricer", "FTService"),
+    "RAGPricer": ("src.modal_services.rag_pricer", "RAGService"),
+    "XGBPricer": ("src.modal_services.xgb_pricer", "XGBService"),
+    "E5Pricer": ("src.modal_services.e5_pricer", "E5Service"),
+    "EnsemblePricer": ("src.modal_services.ensemble_pricer", "EnsembleService"),
+}
+
+_instances: Dict[Tuple[str, str], "LocalService"] = {}
+_instances_lock = threading.Lock()
+
+
+class LocalMethod:
+    """A bound service method callable like a Modal method."""
+
+    def __init__(self, fn: Callable[..., Any]) -> None:
+        """Wrap a bound method of the in-process service."""
+        self._fn = fn
+
+    def remote(self, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        """Run the method in this process."""
+        return self._fn(*args, **kwargs)
+
+    local = remote
+
+
+class LocalService:
+    """In-process service instance exposing `.method.remote(...)`."""
+
+    def __init__(self, instance: Any) -> None:  # noqa: ANN401
+        """Wrap an already loaded service instance."""
+        self.instance = instance
+
+    def __getattr__(self, name: str) -> LocalMethod:
+        """Look up a service method."""
+        return LocalMethod(getattr(self.instance, name))
+
+
+def local_service(service_name: str, models: str = LOCAL_MODELS) -> LocalService:
+    """Return the process-wide in-process instance of a service, loading it once."""
+    key = (service_name, models)
+    with _instances_lock:
+        if key not in _instances:
+            module_name, class_name = LOCAL_SERVICES[service_name]
+            module = importlib.import_module(module_name)
+            instance = getattr(module, class_name)()
+            if models == "real":
+                instance.setup()
+            else:
+                from src.modal_services.stand_ins import apply_stand_ins
+
+                apply_stand_ins(service_name, instance)
+            _instances[key] = LocalService(instance)
+        return _instances[key]
+
+
+def connect(service_name: str, backend: str = PRICING_BACKEND) -> Any:  # noqa: ANN401
+    """Return a handle on a pricing service for the given backend."""
+    if backend == "modal":
+        return modal.Cls.from_name(APP_NAME, service_name)()
+    if backend == "local":
+        return local_service(service_name)
+    raise ValueError(f"Unknown pricing backend: {backend!r}")
+
+
+def model_versions(backend: str = PRICING_BACKEND) -> Dict[str, str]:
+    """Fingerprints of the models behind the services.
+
+    On Modal they are read by the EnsemblePricer, whose container a run already
+    keeps warm, rather than by a function of their own.
+    """
+    if backend == "modal":
+        return connect("EnsemblePricer", backend).model_versions.remote()
+    if LOCAL_MODELS == "real":
+        from src.modal_services.versions import collect_model_versions
+
+        return collect_model_versions()
+    return {model: "stand-in" for model in ("ft", "rag", "xgb", "ensemble")}
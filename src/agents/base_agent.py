@@ -1,6 +1,6 @@
 """Base class for Agents, providing colorful logging with Rich."""
 
-from src.config.logging_queue import log_queue
+from src.agents.run_context import current_run
 from src.utils.logger import console
 
 
@@ -15,7 +15,7 @@ class Agent:
         # Terminal (Rich)
         console.print(f"[{self.color} on black][{self.name}] {message}[/]")
 
-        # Gradio UI (HTML)
-        log_queue.put(
+        # Gradio UI (HTML), in the log of the run this agent is working for
+        current_run().log(
             f"<span style='color:{self.color}'>[{self.name}] {message}</span><br>"
         )
@@ -0,0 +1,88 @@
+"""Single-flight scans: identical requests share one run.
+
+Requests are keyed by their normalized category set and their deadline, so a
+request never gets a run degraded for a tighter deadline than its own. A
+request for a scan already in flight attaches to that run (its log channel and
+results); one arriving shortly after an identical run succeeded is served that
+run's log and results, within a short TTL. Only requests that start a run are
+admitted (demo limits), so shared and cached results do not count as runs.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.agents.run_context import RunContext
+from src.config.constants import SCAN_RESULT_TTL_S
+
+ScanKey = Tuple[str, ...]
+# Starts a run on the worker pool: (run, categories, deadline_s) -> Future
+RunStarter = Callable[[RunContext, List[str], Optional[float]], Future]
+
+
+def scan_key(categories: Iterable[str]) -> ScanKey:
+    """Normalized category set: trimmed, deduplicated and sorted."""
+    return tuple(sorted({c.strip() for c in categories}))
+
+
+@dataclass
+class SharedScan:
+    """One run and the time it finished (None: still in flight)."""
+
+    run: RunContext
+    started_at: float
+    finished_at: Optional[float] = None
+
+
+class ScanCoalescer:
+    """Starts a run per distinct category set, shared by identical requests."""
+
+    def __init__(self, start: RunStarter, ttl_s: float = SCAN_RESULT_TTL_S) -> None:
+        """Start runs with `start`; reuse finished ones for `ttl_s` seconds."""
+        self.start = start
+        self.ttl_s = ttl_s
+        self._scans: Dict[Tuple[ScanKey, Optional[float]], SharedScan] = {}
+        self._lock = threading.Lock()
+
+    def _finish(self, scan: SharedScan) -> None:
+        scan.finished_at = time.monotonic()
+
+    def _reusable(self, scan: SharedScan, now: float) -> bool:
+        if scan.finished_at is None:
+            return True
+        return scan.run.error is None and now - scan.finished_at < self.ttl_s
+
+    def submit(
+        self,
+        categories: List[str],
+        deadline_s: Optional[float] = None,
+        admit: Callable[[], bool] = lambda: True,
+    ) -> Tuple[Optional[RunContext], str, float]:
+        """Return (run, source, age) for the requested scan.
+
+        `source` is "joined" (attached to a run in flight), "cached" (a run
+        that finished less than the TTL ago) or "new"; only runs with the same
+        deadline are shared. A new run is started
+        only if `admit()` allows it; otherwise the run is None. `age` is the
+        seconds since the shared run started.
+        """
+        key = (scan_key(categories), deadline_s)
+        with self._lock:
+            now = time.monotonic()
+            self._scans = {
+                k: scan for k, scan in self._scans.items() if self._reusable(scan, now)
+            }
+            scan = self._scans.get(key)
+            if scan is not None:
+                source = "joined" if scan.finished_at is None else "cached"
+                return scan.run, source, now - scan.started_at
+            if not admit():
+                return None, "new", 0.0
+
+            scan = SharedScan(RunContext(), now)
+            self._scans[key] = scan
+        future = self.start(scan.run, list(key[0]), deadline_s)
+        future.add_done_callback(lambda _: self._finish(scan))
+        return scan.run, "new", 0.0
@@ -0,0 +1,132 @@
+"""Client-side deadlines and hedged requests for the remote pricing calls.
+
+`.remote()` blocks until the container answers, however long a cold start or
+a stuck input takes. `RemoteCaller` runs the call in a worker thread and stops
+waiting at the service's deadline; optionally, once the call has outlasted the
+service's recent p95 latency, it sends a duplicate request and keeps the first
+answer. Within a run that has a deadline, no call waits past it. An abandoned
+call keeps running in its thread until Modal returns.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Optional, Set
+
+from src.agents.run_context import current_run
+from src.config.constants import (
+    HEDGE_MIN_SAMPLES,
+    HEDGE_REQUESTS,
+    LATENCY_WINDOW,
+    MODEL_DEADLINES_S,
+)
+
+# Shared by every caller; sized for a few concurrent runs with hedges
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="snapr-remote")
+
+
+class DeadlineExceeded(TimeoutError):
+    """A remote call did not answer within its deadline."""
+
+
+class RemoteCaller:
+    """Calls one service's methods with a deadline and optional hedging."""
+
+    def __init__(
+        self,
+        service: str,
+        deadline_s: Optional[float] = None,
+        hedge: bool = HEDGE_REQUESTS,
+    ) -> None:
+        """Use the service's MODEL_DEADLINES_S entry unless `deadline_s` is set."""
+        self.service = service
+        self.deadline_s = deadline_s or MODEL_DEADLINES_S.get(service)
+        self.hedge = hedge
+        self.hedged = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._last_answer: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def p95(self) -> Optional[float]:
+        """95th percentile of recent successful latencies (None: too few)."""
+        with self._lock:
+            samples = list(self._latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return statistics.quantiles(samples, n=20)[18]
+
+    def _record(self, elapsed: float) -> None:
+        with self._lock:
+            self._latencies.append(elapsed)
+        self.touch()
+
+    def touch(self) -> None:
+        """Note that the service just answered (e.g. a warm-up call)."""
+        self._last_answer = time.monotonic()
+
+    def is_warm(self, window_s: float) -> bool:
+        """True if the service answered within the last `window_s` seconds."""
+        last = self._last_answer
+        return last is not None and time.monotonic() - last < window_s
+
+    def __call__(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,  # noqa: ANN401
+        deadline_s: Optional[float] = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> Any:  # noqa: ANN401
+        """Return `fn(*args, **kwargs)`, or raise DeadlineExceeded.
+
+        `deadline_s` overrides the caller's deadline for this call; either is
+        cut to the time left before the run's deadline.
+        """
+        deadline_s = deadline_s or self.deadline_s
+        remaining = current_run().remaining()
+        if remaining is not None:
+            if remaining <= 0:
+                raise DeadlineExceeded(
+                    f"run deadline passed before calling {self.service}"
+                )
+            deadline_s = min(deadline_s or remaining, remaining)
+        hedge_after = self.p95() if self.hedge else None
+        start = time.monotonic()
+        if deadline_s is None and hedge_after is None:
+            result = fn(*args, **kwargs)
+            self._record(time.monotonic() - start)
+            return result
+
+        pending: Set[Future] = {_executor.submit(fn, *args, **kwargs)}
+        error: Optional[BaseException] = None
+        while True:
+            now = time.monotonic()
+            waits = []
+            if deadline_s is not None:
+                waits.append(start + deadline_s - now)
+            if hedge_after is not None:
+                waits.append(start + hedge_after - now)
+            done, pending = wait(
+                pending,
+                timeout=max(min(waits), 0) if waits else None,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                if future.exception() is None:
+                    self._record(time.monotonic() - start)
+                    return future.result()
+                error = future.exception()
+
+            now = time.monotonic()
+            if hedge_after is not None and now >= start + hedge_after:
+                # Duplicate the request once the call is slower than usual
+                pending.add(_executor.submit(fn, *args, **kwargs))
+                self.hedged += 1
+                hedge_after = None
+            elif not pending:
+                raise error
+            elif deadline_s is not None and now >= start + deadline_s:
+                raise DeadlineExceeded(
+                    f"{self.service} did not answer within {deadline_s:.1f}s"
+                )
@@ -74,7 +74,12 @@ class DealScannerAgent(Agent):
             self.log("No memory file found. Assuming first run")
             return {"seen_urls": [], "memory": []}
 
-    def fetch_deals(self, categories: List[str]) -> List[ScrapedDeal]:
+    def fetch_deals(
+        self,
+        categories: List[str],
+        max_per_feed: Optional[int] = None,
+        fetch_details: bool = True,
+    ) -> List[ScrapedDeal]:
         """Fetch new RSS deals not present in memory."""
         self.log("is fetching deals from RSS feed")
 
@@ -84,7 +89,7 @@ class DealScannerAgent(Agent):
 
         # Fetch all deals and filter out seen ones
         try:
-            scraped = ScrapedDeal.fetch(categories)
+            scraped = ScrapedDeal.fetch(categories, max_per_feed, fetch_details)
             result = [deal for deal in scraped if deal.url not in seen_urls]
             overlap = [deal for deal in scraped if deal.url in seen_urls]
             self.log(f"{len(overlap)} deals skipped")
@@ -102,10 +107,19 @@ class DealScannerAgent(Agent):
             + "\n\n".join(deal.describe() for deal in scraped)
         )
 
-    def scan(self, categories: List[str]) -> Optional[OpportunitiesCollection]:
-        """Return top 5 new deals."""
+    def scan(
+        self,
+        categories: List[str],
+        max_per_feed: Optional[int] = None,
+        fetch_details: bool = True,
+    ) -> Optional[OpportunitiesCollection]:
+        """Return top 5 new deals.
+
+        `max_per_feed` and `fetch_details` trade deal coverage and detail for
+        speed (see ScrapedDeal.fetch).
+        """
         # Step 1: Fetch new deals not already in memory
-        scraped = self.fetch_deals(categories)
+        scraped = self.fetch_deals(categories, max_per_feed, fetch_details)
         if not scraped:
             self.log("❌ found no new deals to process ")
             return None
@@ -0,0 +1,82 @@
+"""E5PriceAgent calls the co-located E5 service on Modal.
+
+Gets RAG and XGBoost prices from a single embedding of the description.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from src.agents.backends import PRICING_BACKEND, connect
+from src.agents.base_agent import Agent
+from src.agents.deadlines import RemoteCaller
+from src.agents.run_context import current_run
+
+
+class E5PriceAgent(Agent):
+    """Agent for the shared-embedding RAG + XGBoost pricer."""
+
+    name = "E5Price Agent"
+    color = "blue"
+
+    def __init__(self, backend: str = PRICING_BACKEND) -> None:
+        """Initialize the agent ("modal" or in-process "local" backend)."""
+        self.backend = backend
+        self.e5 = connect("E5Pricer", backend)
+        self.call = RemoteCaller("e5")
+        self.log("is ready")
+
+    def _log_first_call(self) -> None:
+        if self.backend == "modal" and current_run().first_call(self.name):
+            self.log(
+                "📡 Connecting to Modal — loading embedding model, XGBoost "
+                "and ChromaDB..."
+            )
+
+    def price(self, description: str) -> Tuple[float, float]:
+        """Call the remote E5Pricer and return (RAG, XGB) estimates."""
+        self._log_first_call()
+        try:
+            result = self.call(self.e5.price.remote, description)
+            return result["rag"], result["xgb"]
+        except Exception as e:
+            self.log(f"[ERROR] Remote E5Pricer failed: {e}")
+            raise RuntimeError("E5PriceAgent failed to get prices from Modal.") from e
+
+    def price_models(self, description: str, models: Sequence[str]) -> Dict[str, float]:
+        """Return only the requested estimates ("xgb", "rag") for a description."""
+        self._log_first_call()
+        try:
+            return self.call(self.e5.price.remote, description, list(models))
+        except Exception as e:
+            self.log(f"[ERROR] Remote E5Pricer failed: {e}")
+            raise RuntimeError("E5PriceAgent failed to get prices from Modal.") from e
+
+    def price_with_embedding(
+        self, description: str, models: Sequence[str]
+    ) -> Tuple[np.ndarray, Dict[str, float]]:
+        """Return the normalized E5 embedding and the requested estimates.
+
+        One call serves both; the service memoizes the embedding, so a later
+        `price_models` call for the other estimates does not re-encode.
+        """
+        self._log_first_call()
+        try:
+            result = self.call(self.e5.price.remote, description, list(models), True)
+        except Exception as e:
+            self.log(f"[ERROR] Remote E5Pricer failed: {e}")
+            raise RuntimeError("E5PriceAgent failed to get an embedding.") from e
+        return np.asarray(result.pop("embedding"), dtype=np.float32), result
+
+    def price_batch(self, descriptions: List[str]) -> List[Tuple[float, float]]:
+        """Return (RAG, XGB) estimates for many descriptions in one call."""
+        try:
+            results = self.e5.price_batch.remote(descriptions)
+            return [(result["rag"], result["xgb"]) for result in results]
+        except Exception as e:
+            self.log(f"[ERROR] Remote E5Pricer batch failed: {e}")
+            raise RuntimeError("E5PriceAgent failed to get prices from Modal.") from e
+
+    def warmup(self) -> None:
+        """Start a E5Pricer container and load its models (no prediction)."""
+        self.e5.warmup.remote()
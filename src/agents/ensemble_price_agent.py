@@ -1,57 +1,592 @@
-"""Agent calling a remote ensemble model on Modal.
+"""Agent combining FT, RAG and XGB predictions into a final price.
 
-Computes final price from multiple predictions.
+The linear ensemble runs in-process by default; the remote EnsemblePricer on
+Modal remains available as a backend. Estimates can be kept in a persistent
+cache keyed by the normalized description and the model versions, with a
+semantic tier matching reworded descriptions by E5 embedding similarity.
 """
 
-import modal
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
+
+from src.agents.backends import PRICING_BACKEND, connect, model_versions
 from src.agents.base_agent import Agent
+from src.agents.e5_price_agent import E5PriceAgent
 from src.agents.ft_price_agent import FTPriceAgent
 from src.agents.rag_price_agent import RAGPriceAgent
+from src.agents.run_context import current_run, submit_in_run
 from src.agents.xgb_price_agent import XGBoostPriceAgent
-from src.config.constants import CURRENCY
-from src.modal_services.app_config import APP_NAME
+from src.config.constants import (
+    CASCADE_BAND,
+    CASCADE_BAND_RATIO,
+    CASCADE_PRICING,
+    CURRENCY,
+    DEAL_THRESHOLD,
+    ENSEMBLE_BACKEND,
+    ENSEMBLE_COEFFICIENTS_FILE,
+    MODEL_VERSIONS_TTL_S,
+    SEMANTIC_CACHE_THRESHOLD,
+    SHARE_E5_EMBEDDING,
+    USE_SEMANTIC_CACHE,
+)
+from src.models.ensemble_model import LinearEnsemble
+from src.utils.estimate_cache import CachedEstimate, EstimateCache
+
+# Memoized when the model versions cannot be read, until they are read again
+_VERSIONS_UNAVAILABLE: Dict[str, str] = {}
 
 
 class EnsemblePriceAgent(Agent):
     """Agent that aggregates FT, RAG, and XGB predictions.
 
-    Sends them to the remote EnsemblePricer on Modal.
+    Evaluates the linear ensemble locally (`ensemble_backend="local"`) or
+    sends the predictions to the EnsemblePricer service ("remote").
     """
 
     name = "EnsemblePrice Agent"
     color = "magenta"
 
-    def __init__(self) -> None:
-        """Initialize the agent."""
-        self._modal_called = False
-        self.ft_agent = FTPriceAgent()
-        self.rag_agent = RAGPriceAgent()
-        self.xgb_agent = XGBoostPriceAgent()
-        remote_ensemble = modal.Cls.from_name(APP_NAME, "EnsemblePricer")
-        self.ensemble = remote_ensemble()
+    def __init__(
+        self,
+        shared_embedding: bool = SHARE_E5_EMBEDDING,
+        ensemble_backend: str = ENSEMBLE_BACKEND,
+        backend: str = PRICING_BACKEND,
+        cascade: bool = CASCADE_PRICING,
+        estimate_cache: Optional[EstimateCache] = None,
+        semantic_cache: bool = USE_SEMANTIC_CACHE,
+    ) -> None:
+        """Initialize the agent.
+
+        With `shared_embedding`, RAG and XGB come from one E5 container that
+        embeds each description once; otherwise each has its own container.
+        `backend` runs every pricing service on Modal or in-process ("local").
+        With `cascade`, FT and RAG are skipped for deals that XGB alone places
+        clearly above or below DEAL_THRESHOLD (see `price`), provided the
+        ensemble ships an XGB-only subset model.
+        With `estimate_cache`, estimates are reused across runs until the
+        entry expires or a model version changes. With `semantic_cache` (and a
+        shared embedding), a description whose E5 embedding is within
+        SEMANTIC_CACHE_THRESHOLD (cosine) of a cached one reuses its estimate.
+        """
+        self.shared_embedding = shared_embedding
+        self.ensemble_backend = ensemble_backend
+        self.backend = backend
+        self.cascade = cascade
+        self._cascade_warned = False
+        self.estimate_cache = estimate_cache
+        self.semantic_cache = semantic_cache and shared_embedding
+        # Latest model versions and when they were read, shared by all runs
+        self._versions: Tuple[Dict[str, str], float] = ({}, float("-inf"))
+        self._versions_lock = threading.Lock()
+        self.combiner: Optional[LinearEnsemble] = None
+        self.ft_agent = FTPriceAgent(backend)
+        if shared_embedding:
+            self.e5_agent = E5PriceAgent(backend)
+        else:
+            self.rag_agent = RAGPriceAgent(backend)
+            self.xgb_agent = XGBoostPriceAgent(backend)
+        self.ensemble = connect("EnsemblePricer", backend)
+        # Base model calls of one estimate run in parallel
+        self._pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="ensemble")
         self.log("is ready")
 
-    def price(self, description: str) -> float:
-        """Get individual predictions and pass them to the ensemble model."""
-        ft_pred = self.ft_agent.price(description)
-        rag_pred = self.rag_agent.price(description)
-        xgb_pred = self.xgb_agent.price(description)
+    def _price_e5(self, description: str) -> Tuple[float, float]:
+        """Return (RAG, XGB) predictions, sharing one embedding when enabled."""
+        if self.shared_embedding:
+            return self.e5_agent.price(description)
+        return self.rag_agent.price(description), self.xgb_agent.price(description)
+
+    def _price_xgb(self, description: str) -> float:
+        """Cheap XGB-only estimate (the embedding is reused by a later RAG call)."""
+        if self.shared_embedding:
+            return self.e5_agent.price_models(description, ["xgb"])["xgb"]
+        return self.xgb_agent.price(description)
+
+    def _price_rag(self, description: str) -> float:
+        if self.shared_embedding:
+            return self.e5_agent.price_models(description, ["rag"])["rag"]
+        return self.rag_agent.price(description)
+
+    def _price_e5_batch(self, descriptions: List[str]) -> List[Tuple[float, float]]:
+        """Batched `_price_e5`."""
+        if self.shared_embedding:
+            return self.e5_agent.price_batch(descriptions)
+        return list(
+            zip(
+                self.rag_agent.price_batch(descriptions),
+                self.xgb_agent.price_batch(descriptions),
+            )
+        )
+
+    def _model_versions(self) -> Optional[Dict[str, str]]:
+        """Model fingerprints, read again once older than MODEL_VERSIONS_TTL_S.
+
+        Concurrent runs share one copy instead of each reading their own, and
+        wait for a single read when it expires (None: unavailable).
+        """
+        with self._versions_lock:
+            versions, read_at = self._versions
+            if time.monotonic() - read_at >= MODEL_VERSIONS_TTL_S:
+                try:
+                    versions = model_versions(self.backend)
+                except Exception as e:
+                    self.log(f"[WARNING] Model versions unavailable: {e}")
+                    versions = _VERSIONS_UNAVAILABLE
+                self._versions = (versions, time.monotonic())
+        return None if versions is _VERSIONS_UNAVAILABLE else versions
+
+    def _load_combiner(self) -> LinearEnsemble:
+        """Load cached coefficients, fetching them from Modal if missing or stale.
 
-        if not self._modal_called:
+        The file cache only holds coefficients of the deployed model, never
+        those of the local backend's stand-in ensemble. It records the
+        ensemble artifact's fingerprint, so a retrained or redeployed model
+        is fetched again, also by an agent that outlives the redeploy. The
+        file is used as-is when the fingerprint cannot be read (offline).
+        """
+        cached = self.backend == "modal"
+        versions = self._model_versions() if cached else None
+        version = versions.get("ensemble") if versions else None
+        if self.combiner is not None and (
+            version is None or self.combiner.version == version
+        ):
+            return self.combiner
+
+        self.combiner = None
+        if cached and os.path.exists(ENSEMBLE_COEFFICIENTS_FILE):
+            stored = LinearEnsemble.load(ENSEMBLE_COEFFICIENTS_FILE)
+            if version is None or stored.version == version:
+                self.combiner = stored
+        if self.combiner is None:
+            if cached:
+                self.log("📡 Fetching linear model coefficients from Modal...")
+            coefficients = self.ensemble.coefficients.remote()
+            self.combiner = LinearEnsemble.from_dict(coefficients)
+            if cached:
+                self.combiner.version = version
+                self.combiner.save(ENSEMBLE_COEFFICIENTS_FILE)
+        return self.combiner
+
+    def _combine(self, ft_pred: float, rag_pred: float, xgb_pred: float) -> float:
+        """Apply the ensemble with the configured backend."""
+        if self.ensemble_backend == "local":
+            return self._load_combiner().predict(ft_pred, rag_pred, xgb_pred)
+
+        if self.backend == "modal" and current_run().first_call(self.name):
             self.log("📡 Connecting to Modal — Loading trained linear model...")
-            self._modal_called = True
+        return self.ensemble.price.remote(ft_pred, rag_pred, xgb_pred)
+
+    # ---------- Warm-up ----------
+
+    def _warmup_targets(self) -> Dict[str, Callable[[], object]]:
+        """Services a run will call, with a cheap call that loads each one."""
+        targets: Dict[str, Callable[[], object]] = {"FTPricer": self.ft_agent.warmup}
+        if self.shared_embedding:
+            targets["E5Pricer"] = self.e5_agent.warmup
+        else:
+            targets["RAGPricer"] = self.rag_agent.warmup
+            targets["XGBPricer"] = self.xgb_agent.warmup
+        if self.ensemble_backend == "local":
+            targets["EnsemblePricer"] = self._load_combiner  # Coefficients only
+        else:
+            targets["EnsemblePricer"] = self._warm_ensemble
+        return targets
+
+    def _warm_ensemble(self) -> None:
+        """Load the EnsemblePricer, then read the model versions it serves."""
+        self.ensemble.warmup.remote()
+        self._model_versions()
+
+    def _warm(self, service: str, call: Callable[[], object]) -> Optional[float]:
+        start = time.perf_counter()
+        try:
+            call()
+        except Exception as e:
+            self.log(
+                f"⚠️ {service} warm-up failed after "
+                f"{time.perf_counter() - start:.1f}s: {e}"
+            )
+            return None
+        elapsed = time.perf_counter() - start
+        self.log(f"🔥 {service} warm in {elapsed:.1f}s")
+        return elapsed
 
+    def warmup(self) -> Dict[str, Optional[float]]:
+        """Load every pricing service in parallel, before the first deal.
+
+        Returns the seconds each service took to answer (None if it failed).
+        """
+        targets = self._warmup_targets()
+        with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+            futures = {
+                service: pool.submit(self._warm, service, call)
+                for service, call in targets.items()
+            }
+        return {service: future.result() for service, future in futures.items()}
+
+    # ---------- Cascade ----------
+
+    @property
+    def cascade_stats(self) -> Dict[str, int]:
+        """Cascade decisions of the current run."""
+        return current_run().cascade_stats
+
+    @property
+    def missing_predictions(self) -> Dict[str, int]:
+        """Base predictions left out of estimates in the current run."""
+        return current_run().missing_predictions
+
+    def reset_cascade_stats(self) -> None:
+        """Start counting cascade decisions for a new run."""
+        current_run().reset_cascade_stats()
+
+    @staticmethod
+    def in_uncertainty_band(xgb_pred: float, listed_price: float) -> bool:
+        """True if the XGB discount is too close to the threshold to decide."""
+        band = max(CASCADE_BAND, CASCADE_BAND_RATIO * xgb_pred)
+        return abs(xgb_pred - listed_price - DEAL_THRESHOLD) <= band
+
+    def _combine_partial(
+        self,
+        ft_pred: Optional[float],
+        rag_pred: Optional[float],
+        xgb_pred: Optional[float],
+    ) -> float:
+        """Estimate from the available predictions with the subset model.
+
+        Raises when the ensemble has no subset model for them (an artifact
+        trained before they were shipped): imputing the missing predictions
+        would skew the estimate, so the deal is left unpriced instead.
+        """
+        if self.ensemble_backend != "local":
+            return self.ensemble.price_partial.remote(ft_pred, rag_pred, xgb_pred)
+        combiner = self._load_combiner()
+        if not combiner.has_subset_model(ft_pred, rag_pred, xgb_pred):
+            missing = [
+                name.upper()
+                for name, pred in zip(
+                    ("ft", "rag", "xgb"), (ft_pred, rag_pred, xgb_pred)
+                )
+                if pred is None
+            ]
+            raise RuntimeError(f"No fallback model without {'/'.join(missing)}")
+        return combiner.predict_partial(ft_pred, rag_pred, xgb_pred)
+
+    def _cascade_enabled(self) -> bool:
+        """Cascade only when an XGB-only subset model can price skipped deals."""
+        if not self.cascade:
+            return False
+        try:
+            ready = self._load_combiner().has_subset_model(xgb=0.0)
+        except Exception:
+            ready = False
+        if not ready and not self._cascade_warned:
+            self._cascade_warned = True
+            self.log("⚠️ No XGB-only fallback model — cascade pricing disabled")
+        return ready
+
+    def _price_cascade(
+        self,
+        description: str,
+        listed_price: float,
+        known: Dict[str, Optional[float]],
+    ) -> Dict[str, Optional[float]]:
+        """Run XGB first (unless `known`); call FT and RAG only inside the band."""
+        preds = (
+            dict(known) if "xgb" in known else self._price_models(description, ["xgb"])
+        )
+        self.cascade_stats["priced"] += 1
+        xgb_pred = preds["xgb"]
+
+        if xgb_pred is None or self.in_uncertainty_band(xgb_pred, listed_price):
+            preds.update(self._price_models(description, ["ft", "rag"]))
+            return preds
+
+        self.cascade_stats["ft_skipped"] += 1
+        self.cascade_stats["rag_skipped"] += 1
         self.log(
-            f"Predictions — FT={CURRENCY}{ft_pred}, "
-            f"RAG={CURRENCY}{rag_pred}, "
-            f"XGB={CURRENCY}{xgb_pred}"
+            f"⏩ XGB={CURRENCY}{xgb_pred} vs listed {CURRENCY}{listed_price:.2f} "
+            "is a clear call — skipping FT and RAG"
+        )
+        return {"ft": None, "rag": None, "xgb": xgb_pred}
+
+    # ---------- Estimate cache ----------
+
+    def _cache_versions(self) -> Optional[str]:
+        """Model versions the cache entries are keyed on (None: cache off)."""
+        if self.estimate_cache is None:
+            return None
+        versions = self._model_versions()
+        return None if versions is None else json.dumps(versions, sort_keys=True)
+
+    def _reusable(self, entry: CachedEstimate, listed_price: Optional[float]) -> bool:
+        """A cascade (XGB-only) entry is reused only while it is still a clear call."""
+        if entry.ft is not None:
+            return True
+        return (
+            listed_price is not None
+            and self._cascade_enabled()
+            and not self.in_uncertainty_band(entry.xgb, listed_price)
         )
 
+    @property
+    def cache_stats(self) -> Dict[str, int]:
+        """Cache lookups of the current run."""
+        return current_run().cache_stats
+
+    @property
+    def similarities(self) -> List[float]:
+        """Best cosine similarity of each semantic lookup in the current run."""
+        return current_run().similarities
+
+    def reset_cache_stats(self) -> None:
+        """Start counting cache lookups for a new run."""
+        current_run().reset_cache_stats()
+
+    def cache_report(self) -> Optional[str]:
+        """One-line summary of this run's cache hit rate and similarities."""
+        lookups = sum(self.cache_stats.values())
+        if not lookups:
+            return None
+        hits = self.cache_stats["exact_hits"] + self.cache_stats["semantic_hits"]
+        report = (
+            f"{hits}/{lookups} estimates from cache "
+            f"({self.cache_stats['exact_hits']} exact, "
+            f"{self.cache_stats['semantic_hits']} semantic)"
+        )
+        if self.similarities:
+            report += (
+                f" — nearest-neighbour similarity min={min(self.similarities):.3f}, "
+                f"median={statistics.median(self.similarities):.3f}, "
+                f"max={max(self.similarities):.3f}"
+            )
+        return report
+
+    def _cached(
+        self, description: str, listed_price: Optional[float]
+    ) -> Optional[CachedEstimate]:
+        versions = self._cache_versions()
+        if versions is None:
+            return None
+        try:
+            entry = self.estimate_cache.get(description, versions)
+        except Exception as e:
+            self.log(f"[WARNING] Estimate cache read failed: {e}")
+            return None
+        return entry if entry and self._reusable(entry, listed_price) else None
+
+    def _embedding(
+        self, description: str
+    ) -> Tuple[Optional[np.ndarray], Dict[str, Optional[float]]]:
+        """E5 embedding for the semantic tier, with the XGB estimate made from it.
+
+        Both come from one E5 call, so a lookup that misses costs no extra
+        round trip: the estimate reuses the XGB prediction (None: unavailable).
+        """
+        if not self.semantic_cache or self._cache_versions() is None:
+            return None, {}
+        models = [m for m in ("xgb",) if m not in current_run().skipped_models]
+        try:
+            embedding, preds = self.e5_agent.price_with_embedding(description, models)
+        except Exception as e:
+            self.log(f"[WARNING] Semantic cache lookup skipped: {e}")
+            return None, {}
+        return embedding, preds
+
+    def _similar(
+        self, embedding: np.ndarray, listed_price: Optional[float]
+    ) -> Optional[CachedEstimate]:
+        """Estimate of the nearest cached description, if close enough."""
+        try:
+            entry, similarity = self.estimate_cache.nearest(
+                embedding, self._cache_versions()
+            )
+        except Exception as e:
+            self.log(f"[WARNING] Estimate cache read failed: {e}")
+            return None
+        if entry is None:
+            return None
+        self.similarities.append(similarity)
+        if similarity < SEMANTIC_CACHE_THRESHOLD:
+            return None
+        if not self._reusable(entry, listed_price):
+            return None
+        self.log(f"🔎 Similar description in cache (cosine {similarity:.3f})")
+        return entry
+
+    def _store(
+        self,
+        description: str,
+        entry: CachedEstimate,
+        embedding: Optional[np.ndarray] = None,
+    ) -> None:
+        versions = self._cache_versions()
+        if versions is None:
+            return
+        try:
+            self.estimate_cache.put(description, versions, entry, embedding)
+        except Exception as e:
+            self.log(f"[WARNING] Estimate cache write failed: {e}")
+
+    # ---------- Pricing ----------
+
+    def _price_models(
+        self, description: str, models: Sequence[str]
+    ) -> Dict[str, Optional[float]]:
+        """Predict the requested base models ("ft", "rag", "xgb") in parallel.
+
+        A model that fails or misses its deadline is reported and left out
+        (None), so the ensemble can still estimate from the others; so is one
+        the run skips to meet its own deadline.
+        """
+        skipped = current_run().skipped_models
+        preds: Dict[str, Optional[float]] = {m: None for m in models if m in skipped}
+        models = [m for m in models if m not in skipped]
+        calls: Dict[Tuple[str, ...], Callable[[str], Tuple[float, ...]]] = {}
+        if "ft" in models:
+            calls[("ft",)] = lambda d: (self.ft_agent.price(d),)
+        if "rag" in models and "xgb" in models and self.shared_embedding:
+            calls[("rag", "xgb")] = self._price_e5  # One E5 call for both
+        else:
+            if "rag" in models:
+                calls[("rag",)] = lambda d: (self._price_rag(d),)
+            if "xgb" in models:
+                calls[("xgb",)] = lambda d: (self._price_xgb(d),)
+
+        futures = {
+            names: submit_in_run(self._pool, call, description)
+            for names, call in calls.items()
+        }
+        for names, future in futures.items():
+            try:
+                preds.update(zip(names, future.result()))
+            except Exception as e:
+                reason = e.__cause__ or e
+                self.log(
+                    f"⚠️ {'/'.join(names).upper()} unavailable ({reason}) "
+                    "— estimating without it"
+                )
+                for name in names:
+                    current_run().count_missing(name)
+                    preds[name] = None
+        return preds
+
+    def _estimate(
+        self,
+        description: str,
+        listed_price: Optional[float],
+        known: Optional[Dict[str, Optional[float]]] = None,
+    ) -> Tuple[CachedEstimate, bool]:
+        """Get individual predictions and pass them to the ensemble model.
+
+        Predictions already `known` (from the semantic lookup) are not asked
+        again. Returns the entry and whether it is complete enough to cache (no
+        base prediction was lost to an error or a deadline).
+        """
+        known = known or {}
+        if listed_price is not None and self._cascade_enabled():
+            preds = self._price_cascade(description, listed_price, known)
+            skipped = preds["ft"] is None and preds["rag"] is None
+            complete = preds["xgb"] is not None and (
+                skipped or None not in preds.values()
+            )
+        else:
+            missing = [m for m in ("ft", "rag", "xgb") if m not in known]
+            preds = {**known, **self._price_models(description, missing)}
+            complete = None not in preds.values()
+
+        if all(pred is None for pred in preds.values()):
+            raise RuntimeError("EnsemblePriceAgent failed to get final price.")
+        ft_pred, rag_pred, xgb_pred = preds["ft"], preds["rag"], preds["xgb"]
+        if ft_pred is not None or rag_pred is not None:
+            self.log(
+                f"Predictions — FT={CURRENCY}{ft_pred}, "
+                f"RAG={CURRENCY}{rag_pred}, "
+                f"XGB={CURRENCY}{xgb_pred}"
+            )
+
+        try:
+            if None in preds.values():
+                result = self._combine_partial(ft_pred, rag_pred, xgb_pred)
+            else:
+                result = self._combine(ft_pred, rag_pred, xgb_pred)
+        except Exception as e:
+            self.log(
+                f"[ERROR] {self.ensemble_backend.capitalize()} EnsemblePricer "
+                f"failed: {e}"
+            )
+            raise RuntimeError("EnsemblePriceAgent failed to get final price.") from e
+        return CachedEstimate(ft_pred, rag_pred, xgb_pred, result), complete
+
+    def _lookup(
+        self, description: str, listed_price: Optional[float]
+    ) -> Tuple[
+        Optional[CachedEstimate], Optional[np.ndarray], Dict[str, Optional[float]]
+    ]:
+        """Exact, then semantic cache lookup.
+
+        Also returns the embedding used and the predictions made with it.
+        """
+        entry = self._cached(description, listed_price)
+        embedding, known = None, {}
+        if entry is not None:
+            self.cache_stats["exact_hits"] += 1
+        else:
+            embedding, known = self._embedding(description)
+            if embedding is not None:
+                entry = self._similar(embedding, listed_price)
+                if entry is not None:
+                    self.cache_stats["semantic_hits"] += 1
+
+        if entry is not None:
+            self.log(f"💾 Cached estimate: {CURRENCY}{entry.estimate:.2f}")
+        elif self.estimate_cache is not None:
+            self.cache_stats["misses"] += 1
+        return entry, embedding, known
+
+    def cached_price(
+        self, description: str, listed_price: Optional[float] = None
+    ) -> Optional[float]:
+        """Return the cached estimate without pricing the deal (None: miss)."""
+        entry, _, _ = self._lookup(description, listed_price)
+        return None if entry is None else entry.estimate
+
+    def price(self, description: str, listed_price: Optional[float] = None) -> float:
+        """Return the final estimate, from the cache or from the models.
+
+        In cascade mode, and when the listed price is known, XGB runs first and
+        the expensive FT and RAG calls are made only for borderline deals.
+        """
+        entry, embedding, known = self._lookup(description, listed_price)
+        if entry is not None:
+            return entry.estimate
+
+        entry, complete = self._estimate(description, listed_price, known)
+        self.log(f"Final estimate: {CURRENCY}{entry.estimate:.2f}")
+        if complete:
+            self._store(description, entry, embedding)
+        return entry.estimate
+
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """Price many descriptions with one batched call per service."""
+        ft_preds = self.ft_agent.price_batch(descriptions)
+        e5_preds = self._price_e5_batch(descriptions)
+        rows = [[ft, rag, xgb] for ft, (rag, xgb) in zip(ft_preds, e5_preds)]
+
         try:
-            result = self.ensemble.price.remote(ft_pred, rag_pred, xgb_pred)
-            self.log(f"Final estimate: {CURRENCY}{result:.2f}")
-            return result
+            if self.ensemble_backend == "local":
+                results = self._load_combiner().predict_batch(rows)
+            else:
+                results = self.ensemble.price_batch.remote(rows)
+            self.log(f"Final estimates for {len(results)} items")
+            return results
         except Exception as e:
-            self.log(f"[ERROR] Remote EnsemblePricer failed: {e}")
+            self.log(f"[ERROR] EnsemblePricer batch failed: {e}")
             raise RuntimeError("EnsemblePriceAgent failed to get final price.") from e
@@ -3,10 +3,13 @@
 Predicts item prices from descriptions.
 """
 
-import modal
+from typing import List
 
+from src.agents.backends import PRICING_BACKEND, connect
 from src.agents.base_agent import Agent
-from src.modal_services.app_config import APP_NAME
+from src.agents.deadlines import RemoteCaller
+from src.agents.run_context import current_run
+from src.config.constants import FT_WARM_WINDOW_S
 
 
 class FTPriceAgent(Agent):
@@ -15,24 +18,40 @@ class FTPriceAgent(Agent):
     name = "FTPrice Agent"
     color = "red"
 
-    def __init__(self) -> None:
-        """Initialize agent with Modal class instance."""
-        self._modal_called = False
-        ft_pricer = modal.Cls.from_name(APP_NAME, "FTPricer")
-        self.ftpricer = ft_pricer()
+    def __init__(self, backend: str = PRICING_BACKEND) -> None:
+        """Initialize agent with the FTPricer service ("modal" or "local")."""
+        self.backend = backend
+        self.ftpricer = connect("FTPricer", backend)
+        self.call = RemoteCaller("ft")
         self.log("is ready")
 
     def price(self, description: str) -> float:
         """Remote call to estimate price, with error handling."""
-        if not self._modal_called:
+        if self.backend == "modal" and current_run().first_call(self.name):
             self.log("🧠 Calling Modal's fine-tuned LLM...")
-            self._modal_called = True
         try:
-            result = self.ftpricer.price.remote(
-                description
+            result = self.call(
+                self.ftpricer.price.remote, description
             )  # 2nd API call: run price method
             # self.log(f"predicting ${result:.2f} ✅")
             return result
         except Exception as e:
             self.log(f"[ERROR] Remote pricing failed: {e}")
             raise RuntimeError("FTPriceAgent failed to get price from Modal.") from e
+
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """Estimate prices for many descriptions in one FTPricer call."""
+        try:
+            return self.ftpricer.price_batch.remote(descriptions)
+        except Exception as e:
+            self.log(f"[ERROR] Remote pricing batch failed: {e}")
+            raise RuntimeError("FTPriceAgent failed to get price from Modal.") from e
+
+    def warmup(self) -> None:
+        """Start a FTPricer container and load its models (no prediction)."""
+        self.ftpricer.warmup.remote()
+        self.call.touch()
+
+    def is_warm(self) -> bool:
+        """True if FTPricer answered recently enough to still have a container."""
+        return self.call.is_warm(FT_WARM_WINDOW_S)
@@ -1,53 +1,120 @@
 """Executes planning agent and streams logs/results.
 
-Integrates with the Gradio UI.
+Integrates with the Gradio UI. Each run has its own run context (log channel
+and accepted deals), and runs execute concurrently on a bounded worker pool.
+Identical scans requested at about the same time share one run.
 """
 
-import queue
 import threading
 import time
 import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any, Generator, List, Optional, Tuple, Union
 
 import gradio as gr
 
-from src.agents.planning_agent import PlanningAgent
+from src.agents.coalescer import ScanCoalescer
+from src.agents.registry import planning_agents
+from src.agents.run_context import DEAL_ACCEPTED, RunContext, run_scope
 from src.config.constants import (
     DEALS_FILE,
     IS_DEMO_VERSION,
     MAX_CATEGORY_SELECTION,
+    MAX_CONCURRENT_RUNS,
+    MAX_LOG_LINES,
+    RUN_DEADLINE_S,
+    STREAM_COALESCE_S,
+    STREAM_IDLE_TIMEOUT_S,
+    WARMUP_INTERVAL_S,
+    WARMUP_ON_UI_LOAD,
 )
-from src.config.logging_queue import log_queue
+from src.deals.structured_deals import Opportunity
 from src.ui.formatting import format_deals_table, html_for
 from src.utils.cleanup import delete_if_old
+from src.utils.log_channel import LogChannel
+from src.utils.logger import console
 from src.utils.state_manager import can_run_app, get_state, update_state
 
+# Shared by every session; a run submitted while all workers are busy waits
+run_pool = ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_RUNS, thread_name_prefix="snapr-run"
+)
 
-def run_pipeline(log_queue: queue.Queue, selected_categories: List[str]) -> None:
-    """Runs the planning agent pipeline and stores accepted deals."""
-    try:
-        delete_if_old(DEALS_FILE)
-        agent = PlanningAgent()
-        results = agent.plan(selected_categories)
-
-        global accepted_deals
-        accepted_deals = [
-            [
-                opp.product_description,
-                f"${opp.price:.2f}",
-                f"${opp.estimate:.2f}",
-                f"${opp.discount:.2f}",
-                opp.url,
-            ]
-            for opp in results
+
+def deal_rows(deals: List[Opportunity]) -> List[List[str]]:
+    """Table rows (description, price, estimate, discount, URL) for the UI."""
+    return [
+        [
+            opp.product_description,
+            f"${opp.price:.2f}",
+            f"${opp.estimate:.2f}",
+            f"${opp.discount:.2f}",
+            opp.url,
         ]
+        for opp in deals
+    ]
+
 
+def run_pipeline(
+    run: RunContext,
+    selected_categories: List[str],
+    deadline_s: Optional[float] = None,
+) -> None:
+    """Runs the planning agent pipeline; logs and accepted deals go to `run`.
+
+    The agents are shared across runs; the run's own state lives in its run
+    context. A failed run drops the shared agents so the next one rebuilds
+    them. `deadline_s` counts from the start of the run, agent set-up included.
+    """
+    agent = None
+    started = time.monotonic()
+    with run_scope(run):
+        try:
+            delete_if_old(DEALS_FILE)
+            LogChannel.prune_spills()
+            agent = planning_agents.get()
+            if deadline_s is not None:
+                deadline_s -= time.monotonic() - started
+            agent.plan(selected_categories, deadline_s=deadline_s)
+
+        except Exception as e:
+            if agent is not None:
+                planning_agents.invalidate(agent)
+            run.log(
+                f"<span style='color:red'>❌ Error during pipeline execution: "
+                f"{str(e)}</span>"
+            )
+            run.log(f"<pre>{traceback.format_exc()}</pre>")
+            run.error = str(e)  # Once the error lines are in the log
+
+
+_warmup_lock = threading.Lock()
+_last_warmup = float("-inf")
+
+
+def warm_up_agents() -> None:
+    """Runs the planning agent's warm-up."""
+    try:
+        planning_agents.get().warmup()
     except Exception as e:
-        log_queue.put(
-            f"<span style='color:red'>❌ Error during pipeline execution: "
-            f"{str(e)}</span>"
-        )
-        log_queue.put(f"<pre>{traceback.format_exc()}</pre>")
+        console.print(f"[bold yellow]⚠️ Warm-up failed:[/] {e}")
+
+
+def start_warmup() -> None:
+    """Warms the pricing services in the background (UI load, category change).
+
+    Skipped when disabled, when the app cannot run (demo limit reached) and
+    within WARMUP_INTERVAL_S of the previous warm-up.
+    """
+    global _last_warmup
+    if not WARMUP_ON_UI_LOAD or not can_run_app()[0]:
+        return
+    with _warmup_lock:
+        now = time.monotonic()
+        if now - _last_warmup < WARMUP_INTERVAL_S:
+            return
+        _last_warmup = now
+    threading.Thread(target=warm_up_agents, daemon=True).start()
 
 
 def validate_categories(
@@ -97,48 +164,137 @@ def initial_ui_update(
     return html_for(log_data), format_deals_table([]), disable_btn, status_msg
 
 
-def run_pipeline_threaded(
+class StreamView:
+    """What one session shows: re-rendered only when the content changed.
+
+    `update` returns the new HTML of a component that changed and a no-op
+    `gr.update()` for one that did not, so unchanged logs or tables are
+    neither rendered again nor sent to the browser.
+    """
+
+    def __init__(self, log_data: List[str], run: RunContext) -> None:
+        """Render from `log_data` (appended to) and the run's accepted deals."""
+        self.log_data = log_data
+        self.run = run
+        self._logs_html: Optional[str] = None
+        self._deals_html: Optional[str] = None
+        self._logs_dirty = True
+        self._deals_shown = -1
+
+    def add_logs(self, lines: List[str]) -> None:
+        """Append new log lines, keeping only the MAX_LOG_LINES rendered."""
+        if lines:
+            self.log_data.extend(lines)
+            del self.log_data[:-MAX_LOG_LINES]
+            self._logs_dirty = True
+
+    @property
+    def changed(self) -> bool:
+        """True if either component needs re-rendering."""
+        return self._logs_dirty or self._deals_shown != len(self.run.results)
+
+    def logs_html(self) -> str:
+        """The log panel, rendered once per change."""
+        if self._logs_dirty or self._logs_html is None:
+            self._logs_html = html_for(self.log_data)
+            self._logs_dirty = False
+        return self._logs_html
+
+    def deals_html(self) -> str:
+        """The deals table, rendered once per newly accepted deal."""
+        if self._deals_shown != len(self.run.results):
+            self._deals_shown = len(self.run.results)
+            self._deals_html = format_deals_table(deal_rows(self.run.results))
+        return self._deals_html
+
+    def update(self) -> Tuple[Any, Any]:
+        """(logs, deals) for a streaming frame: new HTML or no-op updates."""
+        logs = self.logs_html() if self._logs_dirty else gr.update()
+        deals = (
+            self.deals_html()
+            if self._deals_shown != len(self.run.results)
+            else gr.update()
+        )
+        return logs, deals
+
+
+def start_run(
+    run: RunContext,
     selected_categories: List[str],
+    deadline_s: Optional[float] = None,
+) -> Future:
+    """Queue a run on the run pool; its log channel is closed when it ends."""
+    future = run_pool.submit(run_pipeline, run, selected_categories, deadline_s)
+    future.add_done_callback(lambda _: run.logs.close())
+    return future
+
+
+scan_coalescer = ScanCoalescer(start_run)
+
+
+def stream_run(
+    run: RunContext,
     log_data: List[str],
     status_msg: str,
     enable_btn: Any,  # noqa: ANN401
 ) -> Generator[Tuple[str, str, Any, str], None, None]:
-    """Runs pipeline in background thread with log streaming.
-
-    Yields UI updates until completion.
+    """Streams a run's logs and deals to the UI, from its first line.
 
+    Waits on the run's log channel (no polling), coalesces bursts of lines
+    (an accepted deal ends the burst, so it is shown at once) and yields a UI
+    update only when the logs or deals changed.
     """
-    thread = threading.Thread(
-        target=run_pipeline, args=(log_queue, selected_categories)
-    )
-    thread.start()
+    subscription = run.logs.subscribe()
+    view = StreamView(log_data, run)
 
     disable_btn = gr.update(
         interactive=False, elem_classes=["run-button", "btn-disabled"]
     )
 
-    while thread.is_alive() or not log_queue.empty():
-        while not log_queue.empty():
-            log_msg = log_queue.get()
-            log_data.append(log_msg)
-            yield (
-                html_for(log_data),
-                format_deals_table(accepted_deals),
-                disable_btn,
-                status_msg,
-            )
+    done = False
+    while not done:
+        items, done = subscription.next_burst(
+            STREAM_IDLE_TIMEOUT_S, STREAM_COALESCE_S, urgent=(DEAL_ACCEPTED,)
+        )
+        view.add_logs([item for item in items if isinstance(item, str)])
+        if view.changed and not done:
+            yield (*view.update(), disable_btn, status_msg)
 
-        if thread.is_alive():
-            time.sleep(0.2)
-            yield (
-                html_for(log_data),
-                format_deals_table(accepted_deals),
-                disable_btn,
-                status_msg,
-            )
+    if run.logs.dropped:
+        view.add_logs([f"⚠️ {run.logs.dropped} log lines dropped (log over capacity)"])
 
-    # Final UI update after thread finishes
-    yield html_for(log_data), format_deals_table(accepted_deals), enable_btn, status_msg
+    # Final UI update after the run finishes
+    yield view.logs_html(), view.deals_html(), enable_btn, status_msg
+
+
+def run_pipeline_threaded(
+    selected_categories: List[str],
+    log_data: List[str],
+    status_msg: str,
+    enable_btn: Any,  # noqa: ANN401
+    deadline_s: Optional[float] = None,
+) -> Generator[Tuple[str, str, Any, str], None, None]:
+    """Runs pipeline on the run pool with log streaming.
+
+    Yields UI updates until completion.
+
+    """
+    run = RunContext()
+    start_run(run, selected_categories, deadline_s)
+    yield from stream_run(run, log_data, status_msg, enable_btn)
+
+
+def shared_scan_status(source: str, age_s: float, run: RunContext) -> str:
+    """Status message for a request served by a run it did not start."""
+    if source == "joined":
+        message = "🔗 Joined an identical scan already in progress"
+    else:
+        message = f"♻️ Showing an identical scan from {age_s:.0f}s ago"
+    if run.degradations:
+        message += f" (⏳ to meet its deadline: {'; '.join(run.degradations)})"
+    if IS_DEMO_VERSION:
+        message += " (not counted as a demo run)"
+    return message
 
 
 def handle_pipeline_error(
@@ -158,14 +314,16 @@ def handle_pipeline_error(
 
 def run_and_stream_logs(
     selected_categories: Union[str, List[str]],
+    deadline_s: Optional[float] = RUN_DEADLINE_S,
 ) -> Generator[Tuple[str, str, bool, str], None, None]:
     """Runs pipeline in a thread, streaming logs and results to the UI.
 
-    Returns HTML logs, deal table, button state, and status message.
+    Returns HTML logs, deal table, button state, and status message. With
+    `deadline_s`, the run returns the deals it could price in that time.
     """
-    global accepted_deals
-    accepted_deals = []
     log_data = []
+    if isinstance(selected_categories, str):
+        selected_categories = [selected_categories]
 
     # Step 1: Validate categories
     is_valid, error_msg = validate_categories(selected_categories)
@@ -173,9 +331,17 @@ def run_and_stream_logs(
         yield None, None, gr.update(interactive=True), error_msg
         return
 
-    # Step 2: Check demo restrictions
-    can_run, error_msg, status_msg = check_demo_restrictions()
-    if not can_run:
+    # Step 2: Share an identical scan in flight or just finished; otherwise
+    # check demo restrictions and start a new run
+    admission = {}
+
+    def admit() -> bool:
+        can_run, admission["error"], admission["status"] = check_demo_restrictions()
+        return can_run
+
+    run, source, age_s = scan_coalescer.submit(selected_categories, deadline_s, admit)
+    if run is None:
+        error_msg = admission["error"]
         yield (
             html_for([error_msg]),
             format_deals_table([]),
@@ -183,16 +349,18 @@ def run_and_stream_logs(
             error_msg,
         )
         return
+    if source == "new":
+        status_msg = admission["status"]
+    else:
+        status_msg = shared_scan_status(source, age_s, run)
 
     # Step 3: Initial UI update showing we're starting
     enable_btn = gr.update(interactive=True, elem_classes=["run-button"])
     yield initial_ui_update(log_data, status_msg)
 
     try:
-        # Step 4: Run the pipeline in a thread
-        yield from run_pipeline_threaded(
-            selected_categories, log_data, status_msg, enable_btn
-        )
+        # Step 4: Stream the run's logs and deals
+        yield from stream_run(run, log_data, status_msg, enable_btn)
 
     except Exception as e:
         yield handle_pipeline_error(e, log_data, enable_btn, status_msg)
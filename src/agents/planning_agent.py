@@ -1,15 +1,31 @@
-"""PlanningAgent coordinates deal scanning and enrichment."""
+"""PlanningAgent coordinates deal scanning and enrichment.
+
+A run can be given a deadline: the planner then scans and prices within the
+time left, degrading step by step (see the BUDGET_* constants), and returns
+the deals priced by the deadline along with the degradations it applied.
+"""
 
 import json
-from typing import List
+from typing import Any, Callable, Dict, List, Optional
 
 from rich import print_json
 
 from src.agents.base_agent import Agent
 from src.agents.deal_scanner_agent import DealScannerAgent
 from src.agents.ensemble_price_agent import EnsemblePriceAgent
-from src.config.constants import CURRENCY, DEAL_THRESHOLD
+from src.agents.run_context import current_run
+from src.config.constants import (
+    BUDGET_CACHE_ONLY_S,
+    BUDGET_COLD_FT_S,
+    BUDGET_DEALS_PER_FEED,
+    BUDGET_FEWER_DEALS_S,
+    BUDGET_SKIP_DETAILS_S,
+    CURRENCY,
+    DEAL_THRESHOLD,
+    USE_ESTIMATE_CACHE,
+)
 from src.deals.structured_deals import OpportunitiesCollection, Opportunity
+from src.utils.estimate_cache import EstimateCache
 from src.utils.logger import console
 from src.utils.memory_utils import save_opportunities_to_memory
 
@@ -25,25 +41,90 @@ class PlanningAgent(Agent):
         self.log("🧠 Let’s wake up the agents — time to sniff out some sweet deals!")
         self.log("is ready")
         self.scanner = DealScannerAgent()
-        self.ensemble = EnsemblePriceAgent()
+        self.ensemble = EnsemblePriceAgent(
+            estimate_cache=EstimateCache.default() if USE_ESTIMATE_CACHE else None
+        )
         self.log("🚀 All AI Agents are caffeinated, calibrated, and ready to hustle..")
 
+    def warmup(self) -> Dict[str, Optional[float]]:
+        """Start the pricing services so the next run does not wait for them."""
+        self.log("🔥 Warming up the pricing services...")
+        timings = self.ensemble.warmup()
+        ready = sum(elapsed is not None for elapsed in timings.values())
+        self.log(f"🔥 {ready}/{len(timings)} pricing services ready")
+        return timings
+
+    def _scan_options(self) -> Dict[str, Any]:
+        """Scraping settings for the time left: fewer deals, no deal pages."""
+        run = current_run()
+        remaining = run.remaining()
+        options: Dict[str, Any] = {"max_per_feed": None, "fetch_details": True}
+        if remaining is None:
+            return options
+        if remaining < BUDGET_FEWER_DEALS_S:
+            options["max_per_feed"] = BUDGET_DEALS_PER_FEED
+            run.degrade(f"scanned at most {BUDGET_DEALS_PER_FEED} deals per feed")
+        if remaining < BUDGET_SKIP_DETAILS_S:
+            options["fetch_details"] = False
+            run.degrade("described deals from the RSS summaries, not their pages")
+        return options
+
     def scan_deals(self, categories: List[str]) -> List[Opportunity]:
         """Scans deals and returns GPT-processed opportunities."""
-        result = self.scanner.scan(categories)
+        result = self.scanner.scan(categories, **self._scan_options())
         if result is None:
             self.log("❌ No valid deals found.")
             return []
         return result.opportunities
 
-    def enrich(self, opportunity: Opportunity) -> Opportunity:
-        """Add estimated market price and discount to an opportunity."""
-        estimate = self.ensemble.price(opportunity.product_description)
-        discount = round(estimate - opportunity.price, 2)
+    def _skip_cold_models(self) -> None:
+        """Leave FT out of the run when a cold start would not fit the deadline."""
+        run = current_run()
+        remaining = run.remaining()
+        if (
+            remaining is not None
+            and remaining < BUDGET_COLD_FT_S
+            and not self.ensemble.ft_agent.is_warm()
+        ):
+            run.skipped_models.add("ft")
+            run.degrade("skipped the fine-tuned LLM (cold)")
+
+    def _set_estimate(self, opportunity: Opportunity, estimate: float) -> Opportunity:
         opportunity.estimate = estimate
-        opportunity.discount = discount
+        opportunity.discount = round(estimate - opportunity.price, 2)
         return opportunity
 
+    def enrich(self, opportunity: Opportunity) -> Opportunity:
+        """Add estimated market price and discount to an opportunity."""
+        estimate = self.ensemble.price(
+            opportunity.product_description, listed_price=opportunity.price
+        )
+        return self._set_estimate(opportunity, estimate)
+
+    def enrich_in_time(self, opportunity: Opportunity) -> Optional[Opportunity]:
+        """Enrich within the run's deadline; None if it cannot be priced in time.
+
+        Close to the deadline, only cached estimates are used.
+        """
+        run = current_run()
+        remaining = run.remaining()
+        if remaining is None:
+            return self.enrich(opportunity)
+        if remaining < BUDGET_CACHE_ONLY_S:
+            run.degrade("priced the last deals from the estimate cache only")
+            estimate = self.ensemble.cached_price(
+                opportunity.product_description, listed_price=opportunity.price
+            )
+            return (
+                None if estimate is None else self._set_estimate(opportunity, estimate)
+            )
+        try:
+            return self.enrich(opportunity)
+        except RuntimeError:
+            if not run.expired():
+                raise
+            return None
+
     def _log_result(self, idx: int, opportunity: Opportunity) -> None:
         """Logs if a deal was accepted or rejected.
 
@@ -61,6 +142,38 @@ class PlanningAgent(Agent):
                 f"{CURRENCY}{opportunity.discount:.2f}"
             )
 
+    def _log_cascade_stats(self) -> None:
+        """Report how many expensive model calls the cascade saved this run."""
+        stats = self.ensemble.cascade_stats
+        if self.ensemble.cascade and stats["priced"]:
+            self.log(
+                f"⏩ Cascade skipped FT {stats['ft_skipped']}/{stats['priced']} "
+                f"and RAG {stats['rag_skipped']}/{stats['priced']} times"
+            )
+
+    def _log_missing_predictions(self) -> None:
+        """Report the base predictions that failed or missed their deadline."""
+        missing = self.ensemble.missing_predictions
+        if missing:
+            counts = ", ".join(f"{model} {n}" for model, n in sorted(missing.items()))
+            self.log(f"⏱️ Estimates made without: {counts}")
+
+    def _log_degradations(self) -> None:
+        """Report what the run gave up to meet its deadline."""
+        run = current_run()
+        if run.deadline is None:
+            return
+        if run.degradations:
+            self.log(f"⏳ To meet the deadline: {'; '.join(run.degradations)}")
+        else:
+            self.log("⏳ Finished within the deadline, nothing left out")
+
+    def _log_cache_stats(self) -> None:
+        """Report this run's estimate cache hit rate and similarities."""
+        report = self.ensemble.cache_report()
+        if report:
+            self.log(f"💾 {report}")
+
     def _report_summary(self, enriched: List[Opportunity]) -> None:
         """Display a summary of accepted opportunities after enrichment."""
         if not enriched:
@@ -75,8 +188,21 @@ class PlanningAgent(Agent):
                     f"  URL: {opp.url}\n"
                 )
 
-    def plan(self, categories: List[str]) -> List[Opportunity]:
-        """Full pipeline: scan → enrich → filter → save."""
+    def plan(
+        self,
+        categories: List[str],
+        deadline_s: Optional[float] = None,
+        on_deal: Optional[Callable[[Opportunity], None]] = None,
+    ) -> List[Opportunity]:
+        """Full pipeline: scan → enrich → filter → save.
+
+        Each deal is added to the run context's results, and passed to
+        `on_deal`, as soon as it passes the threshold. With `deadline_s`,
+        returns the deals priced within that many seconds; the degradations
+        applied are logged and kept in the run context.
+        """
+        run = current_run()
+        run.start_deadline(deadline_s)
         self.log(
             "************** SCANNING INITIATED — HUNTING JUICY DEALS...**************"
         )
@@ -84,6 +210,7 @@ class PlanningAgent(Agent):
         deals = self.scan_deals(categories)
         if not deals:
             self.log("❌ No deals found from scanner.")
+            self._log_degradations()
             return []
         print_json(
             data=json.loads(
@@ -96,12 +223,29 @@ class PlanningAgent(Agent):
         )
 
         enriched = []
+        self.ensemble.reset_cascade_stats()
+        self.ensemble.reset_cache_stats()
+        self._skip_cold_models()
+        unpriced = 0
         for idx, deal in enumerate(deals, start=1):
-            opportunity = self.enrich(deal)
+            opportunity = self.enrich_in_time(deal)
+            if opportunity is None:
+                unpriced += 1
+                self.log(f"⏳ Deal #{idx} not priced before the deadline")
+                continue
             self._log_result(idx, opportunity)
             if opportunity.discount >= DEAL_THRESHOLD:
                 enriched.append(opportunity)
+                run.add_result(opportunity)
+                if on_deal is not None:
+                    on_deal(opportunity)
+        if unpriced:
+            run.degrade(f"left {unpriced}/{len(deals)} deals unpriced")
 
+        self._log_cascade_stats()
+        self._log_missing_predictions()
+        self._log_cache_stats()
+        self._log_degradations()
         self.log(
             "************** ENRICHMENT COMPLETE — SAVING OPPORTUNITIES **************"
         )
@@ -1,9 +1,11 @@
 """Handles the integration of RAG model with Modal to predict item prices."""
 
-import modal
+from typing import List
 
+from src.agents.backends import PRICING_BACKEND, connect
 from src.agents.base_agent import Agent
-from src.modal_services.app_config import APP_NAME
+from src.agents.deadlines import RemoteCaller
+from src.agents.run_context import current_run
 
 
 class RAGPriceAgent(Agent):
@@ -15,22 +17,33 @@ class RAGPriceAgent(Agent):
     name = "RAGPrice Agent"
     color = "blue"
 
-    def __init__(self) -> None:
-        """Initialize the agent."""
-        self._modal_called = False
-        remote_rag_pricer = modal.Cls.from_name(APP_NAME, "RAGPricer")
-        self.rag = remote_rag_pricer()
+    def __init__(self, backend: str = PRICING_BACKEND) -> None:
+        """Initialize the agent ("modal" or in-process "local" backend)."""
+        self.backend = backend
+        self.rag = connect("RAGPricer", backend)
+        self.call = RemoteCaller("rag")
         self.log("is ready")
 
     def price(self, description: str) -> float:
         """Call the remote RAGPricer to estimate price."""
-        if not self._modal_called:
+        if self.backend == "modal" and current_run().first_call(self.name):
             self.log("📡 Connecting to Modal — loading embedding model and ChromaDB...")
-            self._modal_called = True
         try:
-            result = self.rag.price.remote(description)
+            result = self.call(self.rag.price.remote, description)
             # self.log(f"predicting ${result:.2f} ✅")
             return result
         except Exception as e:
             self.log(f"[ERROR] Remote RAGPricer failed: {e}")
             raise RuntimeError("RAGPriceAgent failed to get price from Modal.") from e
+
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """Estimate prices for many descriptions in one RAGPricer call."""
+        try:
+            return self.rag.price_batch.remote(descriptions)
+        except Exception as e:
+            self.log(f"[ERROR] Remote RAGPricer batch failed: {e}")
+            raise RuntimeError("RAGPriceAgent failed to get price from Modal.") from e
+
+    def warmup(self) -> None:
+        """Start a RAGPricer container and load its models (no prediction)."""
+        self.rag.warmup.remote()
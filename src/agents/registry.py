@@ -0,0 +1,48 @@
+"""Process-wide registry of warm agents.
+
+Building the `PlanningAgent` creates the scanner, the ensemble and every
+pricing sub-agent with its Modal handle. The registry builds them once, on
+first use, and hands the same instance to every run. Modal resolves the
+handles lazily, so a broken one only shows up when a run uses it: a failed run
+invalidates the instance and the next run rebuilds it.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+from src.agents.planning_agent import PlanningAgent
+from src.utils.logger import console
+
+
+class AgentRegistry:
+    """Builds an agent once and shares it until invalidated."""
+
+    def __init__(self, factory: Callable[[], PlanningAgent] = PlanningAgent) -> None:
+        """Use `factory` to (re)build the agent."""
+        self.factory = factory
+        self._agent: Optional[PlanningAgent] = None
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self) -> PlanningAgent:
+        """The shared agent, built on first call."""
+        with self._lock:
+            if self._agent is None:
+                start = time.perf_counter()
+                self._agent = self.factory()
+                self.builds += 1
+                console.print(
+                    f"[Agent Registry] Agents built in "
+                    f"{time.perf_counter() - start:.2f}s (build #{self.builds})"
+                )
+            return self._agent
+
+    def invalidate(self, agent: PlanningAgent) -> None:
+        """Drop `agent`, unless another run has already replaced it."""
+        with self._lock:
+            if agent is self._agent:
+                self._agent = None
+
+
+planning_agents = AgentRegistry()
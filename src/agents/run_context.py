@@ -0,0 +1,140 @@
+"""Per-run state, kept apart from the agents shared across runs.
+
+Agents and their Modal handles are built once per process and reused (see
+`registry`); whatever belongs to a single pipeline run (its log channel and
+accepted deals, first-call notices, cascade and cache counters, the deadline)
+lives in a `RunContext`. The active context is held in a context variable, so
+each run thread sees its own.
+"""
+
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from src.deals.structured_deals import Opportunity
+from src.utils.log_channel import LogChannel
+
+
+def _cascade_counters() -> Dict[str, int]:
+    return {"priced": 0, "ft_skipped": 0, "rag_skipped": 0}
+
+
+def _cache_counters() -> Dict[str, int]:
+    return {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+
+# Put on a run's log channel with each accepted deal, so it is shown at once
+DEAL_ACCEPTED = object()
+
+
+@dataclass
+class RunContext:
+    """State of one pipeline run."""
+
+    # UI log lines of this run (None: not shown anywhere, e.g. outside a run)
+    logs: Optional[LogChannel] = field(default_factory=LogChannel.for_run)
+    # Deals accepted so far, in the order they passed the threshold
+    results: List[Opportunity] = field(default_factory=list)
+    # Why the run failed (None: it did not)
+    error: Optional[str] = None
+    # Services already announced in this run's log ("Connecting to Modal...")
+    announced: Set[str] = field(default_factory=set)
+    cascade_stats: Dict[str, int] = field(default_factory=_cascade_counters)
+    cache_stats: Dict[str, int] = field(default_factory=_cache_counters)
+    # Best cosine similarity of each semantic cache lookup
+    similarities: List[float] = field(default_factory=list)
+    # Base predictions left out of an estimate (failed or past the deadline)
+    missing_predictions: Dict[str, int] = field(default_factory=dict)
+    # Monotonic time the run must answer by (None: no deadline)
+    deadline: Optional[float] = None
+    # What the run gave up to meet its deadline, in the order applied
+    degradations: List[str] = field(default_factory=list)
+    # Base models left out for the whole run ("ft", "rag", "xgb")
+    skipped_models: Set[str] = field(default_factory=set)
+
+    def log(self, line: str) -> None:
+        """Send a line to this run's log channel."""
+        if self.logs is not None:
+            self.logs.put(line)
+
+    def add_result(self, opportunity: Opportunity) -> None:
+        """Record an accepted deal and wake up whoever streams this run."""
+        self.results.append(opportunity)
+        if self.logs is not None:
+            self.logs.put(DEAL_ACCEPTED)
+
+    def first_call(self, name: str) -> bool:
+        """True the first time `name` asks during this run."""
+        if name in self.announced:
+            return False
+        self.announced.add(name)
+        return True
+
+    def count_missing(self, model: str) -> None:
+        """Record a base prediction the ensemble had to do without."""
+        self.missing_predictions[model] = self.missing_predictions.get(model, 0) + 1
+
+    def start_deadline(self, deadline_s: Optional[float]) -> None:
+        """Give the run `deadline_s` seconds from now (None: no deadline)."""
+        self.deadline = None if deadline_s is None else time.monotonic() + deadline_s
+        self.degradations = []
+        self.skipped_models = set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None: no deadline)."""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        """True once the deadline has passed."""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def degrade(self, note: str) -> None:
+        """Record a degradation applied to meet the deadline (once per run)."""
+        if note not in self.degradations:
+            self.degradations.append(note)
+
+    def reset_cascade_stats(self) -> None:
+        """Start counting cascade decisions and missing predictions afresh."""
+        self.cascade_stats = _cascade_counters()
+        self.missing_predictions = {}
+
+    def reset_cache_stats(self) -> None:
+        """Start counting cache lookups afresh."""
+        self.cache_stats = _cache_counters()
+        self.similarities = []
+
+
+# Used outside any run (scripts, notebooks, warm-ups): logs go to the terminal only
+_process_context = RunContext(logs=None)
+_current: ContextVar[Optional[RunContext]] = ContextVar("snapr_run", default=None)
+
+
+def current_run() -> RunContext:
+    """The context of the run executing in this thread."""
+    return _current.get() or _process_context
+
+
+@contextmanager
+def run_scope(context: Optional[RunContext] = None) -> Iterator[RunContext]:
+    """Make `context` (a fresh one by default) current for the enclosed run."""
+    context = context or RunContext()
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+def submit_in_run(
+    executor: Executor,
+    fn: Callable[..., Any],
+    *args: Any,  # noqa: ANN401
+) -> Future:
+    """Submit `fn` to a worker thread that sees the caller's run context."""
+    return executor.submit(copy_context().run, fn, *args)
@@ -1,9 +1,11 @@
 """Handles the integration of XGBoost model with Modal to predict item prices."""
 
-import modal
+from typing import List
 
+from src.agents.backends import PRICING_BACKEND, connect
 from src.agents.base_agent import Agent
-from src.modal_services.app_config import APP_NAME
+from src.agents.deadlines import RemoteCaller
+from src.agents.run_context import current_run
 
 
 class XGBoostPriceAgent(Agent):
@@ -15,20 +17,19 @@ class XGBoostPriceAgent(Agent):
     name = "XGBPrice Agent"
     color = "yellow"
 
-    def __init__(self) -> None:
-        """Initialize the agent."""
-        self._modal_called = False
-        remote_xgb_pricer = modal.Cls.from_name(APP_NAME, "XGBPricer")
-        self.xgb = remote_xgb_pricer()
+    def __init__(self, backend: str = PRICING_BACKEND) -> None:
+        """Initialize the agent ("modal" or in-process "local" backend)."""
+        self.backend = backend
+        self.xgb = connect("XGBPricer", backend)
+        self.call = RemoteCaller("xgb")
         self.log("is ready")
 
     def price(self, description: str) -> float:
         """Call the remote XGBPricer to estimate price."""
-        if not self._modal_called:
+        if self.backend == "modal" and current_run().first_call(self.name):
             self.log("📡 Connecting to Modal — loading XGBoost and embedding model...")
-            self._modal_called = True
         try:
-            result = self.xgb.price.remote(description)
+            result = self.call(self.xgb.price.remote, description)
             # self.log(f"predicting ${result:.2f} ✅")
             return result
         except Exception as e:
@@ -36,3 +37,17 @@ class XGBoostPriceAgent(Agent):
             raise RuntimeError(
                 "XGBoostPriceAgent failed to get price from Modal."
             ) from e
+
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """Estimate prices for many descriptions in one XGBPricer call."""
+        try:
+            return self.xgb.price_batch.remote(descriptions)
+        except Exception as e:
+            self.log(f"[ERROR] Remote XGBPricer batch failed: {e}")
+            raise RuntimeError(
+                "XGBoostPriceAgent failed to get price from Modal."
+            ) from e
+
+    def warmup(self) -> None:
+        """Start a XGBPricer container and load its models (no prediction)."""
+        self.xgb.warmup.remote()
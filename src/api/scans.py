@@ -0,0 +1,182 @@
+"""Headless scan jobs: REST and server-sent events next to the Gradio UI.
+
+- `POST /api/scans` submits a scan for a category list and returns its job id.
+- `GET /api/scans/{id}` returns the job's status and deals as JSON.
+- `GET /api/scans/{id}/events` streams the job's log lines and each accepted
+  deal as server-sent events, then a final `done` event.
+- `GET /api/scans/{id}/log` downloads the job's full log, when runs spill
+  their logs to disk (SNAPR_LOG_SPILL_DIR).
+
+Jobs go through the same scan coalescer and run pool as the UI, so identical
+scans are shared and at most MAX_CONCURRENT_RUNS run at once; the others wait
+in the pool's queue.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+
+from src.agents import pipeline
+from src.agents.run_context import DEAL_ACCEPTED, RunContext
+from src.config.constants import (
+    API_JOB_HISTORY,
+    API_MAX_ACTIVE_JOBS,
+    STREAM_COALESCE_S,
+    STREAM_IDLE_TIMEOUT_S,
+)
+from src.utils.text_utils import strip_html
+
+router = APIRouter(prefix="/api/scans", tags=["scans"])
+
+
+class ScanRequest(BaseModel):
+    """Body of a scan submission."""
+
+    categories: List[str]
+    deadline_s: Optional[float] = None
+
+
+@dataclass
+class ScanJob:
+    """A submitted scan and the run serving it."""
+
+    id: str
+    categories: List[str]
+    run: RunContext
+    source: str  # "new", "joined" or "cached"
+    submitted_at: float
+
+    @property
+    def status(self) -> str:
+        """Job state: running until the run's log is closed, then done or failed."""
+        if not self.run.logs.closed:
+            return "running"
+        return "done" if self.run.error is None else "failed"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON view of the job."""
+        return {
+            "id": self.id,
+            "categories": self.categories,
+            "status": self.status,
+            "source": self.source,
+            "deals": [deal.model_dump() for deal in self.run.results],
+            "degradations": self.run.degradations,
+            "error": self.run.error,
+            "log_dropped": self.run.logs.dropped,
+            "events_url": f"{router.prefix}/{self.id}/events",
+            "log_url": (
+                f"{router.prefix}/{self.id}/log" if self.run.logs.spill_path else None
+            ),
+        }
+
+
+_jobs: "OrderedDict[str, ScanJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def _forget_old_jobs() -> None:
+    """Drop the oldest finished jobs beyond API_JOB_HISTORY (lock held)."""
+    finished = [job_id for job_id, job in _jobs.items() if job.status != "running"]
+    for job_id in finished[: max(len(_jobs) - API_JOB_HISTORY, 0)]:
+        del _jobs[job_id]
+
+
+def _get_job(job_id: str) -> ScanJob:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown scan job {job_id}")
+    return job
+
+
+@router.post("", status_code=202)
+def submit_scan(request: ScanRequest) -> Dict[str, Any]:
+    """Start (or share) a scan of the given categories; returns the job."""
+    is_valid, error_msg = pipeline.validate_categories(request.categories)
+    if not is_valid:
+        raise HTTPException(status_code=422, detail=error_msg)
+
+    with _jobs_lock:
+        active = sum(job.status == "running" for job in _jobs.values())
+        if active >= API_MAX_ACTIVE_JOBS:
+            raise HTTPException(status_code=429, detail="Too many scans running.")
+
+        refusal = {}
+
+        def admit() -> bool:
+            can_run, refusal["detail"], _ = pipeline.check_demo_restrictions()
+            return can_run
+
+        run, source, _ = pipeline.scan_coalescer.submit(
+            request.categories, request.deadline_s, admit
+        )
+        if run is None:
+            raise HTTPException(status_code=429, detail=refusal["detail"])
+
+        job = ScanJob(uuid.uuid4().hex, request.categories, run, source, time.time())
+        _jobs[job.id] = job
+        _forget_old_jobs()
+    return job.to_dict()
+
+
+@router.get("/{job_id}")
+def get_scan(job_id: str) -> Dict[str, Any]:
+    """Status, deals and degradations of a scan job."""
+    return _get_job(job_id).to_dict()
+
+
+def _event(name: str, data: Any) -> str:  # noqa: ANN401
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _job_events(job: ScanJob) -> AsyncIterator[str]:
+    """Log lines and accepted deals as they happen, then the final job."""
+    subscription = job.run.logs.subscribe()
+    deals_sent = 0
+    done = False
+    while not done:
+        items, done = await asyncio.to_thread(
+            subscription.next_burst,
+            STREAM_IDLE_TIMEOUT_S,
+            STREAM_COALESCE_S,
+            (DEAL_ACCEPTED,),
+        )
+        for item in items:
+            if isinstance(item, str):
+                yield _event("log", {"line": strip_html(item)})
+        new_deals = job.run.results[deals_sent:]
+        deals_sent += len(new_deals)
+        for deal in new_deals:
+            yield _event("deal", deal.model_dump())
+    yield _event("done", job.to_dict())
+
+
+@router.get("/{job_id}/events")
+def stream_scan(job_id: str) -> StreamingResponse:
+    """Server-sent events of a scan job, replayed from its first line."""
+    job = _get_job(job_id)
+    return StreamingResponse(
+        _job_events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{job_id}/log")
+def download_log(job_id: str) -> FileResponse:
+    """The job's full plain-text log, spilled to disk (404 if not spilled)."""
+    path = _get_job(job_id).run.logs.spill_path
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No log file for this job.")
+    return FileResponse(path, media_type="text/plain", filename=os.path.basename(path))
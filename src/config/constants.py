@@ -26,14 +26,89 @@ MAX_DEMO_RUNS_PER_DAY = 5
 MAX_LOG_LINES = 50
 MAX_DEALS_PER_FEED = 20
 MAX_CATEGORY_SELECTION = 3
+# Pipeline runs executing at once in this process (further clicks wait)
+MAX_CONCURRENT_RUNS = 4
+# Log streaming: gather a burst of lines for this long before updating the UI;
+# without new lines, check that the run is still alive this often
+STREAM_COALESCE_S = 0.1
+STREAM_IDLE_TIMEOUT_S = 1.0
+# Each run's log channel is a ring buffer of this many lines. On overflow the
+# oldest lines are dropped: "drop-oldest" silently, "summarize" with a line
+# telling a reader that fell behind how many it missed.
+LOG_CHANNEL_CAPACITY = 2000
+LOG_OVERFLOW_POLICY = "summarize"
+# Spilled run logs (SNAPR_LOG_SPILL_DIR) are deleted after this many days
+LOG_SPILL_MAX_AGE_DAYS = 7
+# Identical scans (same category set) share one run; a finished run's results
+# are served to identical requests for this long
+SCAN_RESULT_TTL_S = 120
+# Scan job API (/api/scans): unfinished jobs accepted at once (more get 429)
+# and finished jobs kept for GET requests
+API_MAX_ACTIVE_JOBS = 16
+API_JOB_HISTORY = 100
 MEMORY_EXPIRATION_DAYS = 5
 
 # ==================== BUSINESS LOGIC ====================
 CURRENCY = "$"
 DEAL_THRESHOLD = 50
 
+# ==================== MODEL SERVING ====================
+# Serve RAG and XGBoost from one E5 container, embedding each description once
+SHARE_E5_EMBEDDING = True
+
+# Ensemble combiner: "local" (NumPy, in-process) or "remote" (EnsemblePricer)
+ENSEMBLE_BACKEND = "local"
+
+# Cascade pricing: XGB runs first; FT and RAG only run when the XGB discount is
+# within the band around DEAL_THRESHOLD (the wider of the absolute and relative
+# widths), otherwise the ensemble falls back to its XGB-only subset model. It
+# stays off while the deployed ensemble ships no such model.
+CASCADE_PRICING = False
+CASCADE_BAND = 40.0
+CASCADE_BAND_RATIO = 0.25
+
+# Persistent estimate cache (keyed by normalized description + model versions)
+USE_ESTIMATE_CACHE = True
+ESTIMATE_CACHE_TTL_HOURS = 72
+ESTIMATE_CACHE_MAX_ENTRIES = 10000
+# Model version fingerprints are read again at most this often
+MODEL_VERSIONS_TTL_S = 60
+
+# Semantic tier: reuse the estimate of the nearest cached description (E5 cosine)
+USE_SEMANTIC_CACHE = True
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Warm the pricing services when the UI loads or categories change, at most
+# once per interval (containers idle out after their scaledown window)
+WARMUP_ON_UI_LOAD = True
+WARMUP_INTERVAL_S = 120
+
+# Client-side deadline (seconds) per pricing service call; None waits forever.
+# A model that misses it is left out of the ensemble (subset fallback).
+MODEL_DEADLINES_S = {"ft": 60.0, "rag": 30.0, "xgb": 20.0, "e5": 30.0}
+# Hedging: duplicate a call that outlasts the service's recent p95 latency
+HEDGE_REQUESTS = False
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Run deadline ("results within N seconds"; None: no deadline). As the time
+# left shrinks, a run scans fewer deals per feed, describes deals from the RSS
+# summary instead of fetching their pages, leaves out a cold fine-tuned LLM and
+# finally prices deals from the estimate cache only.
+RUN_DEADLINE_S = None
+BUDGET_DEALS_PER_FEED = 5
+BUDGET_FEWER_DEALS_S = 90.0
+BUDGET_SKIP_DETAILS_S = 45.0
+BUDGET_COLD_FT_S = 120.0
+BUDGET_CACHE_ONLY_S = 5.0
+# FT counts as warm this long after its last answer (its scaledown window)
+FT_WARM_WINDOW_S = 300
+
 # ==================== PATHS ====================
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 MEMORY_DIR = BASE_DIR / "memory"
 STATE_FILE = MEMORY_DIR / "demo_state.json"
 DEALS_FILE = MEMORY_DIR / "memory.json"
+MODEL_CACHE_DIR = BASE_DIR / "model_cache"
+ENSEMBLE_COEFFICIENTS_FILE = MODEL_CACHE_DIR / "ensemble_coefficients.json"
+ESTIMATE_CACHE_FILE = MODEL_CACHE_DIR / "estimates.sqlite3"
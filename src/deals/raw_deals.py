@@ -1,7 +1,7 @@
 """Handles scraping and preprocessing logic before OpenAI interaction."""
 
 import time
-from typing import Dict, List, Self
+from typing import Dict, List, Optional, Self
 
 import feedparser
 import requests
@@ -40,8 +40,11 @@ class ScrapedDeal:
     details: str  # Full description
     features: str  # Feature list
 
-    def __init__(self, entry: Dict[str, str]) -> None:
-        """Initialize deal from RSS entry and fetch content."""
+    def __init__(self, entry: Dict[str, str], fetch_details: bool = True) -> None:
+        """Initialize deal from RSS entry and fetch content.
+
+        Without `fetch_details`, the RSS summary stands in for the deal page.
+        """
         # Basic metadata from RSS
         self.title = entry["title"]
         self.summary = extract(entry["summary"])
@@ -52,7 +55,10 @@ class ScrapedDeal:
         self.features = ""
 
         # Fetch and parse full deal content
-        self._load_content()
+        if fetch_details:
+            self._load_content()
+        else:
+            self.details = self.summary
 
     def _load_content(self) -> None:
         """Fetches and parses deal content; raises on failure to skip."""
@@ -90,10 +96,16 @@ class ScrapedDeal:
         )
 
     @classmethod
-    def fetch(cls, selected_categories: List[str]) -> List[Self]:
+    def fetch(
+        cls,
+        selected_categories: List[str],
+        max_per_feed: Optional[int] = None,
+        fetch_details: bool = True,
+    ) -> List[Self]:
         """Parses RSS feeds into ScrapedDeal instances.
 
-        Skips failed deals; stops app if all fail.
+        Reads up to `max_per_feed` entries per feed (MAX_DEALS_PER_FEED by
+        default). Skips failed deals; stops app if all fail.
         """
         deals = []
         feed_urls = [
@@ -110,8 +122,8 @@ class ScrapedDeal:
                 f"{feed_url}"
             )
 
-            for entry in feed.entries[:MAX_DEALS_PER_FEED]:
-                cls._process_deal(entry, deals)
+            for entry in feed.entries[: max_per_feed or MAX_DEALS_PER_FEED]:
+                cls._process_deal(entry, deals, fetch_details)
 
             # Throttle requests to avoid hitting servers too fast
             time.sleep(0.5)
@@ -134,10 +146,12 @@ class ScrapedDeal:
         return feed
 
     @staticmethod
-    def _process_deal(entry: Dict[str, str], deals: List[Self]) -> None:
+    def _process_deal(
+        entry: Dict[str, str], deals: List[Self], fetch_details: bool = True
+    ) -> None:
         """Helper method to process each RSS entry and add valid deals."""
         try:
-            deal = ScrapedDeal(entry)
+            deal = ScrapedDeal(entry, fetch_details)
             deals.append(deal)
         except Exception as e:
             console.print(
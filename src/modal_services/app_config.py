@@ -1,8 +1,12 @@
 """Defines shared Modal configuration.
 
-Includes constants, image, volume, secrets, and app setup.
+Includes constants, images, volume, secrets, app setup and the per-service
+resource profiles read by each `@app.cls`.
 """
 
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
 from modal import App, Image, Secret, Volume
 
 from src.config.constants import APP_NAME
@@ -10,23 +14,41 @@ from src.config.constants import APP_NAME
 CACHE_PATH = "/cache"
 GPU = "T4"
 
-# Modal image, volume, and secrets
+# Packages shared by every service image
+BASE_PACKAGES = ("huggingface", "openai", "numpy", "pandas")
+
+# Modal images: the full image carries the LLM stack (torch, peft, bitsandbytes);
+# the light image only what the small CPU services import.
 image = (
     Image.debian_slim()
+    .apt_install("gcc")  # Compiles the XGBoost trees (SNAPR_XGB_ENGINE=compiled)
     .pip_install(
-        "huggingface",
+        *BASE_PACKAGES,
         "torch",
         "transformers",
         "bitsandbytes",
         "accelerate",
         "peft",
-        "sentence-transformers",
+        "sentence-transformers[onnx]",
         "xgboost",
+        "treelite",
+        "tl2cgen",
         "joblib",
         "chromadb",
-        "openai",
-        "numpy",
-        "pandas",
+    )
+    .env({"HF_HUB_CACHE": CACHE_PATH})
+    .add_local_file(local_path="pyproject.toml", remote_path="/root/pyproject.toml")
+)
+
+light_image = (
+    Image.debian_slim()
+    .pip_install(
+        *BASE_PACKAGES,
+        "huggingface_hub",
+        "python-dotenv",
+        "requests",
+        "joblib",
+        "scikit-learn",
     )
     .env({"HF_HUB_CACHE": CACHE_PATH})
     .add_local_file(local_path="pyproject.toml", remote_path="/root/pyproject.toml")
@@ -38,13 +60,66 @@ app = App(APP_NAME, image=image)
 cache_vol = Volume.from_name("hf-hub-cache", create_if_missing=True)
 secrets = [Secret.from_name("HF_TOKEN"), Secret.from_name("OPENAI_API_KEY")]
 
-# Shared Modal class config for all model agents
-modal_class_kwargs = dict(
-    image=image,
-    secrets=secrets,
-    volumes={CACHE_PATH: cache_vol},  # Mount volume into /cache
-    gpu=GPU,
-    timeout=1800,  # 30-minute max runtime
-    min_containers=0,  # 1 = always-on, uses credits
-    scaledown_window=180,  # Shuts down the container
-)
+
+@dataclass(frozen=True)
+class ServiceProfile:
+    """Hardware and scaling settings for one Modal service."""
+
+    gpu: Optional[str] = GPU  # None = CPU-only container
+    cpu: Optional[float] = None  # Physical cores, None = Modal default
+    memory: Optional[int] = None  # MiB, None = Modal default
+    max_inputs: int = 1  # Concurrent inputs per container (@modal.concurrent)
+    min_containers: int = 0  # 1 = always-on, uses credits
+    scaledown_window: int = 180  # Idle seconds before the container shuts down
+    timeout: int = 1800  # Max runtime per input (seconds)
+    light: bool = False  # Use the image without torch, peft and bitsandbytes
+    env: Dict[str, str] = field(default_factory=dict)
+
+
+SERVICE_PROFILES: Dict[str, ServiceProfile] = {
+    # 8B LLM, 4-bit on a T4; one generation at a time
+    "ft": ServiceProfile(memory=16384, scaledown_window=300),
+    # One-time merge of the LoRA adapter (bf16 on CPU, then 4-bit on GPU)
+    "ft_build": ServiceProfile(memory=32768, timeout=3600),
+    # E5 on GPU + XGBoost + retrieval; concurrent inputs overlap OpenAI calls
+    "e5": ServiceProfile(memory=8192, max_inputs=4),
+    # E5 + retrieval, mostly waiting on OpenAI
+    "rag": ServiceProfile(memory=8192, max_inputs=4),
+    # E5 (ONNX on CPU) + XGBoost regressor
+    "xgb": ServiceProfile(
+        gpu=None,
+        cpu=2.0,
+        memory=4096,
+        env={"SNAPR_E5_DEVICE": "cpu", "SNAPR_E5_BACKEND": "onnx"},
+    ),
+    # Linear regressor over three predictions
+    "ensemble": ServiceProfile(
+        gpu=None, cpu=0.5, memory=1024, max_inputs=32, timeout=60, light=True
+    ),
+}
+
+
+def service_kwargs(name: str) -> Dict[str, Any]:
+    """Keyword arguments for `@app.cls` / `@app.function` of a service."""
+    profile = SERVICE_PROFILES[name]
+    kwargs = dict(
+        image=light_image if profile.light else image,
+        secrets=secrets,
+        volumes={CACHE_PATH: cache_vol},  # Mount volume into /cache
+        gpu=profile.gpu,
+        timeout=profile.timeout,
+        min_containers=profile.min_containers,
+        scaledown_window=profile.scaledown_window,
+    )
+    if profile.cpu is not None:
+        kwargs["cpu"] = profile.cpu
+    if profile.memory is not None:
+        kwargs["memory"] = profile.memory
+    if profile.env:
+        kwargs["env"] = profile.env
+    return kwargs
+
+
+def concurrency_kwargs(name: str) -> Dict[str, int]:
+    """Keyword arguments for `@modal.concurrent` of a service."""
+    return {"max_inputs": SERVICE_PROFILES[name].max_inputs}
@@ -0,0 +1,359 @@
+"""Offline-first resolver for model artifacts kept in the cache volume.
+
+A checksum manifest next to the artifacts lets warm containers load from local
+files without any network round trip. On a cold or partially written volume,
+only the missing or damaged files are fetched.
+"""
+
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Protocol, Tuple
+
+import modal
+
+from src.modal_services.app_config import CACHE_PATH, cache_vol
+
+try:
+    import fcntl
+except ImportError:  # Windows: the in-process lock still serializes threads
+    fcntl = None
+
+MANIFEST_FILENAME = "manifest.json"
+
+# Point this at a local directory (laid out as <root>/<repo_id>/...) to resolve
+# artifacts without Hugging Face, e.g. in tests or offline development.
+ARTIFACT_SOURCE_ENV = "SNAPR_ARTIFACT_SOURCE"
+
+# Overrides the cache directory outside Modal (the volume is mounted at CACHE_PATH)
+CACHE_DIR_ENV = "SNAPR_CACHE_DIR"
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Merges of one manifest entry before giving up (other containers kept winning)
+MANIFEST_MERGE_ATTEMPTS = 3
+
+# Manifest updates of every resolver in this process (warm-ups resolve in parallel)
+_manifest_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ArtifactSpec:
+    """Describes a set of files to materialize under `<cache>/<name>`."""
+
+    name: str  # Manifest key and local directory name
+    repo_id: str  # Hugging Face repo (or directory under a local source)
+    revision: Optional[str] = None  # None = whatever the source serves by default
+    patterns: Optional[Tuple[str, ...]] = None  # Glob filter, None = all files
+
+
+class ArtifactSource(Protocol):
+    """Where missing artifact files are fetched from."""
+
+    def list_files(self, spec: ArtifactSpec) -> Dict[str, Optional[int]]:
+        """Return remote file names mapped to their size (None if unknown)."""
+        ...
+
+    def fetch(self, spec: ArtifactSpec, filename: str, dest_dir: str) -> None:
+        """Write `filename` to `dest_dir/filename`."""
+        ...
+
+
+class SharedVolume(Protocol):
+    """A volume other containers write to (a Modal Volume)."""
+
+    def reload(self) -> None:
+        """See the changes other containers committed."""
+        ...
+
+    def commit(self) -> None:
+        """Publish this container's changes."""
+        ...
+
+
+class HubSource:
+    """Fetches artifact files from the Hugging Face Hub."""
+
+    def list_files(self, spec: ArtifactSpec) -> Dict[str, Optional[int]]:
+        """List repo files with their sizes in a single metadata call."""
+        from huggingface_hub import HfApi
+
+        info = HfApi().model_info(
+            spec.repo_id, revision=spec.revision, files_metadata=True
+        )
+        return {sibling.rfilename: sibling.size for sibling in info.siblings}
+
+    def fetch(self, spec: ArtifactSpec, filename: str, dest_dir: str) -> None:
+        """Download a single file into `dest_dir`."""
+        from huggingface_hub import hf_hub_download
+
+        hf_hub_download(
+            repo_id=spec.repo_id,
+            filename=filename,
+            revision=spec.revision,
+            local_dir=dest_dir,
+        )
+
+
+class LocalDirSource:
+    """Serves artifact files from a local directory stand-in."""
+
+    def __init__(self, root: str) -> None:
+        """Use `root/<repo_id>/` as the contents of each repository."""
+        self.root = root
+
+    def _repo_dir(self, spec: ArtifactSpec) -> str:
+        return os.path.join(self.root, spec.repo_id)
+
+    def list_files(self, spec: ArtifactSpec) -> Dict[str, Optional[int]]:
+        """List files under the repo directory with their sizes."""
+        repo_dir = self._repo_dir(spec)
+        files = {}
+        for dirpath, _, filenames in os.walk(repo_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                files[os.path.relpath(path, repo_dir)] = os.path.getsize(path)
+        return files
+
+    def fetch(self, spec: ArtifactSpec, filename: str, dest_dir: str) -> None:
+        """Copy a single file into `dest_dir`."""
+        target = os.path.join(dest_dir, filename)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(os.path.join(self._repo_dir(spec), filename), target)
+
+
+def sha256_file(path: str) -> str:
+    """Return the hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactResolver:
+    """Resolves artifacts to local directories, downloading only what's missing.
+
+    The manifest (`<cache>/manifest.json`) records, per artifact, the source
+    repo and revision plus the size and SHA-256 of every file. A spec is served
+    offline when its manifest entry matches and every file is present with the
+    recorded size; `deep=True` re-hashes files instead of trusting sizes.
+
+    The manifest lock only holds within one machine: containers sharing a
+    Modal Volume each write their own copy, and the last commit wins. With a
+    `volume`, entries are therefore merged into the latest committed manifest
+    and checked after the commit, and merged again if another container's
+    commit replaced them. That narrows the race without closing it: an entry
+    still lost costs a re-hash (downloaded files) or a rebuild (`record`).
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_PATH,
+        source: Optional[ArtifactSource] = None,
+        volume: Optional[SharedVolume] = None,
+    ) -> None:
+        """Create a resolver over `cache_dir`, fetching from `source`."""
+        self.cache_dir = cache_dir
+        self.source = source or default_source()
+        self.volume = volume
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_FILENAME)
+
+    # ---------- Manifest ----------
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @contextmanager
+    def _manifest_locked(self) -> Iterator[None]:
+        """Hold the manifest lock, across threads and (with flock) processes."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with _manifest_lock, open(f"{self.manifest_path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # Released on close
+            yield
+
+    def _sync(self, action: str) -> None:
+        """Reload or commit the shared volume, if any (best effort)."""
+        if self.volume is None:
+            return
+        try:
+            getattr(self.volume, action)()
+        except Exception as e:  # e.g. reload refused while model files are open
+            logging.warning(f"[Artifacts] Volume {action} failed: {e}")
+
+    def _save_entry(self, name: str, entry: Dict[str, Any]) -> None:
+        """Merge one entry into the manifest and replace the file atomically.
+
+        The read-modify-write runs under the manifest lock, so concurrent
+        resolves in this container never drop each other's entries; across
+        containers, see the class docstring.
+        """
+        for _ in range(MANIFEST_MERGE_ATTEMPTS):
+            # Outside the lock: the lock file is on the volume, and an open
+            # file makes a reload fail
+            self._sync("reload")
+            with self._manifest_locked():
+                manifest = self._load_manifest()
+                manifest[name] = entry
+                tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(manifest, f, indent=2)
+                os.replace(tmp_path, self.manifest_path)
+            if self.volume is None:
+                return
+            self._sync("commit")
+            self._sync("reload")
+            if self._load_manifest().get(name) == entry:
+                return
+            logging.warning(
+                f"[Artifacts] Manifest replaced by another container, "
+                f"merging {name} again."
+            )
+        logging.error(f"[Artifacts] Could not record {name} in the shared manifest.")
+
+    @staticmethod
+    def _file_ok(path: str, record: Dict[str, Any], deep: bool) -> bool:
+        if not os.path.isfile(path) or os.path.getsize(path) != record["size"]:
+            return False
+        return not deep or sha256_file(path) == record["sha256"]
+
+    def _verified(
+        self, entry: Optional[Dict[str, Any]], directory: str, deep: bool
+    ) -> bool:
+        if not entry or not entry.get("files"):
+            return False
+        return all(
+            self._file_ok(os.path.join(directory, filename), record, deep)
+            for filename, record in entry["files"].items()
+        )
+
+    # ---------- Public API ----------
+
+    def local_dir(self, name: str) -> str:
+        """Directory an artifact is materialized in."""
+        return os.path.join(self.cache_dir, name)
+
+    def resolve(self, spec: ArtifactSpec, deep: bool = False) -> str:
+        """Return the local directory for `spec`, fetching missing files only."""
+        directory = self.local_dir(spec.name)
+        entry = self._load_manifest().get(spec.name)
+        same_source = (
+            entry is not None
+            and entry.get("repo_id") == spec.repo_id
+            and entry.get("revision") == spec.revision
+        )
+        if same_source and self._verified(entry, directory, deep):
+            logging.info(f"[Artifacts] {spec.name} served from cache.")
+            return directory
+
+        known = entry["files"] if same_source else {}
+        remote = self.source.list_files(spec)
+        if spec.patterns:
+            remote = {
+                filename: size
+                for filename, size in remote.items()
+                if any(fnmatch.fnmatch(filename, p) for p in spec.patterns)
+            }
+        if not remote:
+            raise FileNotFoundError(f"No files found for artifact '{spec.name}'.")
+
+        files = {}
+        fetched = 0
+        for filename, size in sorted(remote.items()):
+            path = os.path.join(directory, filename)
+            record = known.get(filename)
+            size_matches = record and (size is None or record["size"] == size)
+            if size_matches and self._file_ok(path, record, deep):
+                files[filename] = record
+                continue
+
+            # Adopt a complete file left by an older layout without re-fetching
+            adoptable = (
+                size is not None
+                and os.path.isfile(path)
+                and os.path.getsize(path) == size
+            )
+            if not adoptable:
+                self.source.fetch(spec, filename, directory)
+                fetched += 1
+            files[filename] = {
+                "size": os.path.getsize(path),
+                "sha256": sha256_file(path),
+            }
+
+        self._save_entry(
+            spec.name,
+            {
+                "repo_id": spec.repo_id,
+                "revision": spec.revision,
+                "files": files,
+                "updated": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+        logging.info(
+            f"[Artifacts] {spec.name} ready ({fetched}/{len(files)} files fetched)."
+        )
+        return directory
+
+    def record(self, name: str) -> None:
+        """Add a locally built artifact (already in `local_dir(name)`)."""
+        directory = self.local_dir(name)
+        files = {}
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                files[os.path.relpath(path, directory)] = {
+                    "size": os.path.getsize(path),
+                    "sha256": sha256_file(path),
+                }
+        self._save_entry(
+            name,
+            {
+                "repo_id": None,
+                "revision": None,
+                "files": files,
+                "updated": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+
+    def lookup(self, name: str, deep: bool = False) -> Optional[str]:
+        """Return the directory of a complete artifact, or None (never fetches)."""
+        directory = self.local_dir(name)
+        entry = self._load_manifest().get(name)
+        return directory if self._verified(entry, directory, deep) else None
+
+    def fingerprint(self, *names: str) -> str:
+        """Short digest of the manifest entries, to detect artifact changes."""
+        manifest = self._load_manifest()
+        digest = hashlib.sha256()
+        for name in names:
+            files = (manifest.get(name) or {}).get("files", {})
+            for filename in sorted(files):
+                digest.update(f"{name}/{filename}:{files[filename]['sha256']}".encode())
+        return digest.hexdigest()[:16]
+
+
+def default_source() -> ArtifactSource:
+    """Local directory stand-in if configured, otherwise the Hugging Face Hub."""
+    local_root = os.getenv(ARTIFACT_SOURCE_ENV)
+    return LocalDirSource(local_root) if local_root else HubSource()
+
+
+def get_resolver() -> ArtifactResolver:
+    """Resolver over the shared Modal cache volume (or SNAPR_CACHE_DIR)."""
+    cache_dir = os.getenv(CACHE_DIR_ENV)
+    if cache_dir or modal.is_local():
+        return ArtifactResolver(cache_dir or CACHE_PATH, default_source())
+    return ArtifactResolver(CACHE_PATH, default_source(), volume=cache_vol)
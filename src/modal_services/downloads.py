@@ -0,0 +1,173 @@
+"""Streaming, resumable and verified downloads for archives in the cache volume.
+
+Archives are streamed to a `.part` file in fixed-size chunks (bounded memory),
+resumed with HTTP range requests after an interruption, checked against an
+expected SHA-256 (or, without one, every member's CRC) and size, then
+extracted into a staging directory that is renamed into place only once
+complete. A corrupt archive is deleted and fetched again.
+"""
+
+import logging
+import os
+import shutil
+import time
+import zipfile
+from typing import Optional
+
+import requests
+
+from src.modal_services.artifacts import sha256_file
+
+CHUNK_SIZE = 1024 * 1024
+COMPLETE_MARKER = ".snapr-complete"
+
+
+def _expected_size(response: requests.Response, offset: int) -> Optional[int]:
+    """Total file size announced by the server, if any."""
+    content_range = response.headers.get("Content-Range")
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("Content-Length")
+    return offset + int(length) if length and length.isdigit() else None
+
+
+def download_file(
+    url: str,
+    dest: str,
+    sha256: Optional[str] = None,
+    retries: int = 3,
+    timeout: float = 30,
+    chunk_size: int = CHUNK_SIZE,
+) -> str:
+    """Stream `url` to `dest`, resuming partial downloads; returns the SHA-256."""
+    part_path = f"{dest}.part"
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with requests.get(
+                url, headers=headers, stream=True, timeout=timeout
+            ) as response:
+                if response.status_code == 416:  # .part already holds everything
+                    expected = None
+                else:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        offset = 0  # Server ignored the range: start over
+                    expected = _expected_size(response, offset)
+                    with open(part_path, "ab" if offset else "wb") as f:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            f.write(chunk)
+            break
+        except requests.RequestException as e:
+            if attempt == retries:
+                raise
+            logging.warning(f"[Downloads] Attempt {attempt} failed ({e}), resuming...")
+            time.sleep(attempt)
+
+    size = os.path.getsize(part_path)
+    if expected is not None and size != expected:
+        raise IOError(f"Incomplete download of {url}: {size}/{expected} bytes.")
+
+    digest = sha256_file(part_path)
+    if sha256 and digest != sha256:
+        os.remove(part_path)
+        raise ValueError(f"Checksum mismatch for {url}: got {digest}.")
+
+    os.replace(part_path, dest)
+    return digest
+
+
+def is_complete(target_dir: str) -> bool:
+    """True if `target_dir` was produced by a finished atomic extraction."""
+    return os.path.exists(os.path.join(target_dir, COMPLETE_MARKER))
+
+
+def extract_zip_atomic(zip_path: str, target_dir: str, digest: str = "") -> None:
+    """Extract into a staging directory, then rename it over `target_dir`."""
+    staging_dir = f"{target_dir}.{os.getpid()}.extract"
+    stale_dir = f"{target_dir}.{os.getpid()}.old"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            zip_ref.extractall(staging_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    with open(os.path.join(staging_dir, COMPLETE_MARKER), "w") as f:
+        f.write(digest)
+
+    if os.path.exists(target_dir):
+        os.rename(target_dir, stale_dir)
+    os.rename(staging_dir, target_dir)
+    shutil.rmtree(stale_dir, ignore_errors=True)
+
+
+def _discard(zip_path: str) -> None:
+    """Remove an archive and its partial download."""
+    for path in (zip_path, f"{zip_path}.part"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _verified_zip(zip_path: str, sha256: Optional[str]) -> Optional[str]:
+    """SHA-256 of a leftover archive if it can be trusted, else None (discarded).
+
+    With a pinned checksum the digest must match; without one, every member's
+    CRC is checked, so a truncated or corrupt archive is never reused.
+    """
+    if not os.path.exists(zip_path):
+        return None
+    digest = sha256_file(zip_path)
+    try:
+        if sha256:
+            ok = digest == sha256
+        else:
+            with zipfile.ZipFile(zip_path, "r") as zip_ref:
+                ok = zip_ref.testzip() is None
+    except zipfile.BadZipFile:
+        ok = False
+    if not ok:
+        logging.warning(f"[Downloads] Discarding unverified {zip_path}.")
+        _discard(zip_path)
+        return None
+    return digest
+
+
+def ensure_extracted_archive(
+    url: str, target_dir: str, sha256: Optional[str] = None, attempts: int = 2
+) -> str:
+    """Make sure a verified copy of the zip at `url` is extracted in `target_dir`.
+
+    The archive is kept next to the target while downloading (so an interrupted
+    download resumes on the next cold start) and removed after extraction. An
+    archive that fails verification or extraction is deleted, with its partial
+    download, and fetched again.
+    """
+    if is_complete(target_dir):
+        return target_dir
+
+    if os.path.exists(target_dir):
+        logging.warning(f"[Downloads] Incomplete {target_dir} found, rebuilding.")
+
+    zip_path = f"{target_dir}.zip"
+    for attempt in range(1, attempts + 1):
+        digest = _verified_zip(zip_path, sha256)
+        if digest is None:
+            logging.info(f"[Downloads] Fetching {url}...")
+            digest = download_file(url, zip_path, sha256=sha256)
+        try:
+            extract_zip_atomic(zip_path, target_dir, digest)
+            break
+        except (zipfile.BadZipFile, EOFError) as e:
+            _discard(zip_path)
+            if attempt == attempts:
+                raise
+            logging.warning(f"[Downloads] Corrupt archive ({e}), downloading again.")
+    os.remove(zip_path)
+    logging.info(f"[Downloads] {target_dir} ready (sha256={digest[:12]}).")
+    return target_dir
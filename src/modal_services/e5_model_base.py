@@ -1,37 +1,168 @@
 """Base class for E5 model handling.
 
-Downloads, caches, and loads the model for reuse.
+Resolves the model through the artifact cache and loads it for reuse, on GPU
+(PyTorch) or on CPU (PyTorch, exported ONNX graph, or dynamic int8 ONNX).
 """
 
 import logging
 import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
 
-# Import CACHE_PATH from your config
-from src.modal_services.app_config import CACHE_PATH
+import numpy as np
 
-# Define the model directory using the imported CACHE_PATH
-E5_MODEL_DIR = f"{CACHE_PATH}/e5_model"
+from src.modal_services.artifacts import ArtifactSpec, get_resolver
+
+E5_SPEC = ArtifactSpec(
+    name="e5_model",
+    repo_id="intfloat/e5-small-v2",
+    patterns=("*.json", "*.txt", "*.safetensors", "*.bin"),
+)
+E5_ONNX_NAME = "e5_model_onnx"
+
+# Device: "auto" (cuda when available), "cuda" or "cpu".
+# Backend: "torch", "onnx" (fp32 graph) or "onnx-int8" (dynamic quantization).
+E5_DEVICE = os.getenv("SNAPR_E5_DEVICE", "auto")
+E5_BACKEND = os.getenv("SNAPR_E5_BACKEND", "torch")
+E5_ONNX_QCONFIG = os.getenv("SNAPR_E5_ONNX_QCONFIG", "avx2")  # or avx512_vnni, arm64
+
+# Recent description embeddings kept per container
+EMBEDDING_CACHE_SIZE = 256
+
+# CPU backends must stay this close (cosine) to the GPU embeddings
+PARITY_MIN_COSINE = 0.99
+PARITY_TEXTS = [
+    "Apple AirPods Pro 2nd generation with MagSafe USB-C charging case",
+    "Samsung 65-inch Crystal UHD 4K smart TV with HDR and voice assistant",
+    "Ninja 8-quart 2-basket air fryer with dual zone technology",
+    "Dell XPS 13 laptop, Intel Core i7, 16GB RAM, 512GB SSD, 13.4-inch FHD+",
+    "Bose QuietComfort wireless noise cancelling headphones, black",
+    "Instant Pot Duo 7-in-1 electric pressure cooker, 6 quart",
+    "LEGO Star Wars Millennium Falcon building set, 1351 pieces",
+    "Michelin Defender T+H all-season radial tire 225/65R17",
+]
+
+
+def resolve_device(device: str = E5_DEVICE) -> str:
+    """Map "auto" to cuda when a GPU is visible, else cpu."""
+    if device != "auto":
+        return device
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _export_onnx(model_dir: str) -> str:
+    """Export fp32 and int8 ONNX graphs once and record them in the manifest."""
+    from sentence_transformers import (
+        SentenceTransformer,
+        export_dynamic_quantized_onnx_model,
+    )
+
+    resolver = get_resolver()
+    onnx_dir = resolver.lookup(E5_ONNX_NAME)
+    if onnx_dir:
+        return onnx_dir
+
+    logging.info("[E5ModelBase] Exporting E5 to ONNX (one-time)...")
+    onnx_dir = resolver.local_dir(E5_ONNX_NAME)
+    staging_dir = f"{onnx_dir}.{os.getpid()}.tmp"
+    model = SentenceTransformer(model_dir, backend="onnx", device="cpu")
+    model.save_pretrained(staging_dir)
+    export_dynamic_quantized_onnx_model(model, E5_ONNX_QCONFIG, staging_dir)
+
+    shutil.rmtree(onnx_dir, ignore_errors=True)
+    os.rename(staging_dir, onnx_dir)
+    resolver.record(E5_ONNX_NAME)
+    return onnx_dir
+
+
+def load_e5_model(device: str = E5_DEVICE, backend: str = E5_BACKEND) -> Any:  # noqa: ANN401
+    """Load E5 as a SentenceTransformer on the requested device and backend.
+
+    The ONNX backends run on CPU only: "auto" maps to cpu, "cuda" is rejected.
+    """
+    if backend not in ("torch", "onnx", "onnx-int8"):
+        raise ValueError(f"Unknown E5 backend: {backend}")
+    if backend != "torch" and device == "cuda":
+        raise ValueError(f"The {backend} E5 backend runs on CPU only, not cuda.")
+
+    from sentence_transformers import SentenceTransformer
+
+    # Served from /cache/e5_model when the manifest matches
+    model_dir = get_resolver().resolve(E5_SPEC)
+    if backend == "torch":
+        return SentenceTransformer(model_dir, device=resolve_device(device))
+
+    onnx_dir = _export_onnx(model_dir)
+    file_name = (
+        f"onnx/model_qint8_{E5_ONNX_QCONFIG}.onnx"
+        if backend == "onnx-int8"
+        else "onnx/model.onnx"
+    )
+    return SentenceTransformer(
+        onnx_dir, backend="onnx", device="cpu", model_kwargs={"file_name": file_name}
+    )
+
+
+def parity_report(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Compare two embedding matrices row by row (cosine similarity)."""
+    ref = E5ModelBase.normalize(np.asarray(reference, dtype=np.float32))
+    cand = E5ModelBase.normalize(np.asarray(candidate, dtype=np.float32))
+    cosine = np.sum(ref * cand, axis=1)
+    return {
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "max_abs_diff": float(np.abs(ref - cand).max()),
+    }
 
 
 class E5ModelBase:
     """Base class for downloading and loading the E5 model."""
 
-    def setup_e5_model(self) -> None:
-        """Downloads and loads the E5 embedding model."""
+    def setup_e5_model(
+        self, device: Optional[str] = None, backend: Optional[str] = None
+    ) -> None:
+        """Resolves and loads the E5 embedding model."""
+        device = device or E5_DEVICE
+        backend = backend or E5_BACKEND
         try:
-            # Lazy imports to avoid issues in Docker
-            from huggingface_hub import snapshot_download
-            from sentence_transformers import SentenceTransformer
-
-            # Cache E5 embedding model into /cache/e5_model
-            os.makedirs(E5_MODEL_DIR, exist_ok=True)
-            if not os.listdir(E5_MODEL_DIR):
-                snapshot_download("intfloat/e5-small-v2", local_dir=E5_MODEL_DIR)
-                logging.info("E5 model downloaded.")
-
-            self.vectorizer = SentenceTransformer(E5_MODEL_DIR, device="cuda")
-            logging.info("E5 model loaded on GPU.")
+            self.attach_e5_model(load_e5_model(device, backend))
+            logging.info(f"E5 model loaded on {self.vectorizer.device} ({backend}).")
 
         except Exception as e:
             logging.error(f"[E5ModelBase] Failed to setup E5 model: {e}")
             raise RuntimeError("[E5ModelBase] E5 model setup failed.") from e
+
+    def attach_e5_model(self, vectorizer: Any) -> None:  # noqa: ANN401
+        """Uses an already loaded encoder (anything with `encode(texts)`)."""
+        self.vectorizer = vectorizer
+        self._embedding_cache = OrderedDict()
+        self._embedding_lock = threading.Lock()
+
+    def encode(self, descriptions: List[str]) -> np.ndarray:
+        """Encodes descriptions as raw (unnormalized) E5 passage embeddings."""
+        return self.vectorizer.encode(["passage: " + d for d in descriptions])
+
+    def embed(self, description: str) -> np.ndarray:
+        """Returns the raw embedding of one description, memoized per container."""
+        cache = self._embedding_cache
+        with self._embedding_lock:  # Services may run concurrent inputs
+            if description in cache:
+                cache.move_to_end(description)
+                return cache[description]
+
+        vector = self.encode([description])[0]
+        with self._embedding_lock:
+            cache[description] = vector
+            if len(cache) > EMBEDDING_CACHE_SIZE:
+                cache.popitem(last=False)
+        return vector
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalizes embeddings (what `normalize_embeddings=True` returns)."""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
@@ -0,0 +1,144 @@
+"""Co-located E5 pricing: XGBoost and RAG served from one container.
+
+Each description is embedded once; the raw vector feeds the XGBoost regressor
+and its normalized copy feeds the kNN lookup.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import modal
+import numpy as np
+
+from src.modal_services.app_config import app, concurrency_kwargs, service_kwargs
+from src.modal_services.e5_model_base import (
+    PARITY_MIN_COSINE,
+    PARITY_TEXTS,
+    E5ModelBase,
+    load_e5_model,
+    parity_report,
+)
+from src.modal_services.rag_pricer import RAGModelBase
+from src.modal_services.xgb_pricer import XGBModelBase
+
+logging.basicConfig(level=logging.INFO)
+
+
+class E5Service(E5ModelBase, XGBModelBase, RAGModelBase):
+    """Shared-embedding XGB and RAG pricing, served by Modal or run in-process."""
+
+    def setup(self) -> None:
+        """Load the E5 model once, then the XGBoost model and ChromaDB."""
+        try:
+            self.setup_e5_model()
+            self.setup_xgb_model()
+            self.setup_rag_store()
+        except Exception as e:
+            logging.error(f"[E5Pricer] Failed during setup: {e}")
+            raise RuntimeError("[E5Pricer] Setup failed.") from e
+
+    def price(
+        self,
+        description: str,
+        models: Sequence[str] = ("xgb", "rag"),
+        with_embedding: bool = False,
+    ) -> Dict[str, Any]:
+        """Predict XGB and/or RAG prices from a single embedding of the description.
+
+        The embedding is memoized, so asking for "xgb" then "rag" encodes once.
+        With `with_embedding`, the normalized embedding is returned as well
+        ("embedding"), for the semantic estimate cache.
+        """
+        try:
+            logging.info("[E5Pricer] Encoding description...")
+            vector = self.embed(description)
+        except Exception as e:
+            logging.error(f"[E5Pricer] Failed to encode description: {e}")
+            if with_embedding:
+                raise
+            return {model: 0.0 for model in models}
+
+        results: Dict[str, Any] = {}
+        if with_embedding:
+            results["embedding"] = self.normalize(vector).tolist()
+        if "xgb" in models:
+            try:
+                results["xgb"] = self.predict_xgb(vector[np.newaxis, :])[0]
+            except Exception as e:
+                logging.error(f"[E5Pricer] XGB prediction failed: {e}")
+                results["xgb"] = 0.0
+        if "rag" in models:
+            try:
+                embedding = self.normalize(vector)
+                results["rag"] = self.predict_rag(description, embedding)
+            except Exception as e:
+                logging.error(f"[E5Pricer] RAG prediction failed: {e}")
+                results["rag"] = 0.0
+        return results
+
+    def price_batch(self, descriptions: List[str]) -> List[Dict[str, float]]:
+        """Predict XGB and RAG prices for many descriptions with one encode."""
+        try:
+            vectors = self.encode(descriptions)
+        except Exception as e:
+            logging.error(f"[E5Pricer] Failed to encode batch: {e}")
+            return [{"xgb": 0.0, "rag": 0.0} for _ in descriptions]
+
+        try:
+            xgb_preds = self.predict_xgb(vectors)
+        except Exception as e:
+            logging.error(f"[E5Pricer] XGB batch prediction failed: {e}")
+            xgb_preds = [0.0] * len(descriptions)
+
+        rag_preds = self.predict_rag_batch(descriptions, self.normalize(vectors))
+        return [{"xgb": xgb, "rag": rag} for xgb, rag in zip(xgb_preds, rag_preds)]
+
+    def warmup(self) -> bool:
+        """Cheap health check: answers once setup has loaded the models."""
+        return True
+
+
+@app.cls(**service_kwargs("e5"))
+@modal.concurrent(**concurrency_kwargs("e5"))
+class E5Pricer(E5Service):
+    """Remote XGB and RAG pricing sharing one E5 model and embedding."""
+
+    @modal.enter()
+    def setup(self) -> None:
+        """Load the E5 model once, then the XGBoost model and ChromaDB."""
+        super().setup()
+
+    @modal.method()
+    def price(
+        self,
+        description: str,
+        models: Sequence[str] = ("xgb", "rag"),
+        with_embedding: bool = False,
+    ) -> Dict[str, Any]:
+        """Predict XGB and/or RAG prices from a single embedding of the description."""
+        return super().price(description, models, with_embedding)
+
+    @modal.method()
+    def price_batch(self, descriptions: List[str]) -> List[Dict[str, float]]:
+        """Predict XGB and RAG prices for many descriptions in one call."""
+        return super().price_batch(descriptions)
+
+    @modal.method()
+    def warmup(self) -> bool:
+        """Start (or keep) a container with the models loaded; no prediction."""
+        return super().warmup()
+
+
+@app.function(**service_kwargs("e5"))
+def check_e5_parity(texts: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    """Compare CPU backends (torch, ONNX, int8 ONNX) against GPU embeddings."""
+    passages = ["passage: " + t for t in (texts or PARITY_TEXTS)]
+    reference = load_e5_model("cuda", "torch").encode(passages)
+
+    report = {}
+    for backend in ("torch", "onnx", "onnx-int8"):
+        candidate = load_e5_model("cpu", backend).encode(passages)
+        report[backend] = parity_report(reference, candidate)
+        status = "✅" if report[backend]["min_cosine"] >= PARITY_MIN_COSINE else "⚠️"
+        logging.info(f"[E5Pricer] {status} cpu/{backend} vs cuda: {report[backend]}")
+    return report
@@ -5,73 +5,140 @@ Combines outputs from multiple agents using an ensemble model.
 
 # Standard library imports
 import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
 
 import modal
 
 # Third-party imports
 # Local imports
+from src.config.constants import MODEL_VERSIONS_TTL_S
 from src.modal_services.app_config import (
-    CACHE_PATH,
     app,
-    modal_class_kwargs,
+    cache_vol,
+    concurrency_kwargs,
+    service_kwargs,
 )
+from src.modal_services.artifacts import ArtifactSpec, get_resolver
+from src.models.ensemble_model import LinearEnsemble
 
 # Configure logging after all imports
 logging.basicConfig(level=logging.INFO)
 
 REPO_ID = "lisekarimi/smart-deal-finder-models"
 
-# Local paths inside Modal volume
-ENSEMBLE_MODEL_DIR = f"{CACHE_PATH}/ensemble_model"
 ENSEMBLE_MODEL_FILENAME = "ensemble_model.pkl"
 
+# Materialized as /cache/ensemble_model/ensemble_model.pkl
+ENSEMBLE_SPEC = ArtifactSpec(
+    name="ensemble_model", repo_id=REPO_ID, patterns=(ENSEMBLE_MODEL_FILENAME,)
+)
 
-@app.cls(**modal_class_kwargs)
-class EnsemblePricer:
-    """Modal class for ensemble price prediction from agent outputs."""
 
-    @modal.enter()
+class EnsembleService:
+    """Linear ensemble logic, served by Modal or run in-process."""
+
     def setup(self) -> None:
-        """Loads ensemble model from Hugging Face into Modal cache."""
+        """Loads ensemble model from the Modal cache (Hugging Face if missing)."""
         try:
-            # Lazy load hf_hub_download and joblib
+            # Lazy load joblib
             import joblib
-            from huggingface_hub import hf_hub_download
-
-            logging.info("Downloading Ensemble model...")
-            model_path = hf_hub_download(
-                repo_id=REPO_ID,
-                filename=ENSEMBLE_MODEL_FILENAME,
-                cache_dir=ENSEMBLE_MODEL_DIR,
-            )
 
-            logging.info("Ensemble model downloaded.")
-            self.model = joblib.load(model_path)
+            model_dir = get_resolver().resolve(ENSEMBLE_SPEC)
+            self.model = joblib.load(os.path.join(model_dir, ENSEMBLE_MODEL_FILENAME))
+            self.combiner = LinearEnsemble.from_estimator(self.model)
             logging.info("Ensemble model loaded successfully.")
 
         except Exception as e:
             logging.error(f"[EnsemblePricer] Failed during setup: {e}")
             raise RuntimeError("[EnsemblePricer] Setup failed.") from e
 
-    @modal.method()
     def price(self, ft: float, rag: float, xgb: float) -> float:
         """Predicts final price using ensemble of 3 models."""
         try:
-            # Lazy load pandas and numpy for feature creation
-            import numpy as np
-            import pandas as pd
-
-            features = pd.DataFrame(
-                {
-                    "FT_LLaMA": [ft],
-                    "GPT4oMini": [rag],
-                    "XGBoost": [xgb],
-                    "Max": [max(ft, rag, xgb)],
-                    "Mean": [np.mean([ft, rag, xgb])],
-                }
-            )
-            prediction = self.model.predict(features)[0]
-            return round(float(prediction), 2)
+            return self.combiner.predict(ft, rag, xgb)
         except Exception as e:
             logging.error(f"[EnsemblePricer] Prediction failed: {e}")
             return 0.0
+
+    def price_batch(self, predictions: List[List[float]]) -> List[float]:
+        """Predicts final prices for rows of [ft, rag, xgb] predictions."""
+        return self.combiner.predict_batch(predictions)
+
+    def price_partial(
+        self, ft: Optional[float], rag: Optional[float], xgb: Optional[float]
+    ) -> float:
+        """Predicts final price when some predictions were skipped (None).
+
+        Raises ValueError without a subset model for the available predictions.
+        """
+        if not self.combiner.has_subset_model(ft, rag, xgb):
+            raise ValueError("[EnsemblePricer] No subset model for these predictions.")
+        try:
+            return self.combiner.predict_partial(ft, rag, xgb)
+        except Exception as e:
+            logging.error(f"[EnsemblePricer] Partial prediction failed: {e}")
+            return 0.0
+
+    def coefficients(self) -> Dict[str, Any]:
+        """Returns the linear model coefficients for in-process evaluation."""
+        return self.combiner.to_dict()
+
+    def model_versions(self) -> Dict[str, str]:
+        """Fingerprints of every model's artifacts, from the manifest."""
+        # Imported here: versions reads ENSEMBLE_SPEC from this module
+        from src.modal_services.versions import collect_model_versions
+
+        return collect_model_versions()
+
+    def warmup(self) -> bool:
+        """Cheap health check: answers once setup has loaded the models."""
+        return True
+
+
+@app.cls(**service_kwargs("ensemble"))
+@modal.concurrent(**concurrency_kwargs("ensemble"))
+class EnsemblePricer(EnsembleService):
+    """Modal class for ensemble price prediction from agent outputs."""
+
+    @modal.enter()
+    def setup(self) -> None:
+        """Loads ensemble model from the Modal cache (Hugging Face if missing)."""
+        super().setup()
+        self._volume_read_at = time.monotonic()
+
+    @modal.method()
+    def price(self, ft: float, rag: float, xgb: float) -> float:
+        """Predicts final price using ensemble of 3 models."""
+        return super().price(ft, rag, xgb)
+
+    @modal.method()
+    def price_batch(self, predictions: List[List[float]]) -> List[float]:
+        """Predicts final prices for rows of [ft, rag, xgb] predictions."""
+        return super().price_batch(predictions)
+
+    @modal.method()
+    def price_partial(
+        self, ft: Optional[float], rag: Optional[float], xgb: Optional[float]
+    ) -> float:
+        """Predicts final price when some predictions were skipped (None)."""
+        return super().price_partial(ft, rag, xgb)
+
+    @modal.method()
+    def coefficients(self) -> Dict[str, Any]:
+        """Returns the linear model coefficients for in-process evaluation."""
+        return super().coefficients()
+
+    @modal.method()
+    def model_versions(self) -> Dict[str, str]:
+        """Model fingerprints, seeing other containers' uploads within a TTL."""
+        if time.monotonic() - self._volume_read_at >= MODEL_VERSIONS_TTL_S:
+            cache_vol.reload()  # See manifests written by other containers
+            self._volume_read_at = time.monotonic()
+        return super().model_versions()
+
+    @modal.method()
+    def warmup(self) -> bool:
+        """Start (or keep) a container with the models loaded; no prediction."""
+        return super().warmup()
@@ -6,6 +6,7 @@ import modal
 from dotenv import load_dotenv
 
 from src.modal_services.app_config import app
+from src.modal_services.e5_pricer import E5Pricer
 from src.modal_services.ensemble_pricer import EnsemblePricer
 from src.modal_services.ft_pricer import FTPricer
 from src.modal_services.rag_pricer import RAGPricer
@@ -21,4 +22,12 @@ if not MODAL_TOKEN_ID or not MODAL_TOKEN_SECRET:
     raise ValueError("❌ Missing Modal tokens!")
 
 # These imports are required for Modal class registration
-__all__ = ["FTPricer", "XGBPricer", "RAGPricer", "EnsemblePricer", "app", "modal"]
+__all__ = [
+    "FTPricer",
+    "XGBPricer",
+    "RAGPricer",
+    "E5Pricer",
+    "EnsemblePricer",
+    "app",
+    "modal",
+]
@@ -2,11 +2,18 @@
 
 import logging
 import os
-from typing import Any
+from typing import Any, Callable, List, Optional
 
 import modal
 
-from src.modal_services.app_config import CACHE_PATH, app, modal_class_kwargs
+from src.modal_services.app_config import (
+    CACHE_PATH,
+    app,
+    cache_vol,
+    concurrency_kwargs,
+    service_kwargs,
+)
+from src.modal_services.artifacts import ArtifactSpec, get_resolver
 from src.utils.text_utils import extract_tagged_price
 
 logging.basicConfig(level=logging.INFO)
@@ -16,17 +23,51 @@ BASE_MODEL = "meta-llama/Meta-Llama-3.1-8B"
 FINETUNED_MODEL = "ed-donner/pricer-2024-09-13_13.04.39"
 REVISION = "e8d637df551603dc86cd7a1598a8f44af4d7ae36"
 
+# Artifacts in the volume (the `original/` Meta checkpoint is not needed)
+BASE_SPEC = ArtifactSpec(
+    name="llama_base_model",
+    repo_id=BASE_MODEL,
+    patterns=("*.json", "*.safetensors"),
+)
+FINETUNED_SPEC = ArtifactSpec(
+    name="llama_finetuned_model", repo_id=FINETUNED_MODEL, revision=REVISION
+)
+
 # Local model paths in volume
-BASE_MODEL_DIR = f"{CACHE_PATH}/llama_base_model"
-FINETUNED_MODEL_DIR = f"{CACHE_PATH}/llama_finetuned_model"
+BASE_MODEL_DIR = f"{CACHE_PATH}/{BASE_SPEC.name}"
+FINETUNED_MODEL_DIR = f"{CACHE_PATH}/{FINETUNED_SPEC.name}"
+
+# Pre-merged, pre-quantized checkpoint built once by `build_merged_model`
+MERGED_MODEL_NAME = "llama_merged_4bit"
+MERGED_MODEL_DIR = f"{CACHE_PATH}/{MERGED_MODEL_NAME}"
 
 QUESTION = "How much does this cost to the nearest dollar?"
 PREFIX = "Price is $"
 
 
-@app.cls(**modal_class_kwargs)
-class FTPricer:
-    """Remote pricing with LLaMA, PEFT, and 4-bit quantization."""
+def _download_models() -> None:
+    resolver = get_resolver()
+    resolver.resolve(BASE_SPEC)
+    resolver.resolve(FINETUNED_SPEC)
+
+
+def _quantization_config() -> Any:  # noqa: ANN401
+    import torch
+    from transformers import BitsAndBytesConfig
+
+    return BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_use_double_quant=True,
+        bnb_4bit_compute_dtype=torch.bfloat16,
+        bnb_4bit_quant_type="nf4",
+    )
+
+
+class FTService:
+    """Fine-tuned LLaMA pricing logic, served by Modal or run in-process."""
+
+    # Optional stand-in for the LLM: prompt -> generated text
+    llm: Optional[Callable[[str], str]] = None
 
     @staticmethod
     def _build_prompt(description: str) -> str:
@@ -45,15 +86,6 @@ class FTPricer:
             outputs = model.generate(**inputs, max_new_tokens=5, num_return_sequences=1)
         return tokenizer.decode(outputs[0])
 
-    @staticmethod
-    def _download_models() -> None:
-        from huggingface_hub import snapshot_download
-
-        snapshot_download(BASE_MODEL, local_dir=BASE_MODEL_DIR)
-        snapshot_download(
-            FINETUNED_MODEL, revision=REVISION, local_dir=FINETUNED_MODEL_DIR
-        )
-
     def _load_tokenizer(self) -> None:
         from transformers import AutoTokenizer
 
@@ -62,60 +94,87 @@ class FTPricer:
         self.tokenizer.padding_side = "right"
         logging.info("Tokenizer loaded.")
 
+    @staticmethod
+    def _has_merged_model() -> bool:
+        """True once the merged checkpoint is complete in the manifest."""
+        return get_resolver().lookup(MERGED_MODEL_NAME) is not None
+
+    def _configure_generation(self) -> None:
+        self.fine_tuned_model.eval()
+        gen_config = self.fine_tuned_model.generation_config
+        gen_config.pad_token_id = self.tokenizer.pad_token_id
+        gen_config.eos_token_id = self.tokenizer.eos_token_id
+
+    def _load_merged_model(self) -> None:
+        """Load the ready-to-use 4-bit checkpoint: no PEFT, no re-quantization."""
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(MERGED_MODEL_DIR)
+        self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.tokenizer.padding_side = "right"
+
+        # The quantization config is stored with the weights, so the 4-bit
+        # tensors are loaded as-is instead of being quantized on the fly.
+        self.fine_tuned_model = AutoModelForCausalLM.from_pretrained(
+            MERGED_MODEL_DIR, device_map="auto"
+        )
+        self._configure_generation()
+        logging.info("Merged 4-bit model loaded.")
+
     def _load_models(self) -> None:
-        import torch
         from peft import PeftModel
-        from transformers import AutoModelForCausalLM, BitsAndBytesConfig
+        from transformers import AutoModelForCausalLM
 
         base_model = AutoModelForCausalLM.from_pretrained(
             BASE_MODEL_DIR,
-            quantization_config=BitsAndBytesConfig(
-                load_in_4bit=True,
-                bnb_4bit_use_double_quant=True,
-                bnb_4bit_compute_dtype=torch.bfloat16,
-                bnb_4bit_quant_type="nf4",
-            ),
+            quantization_config=_quantization_config(),
             device_map="auto",
         )
 
         self.fine_tuned_model = PeftModel.from_pretrained(
             base_model, FINETUNED_MODEL_DIR, revision=REVISION
         )
-        self.fine_tuned_model.eval()
-        gen_config = self.fine_tuned_model.generation_config
-        gen_config.pad_token_id = self.tokenizer.pad_token_id
-        gen_config.eos_token_id = self.tokenizer.eos_token_id
+        self._configure_generation()
         logging.info("Models loaded.")
 
-    @modal.enter()
     def setup(self) -> None:
         """Load base and fine-tuned models with tokenizer and quantization."""
         try:
+            if self._has_merged_model():
+                self._load_merged_model()
+                return
+
+            logging.warning(
+                "[FTPricer] No merged checkpoint found, falling back to base + "
+                "adapter. Run `make build-ft-artifact` to speed up cold starts."
+            )
             os.makedirs(CACHE_PATH, exist_ok=True)
-            self._download_models()
-            logging.info("Base and fine-tuned models downloaded.")
+            _download_models()
+            logging.info("Base and fine-tuned models ready.")
             self._load_tokenizer()
             self._load_models()
         except Exception as e:
             logging.error(f"[FTPricer] Setup failed: {e}")
             raise RuntimeError("[FTPricer] Model setup failed") from e
 
-    @modal.method()
-    def price(self, description: str) -> float:
-        """Generate a price estimate based on a product description."""
+    def generate(self, prompt: str) -> str:
+        """Run the fine-tuned model (or the configured stand-in) on a prompt."""
+        if self.llm is not None:
+            return self.llm(prompt)
+
         from transformers import set_seed
 
+        set_seed(42)
+        inputs = self.tokenizer(prompt, return_tensors="pt", padding=True).to(
+            self.fine_tuned_model.device
+        )
+        return self._generate_output(self.fine_tuned_model, inputs, self.tokenizer)
+
+    def _price_one(self, description: str) -> float:
         try:
-            set_seed(42)
             logging.info("[FTPricer] Generating price...")
 
-            prompt = self._build_prompt(description)
-            inputs = self.tokenizer(prompt, return_tensors="pt", padding=True).to(
-                "cuda"
-            )
-            result = self._generate_output(
-                self.fine_tuned_model, inputs, self.tokenizer
-            )
+            result = self.generate(self._build_prompt(description))
             price = extract_tagged_price(result)
 
             logging.info(f"[FTPricer] Predicted price: {price}")
@@ -124,3 +183,90 @@ class FTPricer:
         except Exception as e:
             logging.error(f"[FTPricer] Prediction failed: {e}")
             return 0.0
+
+    def price(self, description: str) -> float:
+        """Generate a price estimate based on a product description."""
+        return self._price_one(description)
+
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """Generate price estimates for many descriptions, one at a time."""
+        # Right-padded batched generation would corrupt the shorter prompts.
+        # Not self.price: in the Modal class that is a method handle.
+        return [self._price_one(description) for description in descriptions]
+
+    def warmup(self) -> bool:
+        """Cheap health check: answers once setup has loaded the models."""
+        return True
+
+
+@app.cls(**service_kwargs("ft"))
+@modal.concurrent(**concurrency_kwargs("ft"))
+class FTPricer(FTService):
+    """Remote pricing with LLaMA, PEFT, and 4-bit quantization."""
+
+    @modal.enter()
+    def setup(self) -> None:
+        """Load base and fine-tuned models with tokenizer and quantization."""
+        super().setup()
+
+    @modal.method()
+    def price(self, description: str) -> float:
+        """Generate a price estimate based on a product description."""
+        return super().price(description)
+
+    @modal.method()
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """Generate price estimates for many descriptions in one call."""
+        return super().price_batch(descriptions)
+
+    @modal.method()
+    def warmup(self) -> bool:
+        """Start (or keep) a container with the models loaded; no prediction."""
+        return super().warmup()
+
+
+@app.function(**service_kwargs("ft_build"))
+def build_merged_model() -> None:
+    """One-time build of the merged, 4-bit FT checkpoint into the cache volume.
+
+    The LoRA adapter is merged into bf16 base weights (merging into 4-bit
+    weights is lossy), then the merged model is quantized once and saved with
+    its quantization config so `FTPricer.setup` can load it directly.
+    """
+    import shutil
+
+    import torch
+    from peft import PeftModel
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    _download_models()
+    staging_dir = f"{MERGED_MODEL_DIR}.tmp"
+    bf16_dir = f"{staging_dir}/bf16"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    logging.info("[FTPricer] Merging adapter into bf16 base weights...")
+    base_model = AutoModelForCausalLM.from_pretrained(
+        BASE_MODEL_DIR, torch_dtype=torch.bfloat16, device_map="cpu"
+    )
+    merged = PeftModel.from_pretrained(
+        base_model, FINETUNED_MODEL_DIR, revision=REVISION
+    ).merge_and_unload()
+    merged.save_pretrained(bf16_dir)
+    del base_model, merged
+
+    logging.info("[FTPricer] Quantizing merged model to 4-bit...")
+    quantized = AutoModelForCausalLM.from_pretrained(
+        bf16_dir,
+        quantization_config=_quantization_config(),
+        device_map="auto",
+    )
+    quantized.save_pretrained(staging_dir)
+    AutoTokenizer.from_pretrained(BASE_MODEL_DIR).save_pretrained(staging_dir)
+    shutil.rmtree(bf16_dir)
+
+    # Swap the finished checkpoint in, then record it as complete
+    shutil.rmtree(MERGED_MODEL_DIR, ignore_errors=True)
+    os.rename(staging_dir, MERGED_MODEL_DIR)
+    get_resolver().record(MERGED_MODEL_NAME)
+    cache_vol.commit()
+    logging.info(f"[FTPricer] Merged checkpoint saved to {MERGED_MODEL_DIR}")
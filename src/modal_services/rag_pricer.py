@@ -1,22 +1,33 @@
 """Predicts item prices using RAG (Retrieval Augmented Generation).
 
-With ChromaDB, E5 embeddings, and GPT-4o-mini.
+With ChromaDB, E5 embeddings, and GPT-4o-mini. In "fast" mode, the GPT call
+is skipped when the retrieved neighbours are close and agree on the price:
+their similarity-weighted average is returned instead. Batches can be priced
+several products per GPT call, each with its own retrieved context.
 """
 
 # Standard library imports
+import json
 import logging
 import os
-import zipfile
+from typing import Any, Callable, Dict, List, Optional
 
 import modal
 
 # Third-party imports
 import numpy as np
-import requests
 
 # Local imports
-from src.modal_services.app_config import CACHE_PATH, app, modal_class_kwargs
+from src.modal_services.app_config import (
+    CACHE_PATH,
+    app,
+    concurrency_kwargs,
+    service_kwargs,
+)
+from src.modal_services.artifacts import get_resolver
+from src.modal_services.downloads import ensure_extracted_archive
 from src.modal_services.e5_model_base import E5ModelBase
+from src.modal_services.vector_index import FlatVectorIndex
 from src.models.frontier_model import OPENAI_MODEL
 from src.utils.text_utils import extract_price
 
@@ -24,60 +35,145 @@ from src.utils.text_utils import extract_price
 logging.basicConfig(level=logging.INFO)
 
 # Paths
-E5_MODEL_DIR = f"{CACHE_PATH}/e5_model"
 CHROMA_DIR = f"{CACHE_PATH}/chroma"
 CHROMA_ZIP_URL = "https://aiprojects-lise-karimi.s3.eu-west-3.amazonaws.com/smart-deal-finder/chroma.zip"
+# SHA-256 of the published archive (`sha256sum chroma.zip`), overridable with
+# SNAPR_CHROMA_SHA256 when the archive is re-published. Unpinned (None), the
+# archive is checked member by member (CRC) before it is trusted.
+CHROMA_ZIP_PINNED_SHA256: Optional[str] = None
+CHROMA_ZIP_SHA256 = os.getenv("SNAPR_CHROMA_SHA256") or CHROMA_ZIP_PINNED_SHA256
 COLLECTION_NAME = "price_items"
 
+# Retrieval engine: "flat" (memory-mapped exact kNN, exported once from Chroma)
+# or "chroma" (PersistentClient query)
+RETRIEVAL_ENGINE = os.getenv("SNAPR_RETRIEVAL_ENGINE", "flat")
+FLAT_INDEX_NAME = "flat_index"
+FLAT_INDEX_DTYPE = os.getenv("SNAPR_FLAT_INDEX_DTYPE", "float32")  # or float16
+N_SIMILAR = 5
 
-@app.cls(**modal_class_kwargs)
-class RAGPricer(E5ModelBase):
-    """Remote class for pricing products using RAG pipeline."""
+# "llm" (always ask GPT) or "fast" (kNN estimate when the neighbours agree)
+RAG_MODE = os.getenv("SNAPR_RAG_MODE", "llm")
+# Fast path only if every neighbour is at least this similar (cosine)...
+KNN_MIN_SIMILARITY = float(os.getenv("SNAPR_KNN_MIN_SIMILARITY", "0.85"))
+# ...and their prices' weighted std / weighted mean is at most this
+KNN_MAX_DISPERSION = float(os.getenv("SNAPR_KNN_MAX_DISPERSION", "0.15"))
 
-    @modal.enter()
-    def setup(self) -> None:
-        """Load E5 embedding model, ChromaDB and OpenAI client."""
-        try:
-            # Lazy load the required modules
-            import chromadb
+# Products per GPT call in `price_batch` (1: one call per product)
+RAG_BATCH_SIZE = int(os.getenv("SNAPR_RAG_BATCH_SIZE", "1"))
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "prices",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"prices": {"type": "array", "items": {"type": "number"}}},
+            "required": ["prices"],
+            "additionalProperties": False,
+        },
+    },
+}
 
-            # Setup E5 model using the base class method
-            self.setup_e5_model()
 
-            # ChromaDB setup remains the same
-            if not os.path.exists(CHROMA_DIR):
-                os.makedirs(CHROMA_DIR, exist_ok=True)
-                r = requests.get(CHROMA_ZIP_URL)
-                with open("/tmp/chroma.zip", "wb") as f:
-                    f.write(r.content)
-                with zipfile.ZipFile("/tmp/chroma.zip", "r") as zip_ref:
-                    zip_ref.extractall(CHROMA_DIR)
-            logging.info("ChromaDB ready.")
+def parse_batch_prices(reply: str, count: int) -> Optional[List[float]]:
+    """Prices from a batched reply ({"prices": [...]}), or None if malformed."""
+    try:
+        data = json.loads(reply)
+    except (TypeError, ValueError):
+        return None
+    prices = data.get("prices") if isinstance(data, dict) else data
+    if not isinstance(prices, list) or len(prices) != count:
+        return None
+    if not all(isinstance(p, (int, float)) and not isinstance(p, bool) for p in prices):
+        return None
+    return [round(float(p), 2) for p in prices]
 
-            self.chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
-            self.collection = self.chroma_client.get_collection(name=COLLECTION_NAME)
-            logging.info("ChromaDB client ready.")
 
-        except Exception as e:
-            logging.error(f"[RAGPricer] Failed during setup: {e}")
-            raise RuntimeError("[RAGPricer] Setup failed.") from e
+def knn_price(
+    prices: List[float],
+    similarities: List[float],
+    min_similarity: float = KNN_MIN_SIMILARITY,
+    max_dispersion: float = KNN_MAX_DISPERSION,
+) -> Optional[float]:
+    """Similarity-weighted neighbour price, or None if the neighbours disagree."""
+    if not prices or min(similarities) < min_similarity:
+        return None
+    weights = np.asarray(similarities, dtype=np.float64)
+    values = np.asarray(prices, dtype=np.float64)
+    mean = float(np.average(values, weights=weights))
+    if mean <= 0:
+        return None
+    spread = float(np.sqrt(np.average((values - mean) ** 2, weights=weights)))
+    return mean if spread / mean <= max_dispersion else None
 
-    def _get_embedding(self, item: str) -> np.ndarray:
-        """Encodes the item description into embeddings using the E5 model."""
-        return self.vectorizer.encode(["passage: " + item], normalize_embeddings=True)
 
-    def _find_similar_items(self, item: str) -> tuple[list[str], list[float]]:
-        """Finds similar items from ChromaDB based on embeddings."""
-        query_emb = self._get_embedding(item).astype(float).tolist()
-        results = self.collection.query(query_embeddings=query_emb, n_results=5)
-        documents = results["documents"][0][:]
-        prices = [m["price"] for m in results["metadatas"][0][:]]
+class RAGModelBase:
+    """Base class for the ChromaDB retrieval and GPT-4o-mini pricing steps."""
+
+    # Optional stand-in for the OpenAI call: messages -> reply text
+    llm: Optional[Callable[[List[Dict[str, str]]], str]] = None
+    rag_mode: str = RAG_MODE
+
+    def setup_rag_store(self, engine: str = RETRIEVAL_ENGINE) -> None:
+        """Opens the retrieval store, exporting the flat index on first use."""
+        self.retrieval_engine = engine
+        if engine == "flat":
+            resolver = get_resolver()
+            index_dir = resolver.lookup(FLAT_INDEX_NAME)
+            if index_dir is None:
+                self._open_chroma()
+                index_dir = resolver.local_dir(FLAT_INDEX_NAME)
+                FlatVectorIndex.export_from_chroma(
+                    self.collection, index_dir, FLAT_INDEX_DTYPE
+                )
+                resolver.record(FLAT_INDEX_NAME)
+            self.index = FlatVectorIndex.load(index_dir)
+            logging.info(f"Flat index ready ({len(self.index)} items).")
+        else:
+            self._open_chroma()
+
+    def _open_chroma(self) -> None:
+        """Downloads (if needed) and opens the ChromaDB collection."""
+        # Lazy load the required modules
+        import chromadb
+
+        # Streamed, resumable, verified and atomically extracted into /cache
+        ensure_extracted_archive(CHROMA_ZIP_URL, CHROMA_DIR, CHROMA_ZIP_SHA256)
+        logging.info("ChromaDB ready.")
+
+        self.chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
+        self.collection = self.chroma_client.get_collection(name=COLLECTION_NAME)
+        logging.info("ChromaDB client ready.")
+
+    def _find_similar_items(
+        self, embedding: np.ndarray
+    ) -> tuple[list[str], list[float], list[float]]:
+        """Finds similar items (documents, prices, cosine similarities)."""
+        if self.retrieval_engine == "flat":
+            documents, prices, similarities = self.index.query(embedding, k=N_SIMILAR)
+        else:
+            query_emb = embedding.reshape(1, -1).astype(float).tolist()
+            results = self.collection.query(
+                query_embeddings=query_emb,
+                n_results=N_SIMILAR,
+                include=["documents", "metadatas", "distances"],
+            )
+            documents = results["documents"][0][:]
+            prices = [m["price"] for m in results["metadatas"][0][:]]
+            similarities = self._chroma_similarities(results["distances"][0])
 
         # Log similar items and their prices
         for doc, price in zip(documents, prices):
             logging.info(f"[RAGPricer] Similar item: '{doc}' | Price: ${price:.2f}")
 
-        return documents, prices
+        return documents, prices, similarities
+
+    def _chroma_similarities(self, distances: List[float]) -> List[float]:
+        """Cosine similarities from Chroma distances (embeddings are normalized)."""
+        space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        if space == "l2":  # Squared L2: 2 - 2 cos
+            return [1.0 - d / 2.0 for d in distances]
+        return [1.0 - d for d in distances]  # "cosine" and "ip": 1 - cos
 
     def _format_context(self, similars: list[str], prices: list[float]) -> str:
         """Formats the context for the RAG pipeline."""
@@ -115,27 +211,205 @@ class RAGPricer(E5ModelBase):
             {"role": "assistant", "content": "Price is $"},
         ]
 
-    @modal.method()
-    def price(self, description: str) -> float:
-        """Predicts price from description using RAG and Frontier."""
-        try:
-            logging.info("[RAGPricer] Searching similar items...")
-            documents, prices = self._find_similar_items(description)
-            messages = self._build_messages(
-                {"description": description}, documents, prices
+    def _build_batch_messages(
+        self, items: List[Dict[str, Any]]
+    ) -> list[dict[str, str]]:
+        """Builds one request pricing several products, each with its context."""
+        system_message = (
+            "You are a pricing expert. "
+            "Given several products, each with a few similar products and their "
+            "prices, you must estimate the most likely price of every product. "
+            'Respond ONLY with JSON: {"prices": [...]}, one number per product, '
+            "in the order given."
+        )
+        user_prompt = f"Estimate the prices of the following {len(items)} products.\n\n"
+        for number, item in enumerate(items, start=1):
+            user_prompt += (
+                f"### Product {number}\n{item['description']}\n\n"
+                + self._format_context(item["documents"], item["prices"])
             )
 
-            # Lazy import OpenAI API
-            import openai
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_prompt},
+        ]
 
-            response = openai.chat.completions.create(
-                model=OPENAI_MODEL, messages=messages, seed=42, max_tokens=5
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 5,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Sends the prompt to GPT-4o-mini (or the configured stand-in)."""
+        if self.llm is not None:
+            return self.llm(messages)
+
+        # Lazy import OpenAI API
+        import openai
+
+        extra = {"response_format": response_format} if response_format else {}
+        response = openai.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=messages,
+            seed=42,
+            max_tokens=max_tokens,
+            **extra,
+        )
+        return response.choices[0].message.content
+
+    def _neighbours(self, embedding: np.ndarray) -> Dict[str, Any]:
+        """Retrieved neighbours, with the kNN price when the fast path applies."""
+        documents, prices, similarities = self._find_similar_items(embedding)
+        knn = knn_price(prices, similarities) if self.rag_mode == "fast" else None
+        return {"documents": documents, "prices": prices, "knn": knn}
+
+    def _llm_price(self, description: str, neighbours: Dict[str, Any]) -> float:
+        """Single-product GPT call."""
+        messages = self._build_messages(
+            {"description": description},
+            neighbours["documents"],
+            neighbours["prices"],
+        )
+        return extract_price(self.complete(messages))
+
+    def predict_rag(self, description: str, embedding: np.ndarray) -> float:
+        """Predicts price from a description and its normalized E5 embedding."""
+        logging.info("[RAGPricer] Searching similar items...")
+        neighbours = self._neighbours(embedding)
+        if neighbours["knn"] is not None:
+            logging.info(
+                f"[RAGPricer] Neighbours agree, kNN price: {neighbours['knn']:.2f}"
             )
-            reply = response.choices[0].message.content
-            price = extract_price(reply)
+            return neighbours["knn"]
+        if self.rag_mode == "fast":
+            logging.info("[RAGPricer] Neighbours disagree, asking the LLM...")
+
+        price = self._llm_price(description, neighbours)
+        logging.info(f"[RAGPricer] Predicted price: {price}")
+        return price
+
+    def predict_rag_batch(
+        self,
+        descriptions: List[str],
+        embeddings: np.ndarray,
+        batch_size: Optional[int] = None,
+    ) -> List[float]:
+        """Predicts many prices with `batch_size` products per GPT call.
 
-            logging.info(f"[RAGPricer] Predicted price: {price}")
-            return price
+        A group whose reply cannot be parsed (or whose call fails) is priced
+        again one product at a time; failed products get 0.0.
+        """
+        batch_size = batch_size or RAG_BATCH_SIZE
+        results: List[Optional[float]] = [None] * len(descriptions)
+        pending = []
+        for i, (description, embedding) in enumerate(zip(descriptions, embeddings)):
+            try:
+                neighbours = self._neighbours(embedding)
+            except Exception as e:
+                logging.error(f"[RAGPricer] Retrieval failed: {e}")
+                results[i] = 0.0
+                continue
+            if neighbours["knn"] is not None:
+                results[i] = neighbours["knn"]
+            else:
+                pending.append({"index": i, "description": description, **neighbours})
+
+        calls = 0
+        for start in range(0, len(pending), batch_size):
+            group = pending[start : start + batch_size]
+            prices = None
+            if len(group) > 1:
+                calls += 1
+                try:
+                    reply = self.complete(
+                        self._build_batch_messages(group),
+                        max_tokens=16 * len(group) + 16,
+                        response_format=BATCH_RESPONSE_FORMAT,
+                    )
+                    prices = parse_batch_prices(reply, len(group))
+                except Exception as e:
+                    logging.error(f"[RAGPricer] Batched LLM call failed: {e}")
+                if prices is None:
+                    logging.warning(
+                        "[RAGPricer] Unusable batched reply, pricing one by one."
+                    )
+            if prices is None:
+                prices = []
+                for item in group:
+                    calls += 1
+                    try:
+                        prices.append(self._llm_price(item["description"], item))
+                    except Exception as e:
+                        logging.error(f"[RAGPricer] Failed to predict price: {e}")
+                        prices.append(0.0)
+            for item, price in zip(group, prices):
+                results[item["index"]] = price
+
+        logging.info(
+            f"[RAGPricer] Priced {len(descriptions)} items with {calls} LLM calls."
+        )
+        return results
+
+
+class RAGService(E5ModelBase, RAGModelBase):
+    """RAG pricing logic, served by Modal or run in-process."""
+
+    def setup(self) -> None:
+        """Load E5 embedding model, ChromaDB and OpenAI client."""
+        try:
+            # Setup E5 model using the base class method
+            self.setup_e5_model()
+            self.setup_rag_store()
+
+        except Exception as e:
+            logging.error(f"[RAGPricer] Failed during setup: {e}")
+            raise RuntimeError("[RAGPricer] Setup failed.") from e
+
+    def price(self, description: str) -> float:
+        """Predicts price from description using RAG and Frontier."""
+        try:
+            embedding = self.normalize(self.embed(description))
+            return self.predict_rag(description, embedding)
         except Exception as e:
             logging.error(f"[RAGPricer] Failed to predict price: {e}")
             return 0.0
+
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """Predicts prices for many descriptions, encoding them in one batch."""
+        try:
+            embeddings = self.normalize(self.encode(descriptions))
+        except Exception as e:
+            logging.error(f"[RAGPricer] Failed to encode batch: {e}")
+            return [0.0] * len(descriptions)
+
+        return self.predict_rag_batch(descriptions, embeddings)
+
+    def warmup(self) -> bool:
+        """Cheap health check: answers once setup has loaded the models."""
+        return True
+
+
+@app.cls(**service_kwargs("rag"))
+@modal.concurrent(**concurrency_kwargs("rag"))
+class RAGPricer(RAGService):
+    """Remote class for pricing products using RAG pipeline."""
+
+    @modal.enter()
+    def setup(self) -> None:
+        """Load E5 embedding model, ChromaDB and OpenAI client."""
+        super().setup()
+
+    @modal.method()
+    def price(self, description: str) -> float:
+        """Predicts price from description using RAG and Frontier."""
+        return super().price(description)
+
+    @modal.method()
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """Predicts prices for many descriptions in one call."""
+        return super().price_batch(descriptions)
+
+    @modal.method()
+    def warmup(self) -> bool:
+        """Start (or keep) a container with the models loaded; no prediction."""
+        return super().warmup()
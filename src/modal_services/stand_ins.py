@@ -0,0 +1,207 @@
+"""Small CPU stand-in models for running the pricing services in-process.
+
+They replace the downloaded models (E5, XGBoost, LLaMA, ChromaDB, OpenAI)
+with a hashing encoder, ridge regressors and a synthetic catalog, so the full
+service logic runs on a plain machine without GPUs, credentials or network.
+Predictions are plausible, not accurate: use them for tests and benchmarks.
+"""
+
+import json
+import re
+import statistics
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from src.modal_services.vector_index import FlatVectorIndex
+from src.models.ensemble_model import LinearEnsemble
+
+EMBEDDING_DIM = 384
+CATALOG_SIZE = 2000
+
+CATEGORIES = {
+    "laptop": 900.0,
+    "headphones": 120.0,
+    "coffee maker": 80.0,
+    "smartwatch": 250.0,
+    "blender": 60.0,
+    "monitor": 300.0,
+    "camera": 650.0,
+    "vacuum": 200.0,
+}
+BRANDS = ["Acme", "Nova", "Orbit", "Zenith", "Apex"]
+FEATURES = ["wireless", "compact", "pro", "portable", "smart", "deluxe"]
+
+
+class HashingEncoder:
+    """Deterministic bag-of-words encoder with the E5 output shape."""
+
+    device = "cpu"
+
+    def __init__(self, dim: int = EMBEDDING_DIM) -> None:
+        """Hash tokens into `dim` signed buckets."""
+        self.dim = dim
+
+    def encode(self, texts: List[str], **kwargs: Any) -> np.ndarray:  # noqa: ANN401
+        """Encode texts as (n, dim) float32 vectors."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"[a-z0-9]+", text.lower()):
+                h = zlib.crc32(token.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        return vectors
+
+
+class RidgeRegressor:
+    """Closed-form ridge regression with a `predict` like the XGBoost wrapper."""
+
+    def __init__(self, weights: np.ndarray, bias: float) -> None:
+        """Wrap fitted weights."""
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def fit(cls, x: np.ndarray, y: np.ndarray, alpha: float = 1.0) -> "RidgeRegressor":
+        """Fit on centered targets."""
+        bias = float(y.mean())
+        gram = x.T @ x + alpha * np.eye(x.shape[1], dtype=x.dtype)
+        return cls(np.linalg.solve(gram, x.T @ (y - bias)), bias)
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """Predict one value per row."""
+        return np.asarray(x, dtype=np.float32) @ self.weights + self.bias
+
+
+@dataclass
+class StandInModels:
+    """Everything the services load, built from one synthetic catalog."""
+
+    encoder: HashingEncoder
+    regressor: RidgeRegressor
+    index: FlatVectorIndex
+    combiner: LinearEnsemble
+
+    def ft_llm(self, prompt: str) -> str:
+        """Complete an FT prompt (ending in "Price is $") with a price."""
+        vector = self.encoder.encode([prompt.split("\n\n")[1]])
+        return f"{prompt}{max(float(self.regressor.predict(vector)[0]), 0.0):.2f}"
+
+    @staticmethod
+    def rag_llm(messages: List[Dict[str, str]]) -> str:
+        """Answer a RAG prompt with the median price of the similar items.
+
+        Batched prompts ("### Product n" sections) get a JSON list of medians.
+        """
+        sections = re.split(r"### Product \d+\n", messages[1]["content"])
+        medians = []
+        for section in sections[1:] or sections:
+            prices = [float(p) for p in re.findall(r"Price is \$([\d.]+)", section)]
+            medians.append(round(statistics.median(prices), 2) if prices else 0.0)
+        if len(sections) > 1:
+            return json.dumps({"prices": medians})
+        return f"{medians[0]:.2f}"
+
+
+def synthetic_catalog(n: int = CATALOG_SIZE, seed: int = 0) -> tuple:
+    """Return (descriptions, prices) of a reproducible fake product catalog."""
+    rng = np.random.default_rng(seed)
+    names = list(CATEGORIES)
+    descriptions, prices = [], []
+    for i in range(n):
+        category = names[i % len(names)]
+        brand = BRANDS[rng.integers(len(BRANDS))]
+        feature = FEATURES[rng.integers(len(FEATURES))]
+        descriptions.append(f"{brand} {feature} {category} model {i}")
+        prices.append(round(CATEGORIES[category] * rng.uniform(0.7, 1.3), 2))
+    return descriptions, np.asarray(prices, dtype=np.float32)
+
+
+@lru_cache(maxsize=1)
+def get_stand_in_models() -> StandInModels:
+    """Build (once per process) the stand-in models from the synthetic catalog."""
+    encoder = HashingEncoder()
+    descriptions, prices = synthetic_catalog()
+    vectors = encoder.encode(["passage: " + d for d in descriptions])
+    normalized = vectors / np.maximum(
+        np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+    )
+    regressor = RidgeRegressor.fit(vectors, prices)
+    index = FlatVectorIndex.from_arrays(normalized, prices, descriptions)
+    # Mean of the three predictions
+    combiner = LinearEnsemble([0.0, 0.0, 0.0, 0.0, 1.0], 0.0)
+    return StandInModels(
+        encoder=encoder,
+        regressor=regressor,
+        index=index,
+        combiner=_fit_subsets(combiner, encoder, regressor, index),
+    )
+
+
+def _fit_subsets(
+    combiner: LinearEnsemble,
+    encoder: HashingEncoder,
+    regressor: RidgeRegressor,
+    index: FlatVectorIndex,
+) -> LinearEnsemble:
+    """Fit the fallback subset models on held-out items, as notebook 05 does."""
+    descriptions, prices = synthetic_catalog(n=200, seed=1)
+    vectors = encoder.encode(["passage: " + d for d in descriptions])
+    normalized = vectors / np.maximum(
+        np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+    )
+    regressed = regressor.predict(vectors)
+    rag = [statistics.median(found[1]) for found in index.query_batch(normalized)]
+    # The FT and XGB stand-ins are both the ridge regressor
+    predictions = np.column_stack([regressed, rag, regressed])
+    return combiner.with_fitted_subsets(predictions, prices)
+
+
+# ---------- Per-service wiring ----------
+
+
+def _use_e5(service: Any, models: StandInModels) -> None:  # noqa: ANN401
+    service.attach_e5_model(models.encoder)
+
+
+def _use_xgb(service: Any, models: StandInModels) -> None:  # noqa: ANN401
+    service.predictor = models.regressor
+
+
+def _use_rag(service: Any, models: StandInModels) -> None:  # noqa: ANN401
+    service.retrieval_engine = "flat"
+    service.index = models.index
+    service.llm = models.rag_llm
+
+
+def _use_ft(service: Any, models: StandInModels) -> None:  # noqa: ANN401
+    service.llm = models.ft_llm
+
+
+def _use_ensemble(service: Any, models: StandInModels) -> None:  # noqa: ANN401
+    service.combiner = models.combiner
+
+
+StandIn = Callable[[Any, StandInModels], None]
+
+STAND_INS: Dict[str, List[StandIn]] = {
+    "FTPricer": [_use_ft],
+    "RAGPricer": [_use_e5, _use_rag],
+    "XGBPricer": [_use_e5, _use_xgb],
+    "E5Pricer": [_use_e5, _use_xgb, _use_rag],
+    "EnsemblePricer": [_use_ensemble],
+}
+
+
+def register_stand_in(service_name: str, *stand_ins: StandIn) -> None:
+    """Replace the stand-in wiring of a service, e.g. to plug in other models."""
+    STAND_INS[service_name] = list(stand_ins)
+
+
+def apply_stand_ins(service_name: str, service: Any) -> None:  # noqa: ANN401
+    """Load a service instance with stand-in models instead of calling setup()."""
+    models = get_stand_in_models()
+    for stand_in in STAND_INS[service_name]:
+        stand_in(service, models)
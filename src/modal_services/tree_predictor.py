@@ -0,0 +1,92 @@
+"""Inference engines for the XGBoost price regressor.
+
+The joblib artifact is a scikit-learn `XGBRegressor`; its `predict` validates
+the input and builds a DMatrix on every call, which dominates the cost of a
+single row. These engines call the trees more directly:
+
+- `InplacePredictor`: `Booster.inplace_predict` on contiguous float32 rows.
+- `CompiledPredictor`: the trees compiled to a shared library with treelite
+  and tl2cgen (built once, then cached in the volume).
+"""
+
+import logging
+import os
+from typing import Any, Protocol
+
+import numpy as np
+
+# "inplace" (default), "compiled" (treelite/tl2cgen + a C compiler) or
+# "sklearn" (the original wrapper, kept as a baseline)
+XGB_ENGINE = os.getenv("SNAPR_XGB_ENGINE", "inplace")
+
+COMPILED_LIB_NAME = "predictor.so"
+
+
+class TreePredictor(Protocol):
+    """Anything that maps (n, dim) rows to n predictions."""
+
+    def predict(self, rows: np.ndarray) -> np.ndarray:
+        """Predict one value per row."""
+        ...
+
+
+def as_rows(vectors: np.ndarray) -> np.ndarray:
+    """2-D, C-contiguous float32 view of the input (no copy when already so)."""
+    return np.ascontiguousarray(np.atleast_2d(vectors), dtype=np.float32)
+
+
+class SklearnPredictor:
+    """The scikit-learn wrapper's own `predict`."""
+
+    def __init__(self, model: Any) -> None:  # noqa: ANN401
+        """Wrap a fitted `XGBRegressor`."""
+        self.model = model
+
+    def predict(self, rows: np.ndarray) -> np.ndarray:
+        """Predict through the wrapper."""
+        return np.ravel(self.model.predict(as_rows(rows)))
+
+
+class InplacePredictor:
+    """`Booster.inplace_predict`: no DMatrix and no wrapper validation."""
+
+    def __init__(self, booster: Any) -> None:  # noqa: ANN401
+        """Wrap the underlying booster."""
+        self.booster = booster
+
+    def predict(self, rows: np.ndarray) -> np.ndarray:
+        """Predict directly from the float32 array."""
+        return np.ravel(self.booster.inplace_predict(as_rows(rows)))
+
+
+class CompiledPredictor:
+    """Trees compiled to native code with treelite + tl2cgen."""
+
+    def __init__(self, lib_path: str) -> None:
+        """Load a library built by `build`."""
+        import tl2cgen
+
+        self.predictor = tl2cgen.Predictor(lib_path)
+
+    @staticmethod
+    def build(booster: Any, lib_path: str) -> None:  # noqa: ANN401
+        """Compile the booster into `lib_path` (written atomically)."""
+        import tl2cgen
+        import treelite
+
+        model = treelite.frontend.from_xgboost(booster)
+        tmp_path = f"{lib_path}.{os.getpid()}.tmp.so"
+        tl2cgen.export_lib(
+            model,
+            toolchain="gcc",
+            libpath=tmp_path,
+            params={"parallel_comp": os.cpu_count() or 1},
+        )
+        os.replace(tmp_path, lib_path)
+        logging.info(f"[TreePredictor] Compiled {model.num_tree} trees.")
+
+    def predict(self, rows: np.ndarray) -> np.ndarray:
+        """Predict with the compiled library."""
+        import tl2cgen
+
+        return np.ravel(self.predictor.predict(tl2cgen.DMatrix(as_rows(rows))))
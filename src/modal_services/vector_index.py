@@ -0,0 +1,188 @@
+"""Memory-mapped flat vector index for the RAG retrieval step.
+
+The `price_items` Chroma collection is exported once into plain NumPy files in
+the cache volume: an embedding matrix, a price array and UTF-8 documents
+addressed by offsets. Queries are exact top-k over a BLAS matrix product, with
+no client or HNSW overhead, and the OS page cache shares the mapped files.
+"""
+
+import json
+import logging
+import os
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+EMBEDDINGS_FILE = "embeddings.npy"
+PRICES_FILE = "prices.npy"
+OFFSETS_FILE = "doc_offsets.npy"
+DOCUMENTS_FILE = "documents.bin"
+META_FILE = "meta.json"
+
+# float16 rows are upcast in blocks of this size (NumPy has no fp16 BLAS)
+FP16_BLOCK_ROWS = 65536
+EXPORT_BATCH_SIZE = 5000
+
+Neighbours = Tuple[List[str], List[float], List[float]]
+
+
+class FlatVectorIndex:
+    """Exact nearest-neighbour search over memory-mapped normalized embeddings."""
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        prices: np.ndarray,
+        offsets: np.ndarray,
+        documents: np.ndarray,
+    ) -> None:
+        """Wrap already loaded (or memory-mapped) index arrays."""
+        self.embeddings = embeddings
+        self.prices = prices
+        self.offsets = offsets
+        self.documents = documents
+
+    def __len__(self) -> int:
+        """Number of indexed items."""
+        return self.embeddings.shape[0]
+
+    # ---------- Build ----------
+
+    @staticmethod
+    def export(
+        directory: str,
+        embeddings: np.ndarray,
+        prices: np.ndarray,
+        documents: List[str],
+        dtype: str = "float32",
+    ) -> None:
+        """Write an index from in-memory arrays."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, EMBEDDINGS_FILE), embeddings.astype(dtype))
+        np.save(os.path.join(directory, PRICES_FILE), prices.astype(np.float32))
+
+        encoded = [doc.encode("utf-8") for doc in documents]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(doc) for doc in encoded])
+        np.save(os.path.join(directory, OFFSETS_FILE), offsets)
+        with open(os.path.join(directory, DOCUMENTS_FILE), "wb") as f:
+            f.write(b"".join(encoded))
+
+        with open(os.path.join(directory, META_FILE), "w") as f:
+            json.dump({"count": len(encoded), "dtype": dtype}, f)
+
+    @classmethod
+    def export_from_chroma(
+        cls,
+        collection: Any,  # noqa: ANN401
+        directory: str,
+        dtype: str = "float32",
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> None:
+        """Export a Chroma collection (embeddings, prices, documents) page by page.
+
+        An empty collection is rejected: RAG could not retrieve anything from
+        it, and the index recorded in the manifest would never be rebuilt.
+        """
+        count = collection.count()
+        if count == 0:
+            raise ValueError(
+                f"Chroma collection {getattr(collection, 'name', '')!r} is empty, "
+                "nothing to export."
+            )
+        embeddings, prices, documents = None, np.zeros(count, np.float32), []
+        for offset in range(0, count, batch_size):
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset,
+            )
+            rows = np.asarray(page["embeddings"], dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.zeros((count, rows.shape[1]), dtype=dtype)
+            embeddings[offset : offset + len(rows)] = rows
+            prices[offset : offset + len(rows)] = [
+                m["price"] for m in page["metadatas"]
+            ]
+            documents.extend(page["documents"])
+
+        cls.export(directory, embeddings, prices, documents, dtype)
+        logging.info(f"[FlatVectorIndex] Exported {count} items ({dtype}).")
+
+    # ---------- Load ----------
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "FlatVectorIndex":
+        """Open an exported index, memory-mapped by default."""
+        mode = "r" if mmap else None
+        documents_path = os.path.join(directory, DOCUMENTS_FILE)
+        if mmap:
+            documents = np.memmap(documents_path, dtype=np.uint8, mode="r")
+        else:
+            documents = np.fromfile(documents_path, dtype=np.uint8)
+
+        return cls(
+            np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode=mode),
+            np.load(os.path.join(directory, PRICES_FILE), mmap_mode=mode),
+            np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode=mode),
+            documents,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls, embeddings: np.ndarray, prices: np.ndarray, documents: List[str]
+    ) -> "FlatVectorIndex":
+        """Build an in-memory index (no files), e.g. for small local catalogs."""
+        encoded = [doc.encode("utf-8") for doc in documents]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(doc) for doc in encoded])
+        return cls(
+            np.ascontiguousarray(embeddings, dtype=np.float32),
+            np.asarray(prices, dtype=np.float32),
+            offsets,
+            np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        )
+
+    # ---------- Query ----------
+
+    def document(self, i: int) -> str:
+        """Decode the document stored at row i."""
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return bytes(self.documents[start:end]).decode("utf-8")
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine scores (dot products) of shape (n_queries, n_items)."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if self.embeddings.dtype == np.float32:
+            return queries @ self.embeddings.T
+
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), FP16_BLOCK_ROWS):
+            block = self.embeddings[start : start + FP16_BLOCK_ROWS]
+            scores[:, start : start + len(block)] = queries @ block.astype(np.float32).T
+        return scores
+
+    def _top_k(self, scores: np.ndarray, k: int) -> Neighbours:
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return (
+            [self.document(i) for i in top],
+            [float(self.prices[i]) for i in top],
+            [float(scores[i]) for i in top],
+        )
+
+    def query(self, embedding: np.ndarray, k: int = 5) -> Neighbours:
+        """Return (documents, prices, similarities) of the k nearest items."""
+        return self._top_k(self._scores(embedding.reshape(1, -1))[0], k)
+
+    def query_batch(
+        self, embeddings: np.ndarray, k: int = 5, block: Optional[int] = 256
+    ) -> List[Neighbours]:
+        """Query many embeddings at once, `block` queries per matrix product."""
+        results = []
+        block = block or len(embeddings)
+        for start in range(0, len(embeddings), block):
+            scores = self._scores(embeddings[start : start + block])
+            results.extend(self._top_k(row, k) for row in scores)
+        return results
@@ -0,0 +1,33 @@
+"""Model version fingerprints read from the artifact manifest.
+
+Callers key cached results on these, so retraining or re-uploading a model
+(which changes its files' SHA-256 in the manifest) invalidates them.
+"""
+
+from typing import Dict, List
+
+from src.modal_services.artifacts import get_resolver
+from src.modal_services.e5_model_base import E5_SPEC
+from src.modal_services.ensemble_pricer import ENSEMBLE_SPEC
+from src.modal_services.ft_pricer import BASE_SPEC, FINETUNED_SPEC, MERGED_MODEL_NAME
+from src.modal_services.rag_pricer import FLAT_INDEX_NAME
+from src.modal_services.xgb_pricer import XGB_SPEC
+from src.models.frontier_model import OPENAI_MODEL
+
+# Artifacts that determine each model's predictions
+MODEL_ARTIFACTS: Dict[str, List[str]] = {
+    "ft": [BASE_SPEC.name, FINETUNED_SPEC.name, MERGED_MODEL_NAME],
+    "rag": [E5_SPEC.name, FLAT_INDEX_NAME],
+    "xgb": [E5_SPEC.name, XGB_SPEC.name],
+    "ensemble": [ENSEMBLE_SPEC.name],
+}
+
+
+def collect_model_versions() -> Dict[str, str]:
+    """Fingerprint of each model's artifacts (plus the RAG frontier model)."""
+    resolver = get_resolver()
+    versions = {
+        model: resolver.fingerprint(*names) for model, names in MODEL_ARTIFACTS.items()
+    }
+    versions["rag"] += f"/{OPENAI_MODEL}"
+    return versions
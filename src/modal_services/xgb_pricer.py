@@ -1,61 +1,141 @@
 """Predicts prices using XGBoost and E5 embeddings."""
 
 import logging
+import os
+from typing import Any, List
 
 import modal
+import numpy as np
 
-from src.modal_services.app_config import (
-    CACHE_PATH,
-    app,
-    modal_class_kwargs,
-)
+from src.modal_services.app_config import app, concurrency_kwargs, service_kwargs
+from src.modal_services.artifacts import ArtifactSpec, get_resolver
 from src.modal_services.e5_model_base import E5ModelBase
+from src.modal_services.tree_predictor import (
+    COMPILED_LIB_NAME,
+    XGB_ENGINE,
+    CompiledPredictor,
+    InplacePredictor,
+    SklearnPredictor,
+    TreePredictor,
+)
 
 REPO_ID = "lisekarimi/smart-deal-finder-models"
-
-# Local paths inside Modal volume
-E5_MODEL_DIR = f"{CACHE_PATH}/e5_model"
-XGB_MODEL_DIR = f"{CACHE_PATH}/xgb_model"
 XGB_MODEL_FILENAME = "xgboost_model.pkl"
 
+# Materialized as /cache/xgb_model/xgboost_model.pkl
+XGB_SPEC = ArtifactSpec(
+    name="xgb_model", repo_id=REPO_ID, patterns=(XGB_MODEL_FILENAME,)
+)
 
-@app.cls(**modal_class_kwargs)
-class XGBPricer(E5ModelBase):
-    """Remote pricing via E5 and XGBoost."""
+# Compiled trees, keyed by the model's manifest fingerprint
+XGB_COMPILED_NAME = "xgb_compiled"
+
+
+class XGBModelBase:
+    """Base class for loading the XGBoost regressor and pricing embeddings."""
+
+    def setup_xgb_model(self, engine: str = XGB_ENGINE) -> None:
+        """Loads the XGBoost model from the artifact cache."""
+        # Lazy load joblib; the model file comes from the artifact cache
+        import joblib
+
+        model_dir = get_resolver().resolve(XGB_SPEC)
+        self.model = joblib.load(os.path.join(model_dir, XGB_MODEL_FILENAME))
+        self.predictor = self._load_predictor(engine)
+        logging.info(f"XGBoost model loaded ({type(self.predictor).__name__}).")
+
+    def _load_predictor(self, engine: str) -> TreePredictor:
+        """Pick the inference engine, falling back to in-place prediction."""
+        if engine == "sklearn":
+            return SklearnPredictor(self.model)
+
+        booster = self.model.get_booster()
+        if engine == "compiled":
+            try:
+                return self._load_compiled_predictor(booster)
+            except Exception as e:
+                logging.warning(f"[XGBModelBase] Compiled predictor unavailable: {e}")
+        return InplacePredictor(booster)
+
+    @staticmethod
+    def _load_compiled_predictor(booster: Any) -> CompiledPredictor:  # noqa: ANN401
+        """Load the compiled trees from the volume, building them once per model."""
+        resolver = get_resolver()
+        name = f"{XGB_COMPILED_NAME}_{resolver.fingerprint(XGB_SPEC.name)}"
+        lib_dir = resolver.lookup(name)
+        if lib_dir is None:
+            lib_dir = resolver.local_dir(name)
+            os.makedirs(lib_dir, exist_ok=True)
+            CompiledPredictor.build(booster, os.path.join(lib_dir, COMPILED_LIB_NAME))
+            resolver.record(name)
+        return CompiledPredictor(os.path.join(lib_dir, COMPILED_LIB_NAME))
+
+    def predict_xgb(self, vectors: np.ndarray) -> List[float]:
+        """Predicts prices from raw E5 embeddings (one row per item)."""
+        preds = np.maximum(self.predictor.predict(vectors), 0)
+        return [round(float(pred), 2) for pred in preds]
+
+
+class XGBService(E5ModelBase, XGBModelBase):
+    """E5 + XGBoost pricing logic, served by Modal or run in-process."""
 
-    @modal.enter()
     def setup(self) -> None:
         """Loads E5 and XGBoost into Modal cache."""
         try:
             # Setup E5 model using the base class method
             self.setup_e5_model()
-
-            # Lazy load XGBoost model and download it inside the setup method
-            import joblib
-            from huggingface_hub import hf_hub_download
-
-            logging.info("Downloading XGBoost model...")
-            model_path = hf_hub_download(
-                repo_id=REPO_ID, filename=XGB_MODEL_FILENAME, cache_dir=XGB_MODEL_DIR
-            )
-
-            logging.info("XGBoost model downloaded.")
-            self.model = joblib.load(model_path)
-            logging.info("XGBoost model loaded.")
+            self.setup_xgb_model()
 
         except Exception as e:
             logging.error(f"[XGBPricer] Failed during setup: {e}")
             raise RuntimeError("[XGBPricer] Setup failed.") from e
 
-    @modal.method()
     def price(self, description: str) -> float:
         """Predict price from product description using E5 + XGBoost."""
         try:
             logging.info("[XGBPricer] Encoding description...")
-            vector = self.vectorizer.encode(["passage: " + description])
-            pred = self.model.predict(vector)[0]
+            vector = self.embed(description)
+            pred = self.predict_xgb(vector[np.newaxis, :])[0]
             logging.info(f"[XGBPricer] Predicted price: {pred}")
-            return round(float(max(0, pred)), 2)
+            return pred
         except Exception as e:
             logging.error(f"[XGBPricer] Failed to predict price: {e}")
             return 0.0
+
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """Predict prices for many descriptions with one encode and one predict."""
+        try:
+            return self.predict_xgb(self.encode(descriptions))
+        except Exception as e:
+            logging.error(f"[XGBPricer] Failed to predict batch: {e}")
+            return [0.0] * len(descriptions)
+
+    def warmup(self) -> bool:
+        """Cheap health check: answers once setup has loaded the models."""
+        return True
+
+
+@app.cls(**service_kwargs("xgb"))
+@modal.concurrent(**concurrency_kwargs("xgb"))
+class XGBPricer(XGBService):
+    """Remote pricing via E5 and XGBoost."""
+
+    @modal.enter()
+    def setup(self) -> None:
+        """Loads E5 and XGBoost when the container starts."""
+        super().setup()
+
+    @modal.method()
+    def price(self, description: str) -> float:
+        """Predict price from product description using E5 + XGBoost."""
+        return super().price(description)
+
+    @modal.method()
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """Predict prices for many descriptions in one call."""
+        return super().price_batch(descriptions)
+
+    @modal.method()
+    def warmup(self) -> bool:
+        """Start (or keep) a container with the models loaded; no prediction."""
+        return super().warmup()
@@ -0,0 +1,187 @@
+"""Linear ensemble combiner evaluated with NumPy.
+
+Holds the coefficients of the trained `ensemble_model.pkl` (a scikit-learn
+linear regression) so the final price can be computed in-process, without a
+remote call or a pandas DataFrame per prediction.
+"""
+
+import itertools
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Feature order used when the ensemble was trained
+FEATURES = ["FT_LLaMA", "GPT4oMini", "XGBoost", "Max", "Mean"]
+BASE_MODELS = FEATURES[:3]
+
+
+class LinearEnsemble:
+    """price = intercept + coef · [ft, rag, xgb, max, mean]."""
+
+    def __init__(
+        self,
+        coef: Sequence[float],
+        intercept: float,
+        subsets: Optional[Dict[str, Tuple[Sequence[float], float]]] = None,
+        version: Optional[str] = None,
+    ) -> None:
+        """Create a combiner from coefficients in `FEATURES` order.
+
+        `subsets` optionally holds models fitted on some base predictions only,
+        keyed by their names joined with "+" (e.g. "XGBoost"), each as
+        (coefficients in that order, intercept). `version` is the fingerprint
+        of the ensemble artifact the coefficients were taken from, if known.
+        """
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.subsets = {
+            key: (np.asarray(sub_coef, dtype=np.float64), float(sub_intercept))
+            for key, (sub_coef, sub_intercept) in (subsets or {}).items()
+        }
+        self.version = version
+
+    @staticmethod
+    def _parse_subsets(
+        subsets: Dict[str, Dict[str, Any]],
+    ) -> Dict[str, Tuple[List[float], float]]:
+        return {
+            key: ([sub["coef"][name] for name in key.split("+")], sub["intercept"])
+            for key, sub in subsets.items()
+        }
+
+    @classmethod
+    def from_estimator(cls, model: Any) -> "LinearEnsemble":  # noqa: ANN401
+        """Extract coefficients from a fitted scikit-learn linear model.
+
+        Subset models fitted with it (notebook 05) are read from its
+        `subsets_` attribute, in the JSON form of `to_dict`.
+        """
+        names = list(getattr(model, "feature_names_in_", FEATURES))
+        coef = dict(zip(names, np.ravel(model.coef_)))
+        return cls(
+            [coef[name] for name in FEATURES],
+            float(model.intercept_),
+            cls._parse_subsets(getattr(model, "subsets_", {})),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LinearEnsemble":
+        """Build from the JSON form produced by `to_dict`."""
+        return cls(
+            [data["coef"][name] for name in FEATURES],
+            data["intercept"],
+            cls._parse_subsets(data.get("subsets", {})),
+            data.get("version"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable coefficients keyed by feature name."""
+        data = {
+            "coef": dict(zip(FEATURES, self.coef.tolist())),
+            "intercept": self.intercept,
+        }
+        if self.subsets:
+            data["subsets"] = {
+                key: {
+                    "coef": dict(zip(key.split("+"), sub_coef.tolist())),
+                    "intercept": sub_intercept,
+                }
+                for key, (sub_coef, sub_intercept) in self.subsets.items()
+            }
+        if self.version is not None:
+            data["version"] = self.version
+        return data
+
+    def with_fitted_subsets(
+        self, predictions: np.ndarray, prices: Sequence[float]
+    ) -> "LinearEnsemble":
+        """Copy with a least-squares model for every proper subset of models.
+
+        Fitted on (n, 3) FT/RAG/XGB predictions and the true prices, so an
+        estimate missing some predictions uses a model trained without them.
+        """
+        x = np.asarray(predictions, dtype=np.float64).reshape(-1, 3)
+        y = np.asarray(prices, dtype=np.float64)
+        subsets = {}
+        for size in range(1, len(BASE_MODELS)):
+            for columns in itertools.combinations(range(len(BASE_MODELS)), size):
+                design = np.column_stack([x[:, columns], np.ones(len(x))])
+                solution = np.linalg.lstsq(design, y, rcond=None)[0]
+                key = "+".join(BASE_MODELS[i] for i in columns)
+                subsets[key] = (solution[:-1], solution[-1])
+        return LinearEnsemble(self.coef, self.intercept, subsets, self.version)
+
+    @classmethod
+    def load(cls, path: str) -> "LinearEnsemble":
+        """Load coefficients from a JSON file."""
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path: str) -> None:
+        """Write coefficients to a JSON file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @staticmethod
+    def features(predictions: np.ndarray) -> np.ndarray:
+        """Expand (n, 3) FT/RAG/XGB predictions into the (n, 5) feature matrix."""
+        predictions = np.asarray(predictions, dtype=np.float64).reshape(-1, 3)
+        return np.column_stack(
+            [predictions, predictions.max(axis=1), predictions.mean(axis=1)]
+        )
+
+    def predict_batch(self, predictions: np.ndarray) -> List[float]:
+        """Final prices for rows of (ft, rag, xgb) predictions."""
+        prices = self.features(predictions) @ self.coef + self.intercept
+        return [round(float(price), 2) for price in prices]
+
+    def predict(self, ft: float, rag: float, xgb: float) -> float:
+        """Final price for a single item."""
+        return self.predict_batch(np.array([[ft, rag, xgb]]))[0]
+
+    def predict_partial(
+        self,
+        ft: Optional[float] = None,
+        rag: Optional[float] = None,
+        xgb: Optional[float] = None,
+    ) -> float:
+        """Final price when some base predictions were skipped.
+
+        Uses a model fitted on the available predictions when one was shipped;
+        otherwise the missing predictions are imputed with the mean of the
+        available ones, which keeps the full model calibrated on its inputs.
+        """
+        available = self._available(ft, rag, xgb)
+        if not available:
+            raise ValueError("At least one base prediction is required.")
+
+        key = "+".join(available)
+        if key in self.subsets:
+            sub_coef, sub_intercept = self.subsets[key]
+            price = float(np.dot(sub_coef, list(available.values())) + sub_intercept)
+            return round(price, 2)
+
+        fill = float(np.mean(list(available.values())))
+        return self.predict(*(available.get(name, fill) for name in BASE_MODELS))
+
+    @staticmethod
+    def _available(
+        ft: Optional[float], rag: Optional[float], xgb: Optional[float]
+    ) -> Dict[str, float]:
+        return {
+            name: value
+            for name, value in zip(BASE_MODELS, (ft, rag, xgb))
+            if value is not None
+        }
+
+    def has_subset_model(
+        self,
+        ft: Optional[float] = None,
+        rag: Optional[float] = None,
+        xgb: Optional[float] = None,
+    ) -> bool:
+        """True if `predict_partial` uses a fitted model, not imputation."""
+        return "+".join(self._available(ft, rag, xgb)) in self.subsets
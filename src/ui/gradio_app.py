@@ -9,10 +9,11 @@ from typing import Tuple
 
 import gradio as gr
 
-from src.agents.pipeline import run_and_stream_logs
+from src.agents.pipeline import run_and_stream_logs, start_warmup
 from src.config.constants import (
     IS_DEMO_VERSION,
     MAX_CATEGORY_SELECTION,
+    MAX_CONCURRENT_RUNS,
     MAX_DEMO_RUNS_PER_DAY,
     PROJECT_NAME,
     VERSION,
@@ -134,12 +135,18 @@ def build_ui() -> gr.Blocks:
                     fn=run_and_stream_logs,
                     inputs=[category_selector],
                     outputs=[logs_output, deals_output, run_btn, status_msg],
+                    # Sessions run side by side, each with its own logs and deals
+                    concurrency_limit=MAX_CONCURRENT_RUNS,
                 )
 
+                # Start the pricing containers while categories are chosen
+                category_selector.change(fn=start_warmup, inputs=None, outputs=None)
+
                 # Status update on load
                 @ui.load(outputs=[status_msg, run_btn])
                 def update_status_on_load() -> Tuple[str, gr.update]:
                     """Sets demo status and button state on UI load."""
+                    start_warmup()
                     can_run, status = can_run_app()
                     btn_state = gr.update(
                         interactive=can_run,
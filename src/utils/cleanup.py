@@ -1,5 +1,7 @@
-"""Deletes a file if it's older than a specified number of days."""
+"""Deletes files older than a specified number of days."""
 
+import contextlib
+import glob
 import os
 import time
 
@@ -12,3 +14,10 @@ def delete_if_old(path: str, max_age_days: int = MEMORY_EXPIRATION_DAYS) -> None
         age = time.time() - os.path.getmtime(path)
         if age > max_age_days * 86400:
             os.remove(path)
+
+
+def delete_old_files(directory: str, pattern: str, max_age_days: float) -> None:
+    """Deletes the files matching pattern in directory older than max_age_days."""
+    for path in glob.glob(os.path.join(directory, pattern)):
+        with contextlib.suppress(FileNotFoundError):  # Removed by another run
+            delete_if_old(path, max_age_days)
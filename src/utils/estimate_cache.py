@@ -0,0 +1,314 @@
+"""Persistent cache of price estimates, keyed by normalized description.
+
+Entries hold the per-model predictions and the final estimate. The key also
+covers the model versions, so new model artifacts never serve stale results.
+SQLite keeps the cache usable from several processes, on local disk or on a
+shared volume; entries expire after a TTL and the least recently used ones are
+evicted beyond a size limit.
+
+Entries may also store the E5 embedding of their description, so a reworded
+description can be matched to its nearest cached neighbour (`nearest`).
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.config.constants import (
+    ESTIMATE_CACHE_FILE,
+    ESTIMATE_CACHE_MAX_ENTRIES,
+    ESTIMATE_CACHE_TTL_HOURS,
+)
+
+# Point this at a shared volume to share the cache between instances
+ESTIMATE_CACHE_ENV = "SNAPR_ESTIMATE_CACHE"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS estimates (
+    description_hash TEXT NOT NULL,
+    versions TEXT NOT NULL,
+    ft REAL,
+    rag REAL,
+    xgb REAL,
+    estimate REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (description_hash, versions)
+);
+CREATE TABLE IF NOT EXISTS embeddings (
+    description_hash TEXT NOT NULL,
+    versions TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    PRIMARY KEY (description_hash, versions)
+);
+"""
+
+
+@dataclass(frozen=True)
+class CachedEstimate:
+    """Per-model predictions (None when skipped) and the final estimate."""
+
+    ft: Optional[float]
+    rag: Optional[float]
+    xgb: Optional[float]
+    estimate: float
+
+
+def normalize_description(description: str) -> str:
+    """Lowercase and collapse whitespace, so trivial variants share a key."""
+    return re.sub(r"\s+", " ", description).strip().lower()
+
+
+def description_hash(description: str) -> str:
+    """SHA-256 of the normalized description."""
+    return hashlib.sha256(normalize_description(description).encode()).hexdigest()
+
+
+class _Vectors:
+    """In-process embeddings of one model version, updated in place.
+
+    Rows grow by doubling, a re-stored key overwrites its row, and removed
+    rows are blanked (key None) until more than half are dead, when the
+    matrix is compacted.
+    """
+
+    def __init__(self, keys: List[str], matrix: np.ndarray) -> None:
+        self.keys: List[Optional[str]] = list(keys)
+        self.rows: Dict[str, int] = {key: row for row, key in enumerate(keys)}
+        self.matrix = matrix
+        self.size = len(keys)
+
+    def upsert(self, key: str, vector: np.ndarray) -> None:
+        row = self.rows.get(key)
+        if row is None:
+            if self.size == len(self.matrix):
+                grown = np.empty(
+                    (max(2 * self.size, 16), len(vector)), dtype=np.float32
+                )
+                grown[: self.size] = self.matrix[: self.size]
+                self.matrix = grown
+            row = self.size
+            self.size += 1
+            self.keys.append(key)
+            self.rows[key] = row
+        self.matrix[row] = vector
+
+    def remove(self, key: str) -> None:
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.keys[row] = None
+        if len(self.rows) < self.size // 2:
+            self._compact()
+
+    def _compact(self) -> None:
+        live = [row for row, key in enumerate(self.keys) if key is not None]
+        self.keys = [self.keys[row] for row in live]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self.matrix = self.matrix[live]
+        self.size = len(live)
+
+    def ranked(self, query: np.ndarray) -> Iterator[Tuple[str, float]]:
+        """Live keys from most to least similar to `query`.
+
+        Works on a snapshot, so it can be consumed after the lock is released.
+        """
+        similarities = self.matrix[: self.size] @ query
+        keys = self.keys[: self.size]
+        order = np.argsort(-similarities)
+        return (
+            (keys[row], float(similarities[row]))
+            for row in order
+            if keys[row] is not None
+        )
+
+
+class EstimateCache:
+    """SQLite-backed estimate cache with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        path: str,
+        ttl_hours: float = ESTIMATE_CACHE_TTL_HOURS,
+        max_entries: int = ESTIMATE_CACHE_MAX_ENTRIES,
+    ) -> None:
+        """Use the database at `path` (created on first write)."""
+        self.path = str(path)
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._ready = False
+        # versions -> normalized embeddings, loaded lazily and kept in step
+        # with this process's writes and evictions
+        self._vectors: Dict[str, _Vectors] = {}
+        self._vectors_lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "EstimateCache":
+        """Cache at SNAPR_ESTIMATE_CACHE, or in the local model cache directory."""
+        return cls(os.getenv(ESTIMATE_CACHE_ENV, ESTIMATE_CACHE_FILE))
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation: safe across threads and
+        # processes, and the busy timeout waits out concurrent writers.
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            with conn:
+                conn.executescript(SCHEMA)
+            self._ready = True
+        return conn
+
+    def get(self, description: str, versions: str) -> Optional[CachedEstimate]:
+        """Return a fresh entry for this description and model versions."""
+        entry = self._get((description_hash(description), versions))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def _get(self, key: Tuple[str, str]) -> Optional[CachedEstimate]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT ft, rag, xgb, estimate, created_at FROM estimates "
+                    "WHERE description_hash = ? AND versions = ?",
+                    key,
+                ).fetchone()
+                if row is None or now - row[4] > self.ttl_seconds:
+                    return None
+                conn.execute(
+                    "UPDATE estimates SET last_used = ? "
+                    "WHERE description_hash = ? AND versions = ?",
+                    (now, *key),
+                )
+        finally:
+            conn.close()
+        return CachedEstimate(*row[:4])
+
+    def put(
+        self,
+        description: str,
+        versions: str,
+        entry: CachedEstimate,
+        embedding: Optional[np.ndarray] = None,
+    ) -> None:
+        """Store an entry, then drop expired and least recently used ones."""
+        now = time.time()
+        key = description_hash(description)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO estimates VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        versions,
+                        entry.ft,
+                        entry.rag,
+                        entry.xgb,
+                        entry.estimate,
+                        now,
+                        now,
+                    ),
+                )
+                evicted = conn.execute(
+                    "SELECT description_hash, versions FROM estimates "
+                    "WHERE created_at < ?",
+                    (now - self.ttl_seconds,),
+                ).fetchall()
+                conn.executemany(
+                    "DELETE FROM estimates WHERE description_hash = ? AND versions = ?",
+                    evicted,
+                )
+                least_used = conn.execute(
+                    "SELECT description_hash, versions FROM estimates "
+                    "ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                    (self.max_entries,),
+                ).fetchall()
+                conn.executemany(
+                    "DELETE FROM estimates WHERE description_hash = ? AND versions = ?",
+                    least_used,
+                )
+                if embedding is not None:
+                    vector = np.asarray(embedding, dtype=np.float32)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                        (key, versions, vector.tobytes()),
+                    )
+                conn.execute(
+                    "DELETE FROM embeddings WHERE (description_hash, versions) "
+                    "NOT IN (SELECT description_hash, versions FROM estimates)"
+                )
+        finally:
+            conn.close()
+        with self._vectors_lock:
+            for dead in evicted + least_used:
+                self._forget(*dead)
+            if embedding is not None and versions in self._vectors:
+                self._vectors[versions].upsert(key, vector)
+
+    def _forget(self, key: str, versions: str) -> None:
+        """Drop an evicted entry from the in-process embeddings (lock held)."""
+        vectors = self._vectors.get(versions)
+        if vectors is not None:
+            vectors.remove(key)
+            if not vectors.rows:
+                del self._vectors[versions]
+
+    def _load_vectors(self, versions: str, dim: int) -> _Vectors:
+        """Embeddings stored for these versions, read once per process (lock held)."""
+        if versions not in self._vectors:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT description_hash, embedding FROM embeddings "
+                    "WHERE versions = ?",
+                    (versions,),
+                ).fetchall()
+            finally:
+                conn.close()
+            matrix = np.frombuffer(b"".join(row[1] for row in rows), np.float32)
+            self._vectors[versions] = _Vectors(
+                [row[0] for row in rows], matrix.reshape(-1, dim).copy()
+            )
+        return self._vectors[versions]
+
+    def nearest(
+        self, embedding: np.ndarray, versions: str
+    ) -> Tuple[Optional[CachedEstimate], float]:
+        """Closest cached entry by cosine similarity, and that similarity.
+
+        `embedding` must be L2-normalized, like the stored ones. Entries added
+        by other processes are seen after a restart; expired or evicted
+        neighbours are skipped.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._vectors_lock:
+            ranked = self._load_vectors(versions, query.shape[-1]).ranked(query)
+        for key, similarity in ranked:
+            entry = self._get((key, versions))
+            if entry is not None:
+                return entry, similarity
+            with self._vectors_lock:  # Expired, or evicted by another process
+                self._forget(key, versions)
+        return None, 0.0
+
+    def __len__(self) -> int:
+        """Number of stored entries (all versions)."""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM estimates").fetchone()[0]
+        finally:
+            conn.close()
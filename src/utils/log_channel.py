@@ -0,0 +1,184 @@
+"""Log channel of one pipeline run, read by any number of subscribers.
+
+A run appends log lines (and markers, such as an accepted deal) to its
+channel. Each subscriber (a UI session, a duplicate request sharing the same
+scan) reads from its own cursor, so a late subscriber replays the log from the
+start and no subscriber takes lines away from another.
+
+The channel is a ring buffer of LOG_CHANNEL_CAPACITY items: a chatty run or a
+stuck reader cannot grow memory without bound. Evicted lines are counted
+(`dropped`) and, when SNAPR_LOG_SPILL_DIR is set, the full log is also written
+as plain text to a file there for post-mortem download (created on the first
+line, deleted after LOG_SPILL_MAX_AGE_DAYS).
+"""
+
+import bisect
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, List, Optional, Sequence, TextIO, Tuple
+
+from src.config.constants import (
+    LOG_CHANNEL_CAPACITY,
+    LOG_OVERFLOW_POLICY,
+    LOG_SPILL_MAX_AGE_DAYS,
+)
+from src.utils.cleanup import delete_old_files
+from src.utils.text_utils import strip_html
+
+# Directory receiving the full log of every run (unset: no spill files)
+LOG_SPILL_ENV = "SNAPR_LOG_SPILL_DIR"
+
+OVERFLOW_POLICIES = ("drop-oldest", "summarize")
+
+
+class LogChannel:
+    """Bounded log; readers wait for new items instead of polling."""
+
+    def __init__(
+        self,
+        capacity: int = LOG_CHANNEL_CAPACITY,
+        policy: str = LOG_OVERFLOW_POLICY,
+        spill_path: Optional[str] = None,
+    ) -> None:
+        """Keep the last `capacity` items; optionally spill every line to a file."""
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown log overflow policy: {policy!r}")
+        self.capacity = capacity
+        self.policy = policy
+        self.dropped = 0
+        self.spill_path = spill_path
+        self._items: Deque[Any] = deque()
+        self._start = 0  # Index, since the first item, of the oldest one kept
+        self._evicted_markers: List[int] = []  # Indices of evicted non-lines
+        self._closed = False
+        self._cond = threading.Condition()
+        self._spill: Optional[TextIO] = None  # Opened on the first line
+
+    @classmethod
+    def for_run(cls) -> "LogChannel":
+        """A channel with the configured capacity, spilling if SNAPR_LOG_SPILL_DIR."""
+        spill_dir = os.getenv(LOG_SPILL_ENV)
+        if not spill_dir:
+            return cls()
+        name = f"run-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.log"
+        return cls(spill_path=os.path.join(spill_dir, name))
+
+    @staticmethod
+    def prune_spills(max_age_days: float = LOG_SPILL_MAX_AGE_DAYS) -> None:
+        """Delete spilled run logs older than `max_age_days`."""
+        spill_dir = os.getenv(LOG_SPILL_ENV)
+        if spill_dir:
+            delete_old_files(spill_dir, "run-*.log", max_age_days)
+
+    def put(self, item: Any) -> None:  # noqa: ANN401
+        """Append a line or marker, evicting the oldest beyond capacity."""
+        with self._cond:
+            self._items.append(item)
+            if len(self._items) > self.capacity:
+                evicted = self._items.popleft()
+                if isinstance(evicted, str):
+                    self.dropped += 1
+                else:  # Markers are not log lines
+                    self._evicted_markers.append(self._start)
+                self._start += 1
+            if self.spill_path and isinstance(item, str) and not self._closed:
+                if self._spill is None:
+                    self._spill = self._open_spill()
+                self._spill.write(strip_html(item) + "\n")
+            self._cond.notify_all()
+
+    def _open_spill(self) -> TextIO:
+        os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+        return open(self.spill_path, "a", encoding="utf-8", buffering=1)
+
+    def close(self) -> None:
+        """Mark the end of the run: readers stop once they have read everything."""
+        with self._cond:
+            self._closed = True
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        """True once the run has finished."""
+        return self._closed
+
+    def lines(self) -> List[str]:
+        """The log lines still in the buffer, without markers."""
+        with self._cond:
+            return [item for item in self._items if isinstance(item, str)]
+
+    def read(
+        self, cursor: int, timeout: Optional[float]
+    ) -> Tuple[List[Any], int, bool]:
+        """Items after `cursor`, waiting up to `timeout` for one.
+
+        Returns the items, the cursor to read from next and whether the
+        channel is closed. A cursor behind the buffer skips the evicted items
+        (with a summary line under the "summarize" policy).
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._start + len(self._items) > cursor or self._closed,
+                timeout,
+            )
+            items: List[Any] = []
+            if cursor < self._start:
+                markers = len(self._evicted_markers) - bisect.bisect_left(
+                    self._evicted_markers, cursor
+                )
+                skipped = self._start - cursor - markers
+                if self.policy == "summarize" and skipped:
+                    items.append(
+                        f"… {skipped} log lines dropped "
+                        f"(over the {self.capacity}-line capacity)"
+                    )
+                cursor = self._start
+            items.extend(itertools.islice(self._items, cursor - self._start, None))
+            return items, self._start + len(self._items), self._closed
+
+    def subscribe(self) -> "LogSubscription":
+        """A reader starting from the oldest item kept."""
+        return LogSubscription(self)
+
+
+class LogSubscription:
+    """One reader's position in a channel."""
+
+    def __init__(self, channel: LogChannel) -> None:
+        """Read `channel` from the start."""
+        self.channel = channel
+        self.cursor = 0
+
+    def _take(self, timeout: Optional[float]) -> Tuple[List[Any], bool]:
+        items, self.cursor, closed = self.channel.read(self.cursor, timeout)
+        return items, closed
+
+    def next_burst(
+        self, idle_timeout: float, coalesce_s: float, urgent: Sequence[Any] = ()
+    ) -> Tuple[List[Any], bool]:
+        """Wait for new items, then gather those arriving within `coalesce_s`.
+
+        An `urgent` marker ends the burst early. Returns the items (possibly
+        none, after `idle_timeout`) and whether the channel is closed and
+        fully read.
+        """
+        items, closed = self._take(idle_timeout)
+        burst_end = time.monotonic() + coalesce_s
+        while items and not closed:
+            if any(item is marker for item in items for marker in urgent):
+                break
+            remaining = burst_end - time.monotonic()
+            if remaining <= 0:
+                break
+            more, closed = self._take(remaining)
+            if not more and not closed:
+                break
+            items += more
+        return items, closed
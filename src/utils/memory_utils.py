@@ -1,26 +1,31 @@
 """Utilities for handling deal memory and persistence."""
 
+import threading
 from datetime import datetime, timezone
 from typing import Dict, List
 
 from src.config.constants import DEALS_FILE
 from src.utils.file_io import load_json, write_json
 
+# Concurrent runs save to the same memory file
+_memory_lock = threading.Lock()
+
 
 def save_opportunities_to_memory(
     new_opportunities: List[Dict], memory_path: str = DEALS_FILE
 ) -> None:
     """Updates opportunities with deduplication and saves to memory."""
-    existing_data = load_json(memory_path) or {"opportunities": []}
+    with _memory_lock:
+        existing_data = load_json(memory_path) or {"opportunities": []}
 
-    all_opportunities = existing_data.get("opportunities", []) + new_opportunities
-    unique_by_url = {op["url"]: op for op in all_opportunities}
-    final_list = list(unique_by_url.values())
+        all_opportunities = existing_data.get("opportunities", []) + new_opportunities
+        unique_by_url = {op["url"]: op for op in all_opportunities}
+        final_list = list(unique_by_url.values())
 
-    write_json(
-        memory_path,
-        {
-            "opportunities": final_list,
-            "last_updated": datetime.now(timezone.utc).isoformat(),
-        },
-    )
+        write_json(
+            memory_path,
+            {
+                "opportunities": final_list,
+                "last_updated": datetime.now(timezone.utc).isoformat(),
+            },
+        )
@@ -1,5 +1,6 @@
 """Utility functions for text processing."""
 
+import html
 import re
 
 
@@ -27,3 +28,8 @@ def extract_price(output: str) -> float:
     except Exception:
         # Optionally log the exception or handle differently
         return 0.0
+
+
+def strip_html(line: str) -> str:
+    """Plain text of an HTML log line (tags removed, entities decoded)."""
+    return html.unescape(re.sub(r"<[^>]+>", "", line)).strip()
@@ -0,0 +1,34 @@
+"""Test module for the per-service Modal resource profiles."""
+
+from src.modal_services.app_config import (
+    GPU,
+    SERVICE_PROFILES,
+    concurrency_kwargs,
+    image,
+    light_image,
+    service_kwargs,
+)
+
+
+def test_gpu_service_uses_full_image():
+    """Tests that the LLM service gets a GPU and the full image."""
+    kwargs = service_kwargs("ft")
+
+    assert kwargs["gpu"] == GPU
+    assert kwargs["image"] is image
+    assert kwargs["memory"] == SERVICE_PROFILES["ft"].memory
+
+
+def test_cpu_service_uses_light_image():
+    """Tests that the ensemble runs CPU-only on the light image."""
+    kwargs = service_kwargs("ensemble")
+
+    assert kwargs["gpu"] is None
+    assert kwargs["image"] is light_image
+    assert concurrency_kwargs("ensemble")["max_inputs"] > 1
+
+
+def test_profile_env_is_forwarded():
+    """Tests that profile environment variables reach the container."""
+    assert service_kwargs("xgb")["env"]["SNAPR_E5_DEVICE"] == "cpu"
+    assert "env" not in service_kwargs("rag")
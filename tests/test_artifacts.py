@@ -0,0 +1,165 @@
+"""Test module for the offline-first ArtifactResolver."""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from src.modal_services.artifacts import (
+    MANIFEST_FILENAME,
+    ArtifactResolver,
+    ArtifactSpec,
+    LocalDirSource,
+)
+
+SPEC = ArtifactSpec(name="e5_model", repo_id="org/model")
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Local directory stand-in for a model repository."""
+    repo_dir = tmp_path / "source" / "org" / "model"
+    (repo_dir / "1_Pooling").mkdir(parents=True)
+    (repo_dir / "config.json").write_text('{"dim": 384}')
+    (repo_dir / "model.safetensors").write_bytes(b"weights" * 100)
+    (repo_dir / "1_Pooling" / "config.json").write_text("{}")
+    return LocalDirSource(str(tmp_path / "source"))
+
+
+@pytest.fixture
+def resolver(tmp_path, source):
+    """Resolver over an empty cache directory."""
+    return ArtifactResolver(str(tmp_path / "cache"), source)
+
+
+def test_cold_resolve_fetches_all_and_writes_manifest(resolver):
+    """Tests that a cold cache fetches every file and records checksums."""
+    with patch.object(resolver.source, "fetch", wraps=resolver.source.fetch) as fetch:
+        directory = resolver.resolve(SPEC)
+
+    assert fetch.call_count == 3
+    assert os.path.isfile(os.path.join(directory, "1_Pooling", "config.json"))
+
+    with open(os.path.join(resolver.cache_dir, MANIFEST_FILENAME)) as f:
+        entry = json.load(f)["e5_model"]
+    assert entry["repo_id"] == "org/model"
+    assert len(entry["files"]["model.safetensors"]["sha256"]) == 64
+
+
+def test_warm_resolve_is_offline(resolver):
+    """Tests that a matching manifest never touches the source."""
+    resolver.resolve(SPEC)
+
+    with (
+        patch.object(resolver.source, "list_files") as list_files,
+        patch.object(resolver.source, "fetch") as fetch,
+    ):
+        resolver.resolve(SPEC)
+
+    list_files.assert_not_called()
+    fetch.assert_not_called()
+
+
+def test_partial_download_only_refetches_damaged_file(resolver):
+    """Tests that a truncated file is detected and fetched again on its own."""
+    directory = resolver.resolve(SPEC)
+    with open(os.path.join(directory, "model.safetensors"), "wb") as f:
+        f.write(b"weig")
+
+    with patch.object(resolver.source, "fetch", wraps=resolver.source.fetch) as fetch:
+        resolver.resolve(SPEC)
+
+    fetch.assert_called_once()
+    assert fetch.call_args[0][1] == "model.safetensors"
+    assert os.path.getsize(os.path.join(directory, "model.safetensors")) == 700
+
+
+def test_deep_verify_catches_same_size_corruption(resolver):
+    """Tests that deep verification re-hashes files instead of trusting sizes."""
+    directory = resolver.resolve(SPEC)
+    with open(os.path.join(directory, "config.json"), "w") as f:
+        f.write('{"dim": 999}')
+
+    assert resolver.lookup("e5_model") == directory
+    assert resolver.lookup("e5_model", deep=True) is None
+
+
+def test_patterns_and_revision_change(resolver):
+    """Tests pattern filtering and that a new revision invalidates the entry."""
+    spec = ArtifactSpec(name="weights", repo_id="org/model", patterns=("*.json",))
+    directory = resolver.resolve(spec)
+    assert not os.path.exists(os.path.join(directory, "model.safetensors"))
+
+    pinned = ArtifactSpec(
+        name="weights", repo_id="org/model", revision="abc", patterns=("*.json",)
+    )
+    with patch.object(resolver.source, "list_files", wraps=resolver.source.list_files):
+        resolver.resolve(pinned)
+        resolver.source.list_files.assert_called_once()
+
+
+def test_record_and_fingerprint_local_build(resolver):
+    """Tests that locally built artifacts are tracked and change the fingerprint."""
+    build_dir = resolver.local_dir("merged")
+    os.makedirs(build_dir)
+    with open(os.path.join(build_dir, "model.bin"), "wb") as f:
+        f.write(b"v1")
+
+    assert resolver.lookup("merged") is None
+    resolver.record("merged")
+    assert resolver.lookup("merged") == build_dir
+
+    before = resolver.fingerprint("merged")
+    with open(os.path.join(build_dir, "model.bin"), "wb") as f:
+        f.write(b"v2")
+    resolver.record("merged")
+    assert resolver.fingerprint("merged") != before
+
+
+def test_concurrent_records_keep_every_entry(resolver):
+    """Tests that parallel manifest updates do not overwrite each other."""
+    names = [f"artifact_{i}" for i in range(16)]
+    for name in names:
+        os.makedirs(resolver.local_dir(name))
+        with open(os.path.join(resolver.local_dir(name), "model.bin"), "wb") as f:
+            f.write(name.encode())
+
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        list(pool.map(resolver.record, names))
+
+    with open(resolver.manifest_path) as f:
+        assert set(json.load(f)) == set(names)
+
+
+class RacingVolume:
+    """Volume where another container commits its own manifest right after ours."""
+
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.calls = []
+
+    def reload(self):
+        """Nothing to fetch: the test writes the other container's commit."""
+        self.calls.append("reload")
+
+    def commit(self):
+        """Our commit, then one from a container that never saw our entry."""
+        self.calls.append("commit")
+        if self.calls.count("commit") == 1:
+            with open(self.manifest_path, "w") as f:
+                json.dump({"other": {"files": {}}}, f)
+
+
+def test_entry_replaced_by_another_container_is_merged_again(tmp_path, source):
+    """Tests the reload, merge and commit loop on a shared volume."""
+    cache_dir = str(tmp_path / "cache")
+    volume = RacingVolume(os.path.join(cache_dir, MANIFEST_FILENAME))
+    resolver = ArtifactResolver(cache_dir, source, volume=volume)
+
+    resolver.resolve(SPEC)
+
+    with open(resolver.manifest_path) as f:
+        assert set(json.load(f)) == {"other", "e5_model"}
+    assert volume.calls == ["reload", "commit", "reload"] * 2
@@ -0,0 +1,111 @@
+"""Test module for the in-process pricing backend."""
+
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from src.agents.backends import LocalService, connect, local_service
+from src.agents.ensemble_price_agent import EnsemblePriceAgent
+from src.modal_services.ft_pricer import FTPricer, FTService
+from src.modal_services.stand_ins import (
+    STAND_INS,
+    apply_stand_ins,
+    register_stand_in,
+)
+from src.modal_services.xgb_pricer import XGBService
+
+DESCRIPTIONS = [
+    "Nova wireless headphones with noise cancelling",
+    "Acme pro laptop with 16GB RAM",
+    "Zenith compact blender",
+]
+
+
+@pytest.mark.parametrize("shared_embedding", [True, False])
+def test_local_pipeline_single_and_batch(shared_embedding):
+    """Tests the full pricing stack in-process, without Modal."""
+    with (
+        patch("modal.Cls.from_name") as mock_from_name,
+        patch.object(EnsemblePriceAgent, "log"),
+    ):
+        agent = EnsemblePriceAgent(shared_embedding=shared_embedding, backend="local")
+        prices = [agent.price(d) for d in DESCRIPTIONS]
+        batch = agent.price_batch(DESCRIPTIONS)
+
+    mock_from_name.assert_not_called()
+    assert all(price > 0 for price in prices)
+    assert batch == pytest.approx(prices, abs=0.01)
+    assert prices[1] > prices[0] > prices[2]  # laptop > headphones > blender
+
+
+def test_local_service_is_shared_and_has_modal_call_shape():
+    """Tests that services load once per process and expose `.remote`."""
+    service = connect("XGBPricer", "local")
+
+    assert isinstance(service, LocalService)
+    assert service is local_service("XGBPricer")
+    assert service.price.remote(DESCRIPTIONS[0]) == pytest.approx(
+        service.price_batch.remote([DESCRIPTIONS[0]])[0], abs=0.01
+    )
+
+
+def test_local_e5_embedding_is_normalized():
+    """Tests the embedding used by the semantic estimate cache."""
+    service = connect("E5Pricer", "local")
+    result = service.price.remote(DESCRIPTIONS[0], ["xgb"], True)
+
+    assert sum(x * x for x in result["embedding"]) == pytest.approx(1.0, abs=1e-5)
+    assert result["xgb"] == service.price.remote(DESCRIPTIONS[0], ["xgb"])["xgb"]
+
+
+def test_register_stand_in(monkeypatch):
+    """Tests plugging a different stand-in model into a service."""
+
+    class FixedModel:
+        def predict(self, vectors):
+            return np.full(len(vectors), 9.99)
+
+    def use_fixed(service, models):
+        service.attach_e5_model(models.encoder)
+        service.predictor = FixedModel()
+
+    monkeypatch.setitem(STAND_INS, "XGBPricer", STAND_INS["XGBPricer"])
+    register_stand_in("XGBPricer", use_fixed)
+    service = XGBService()
+    apply_stand_ins("XGBPricer", service)
+
+    assert service.price("anything") == 9.99
+    assert service.price_batch(DESCRIPTIONS) == [9.99] * 3
+
+
+def test_unknown_backend():
+    """Tests that an unknown backend name is rejected."""
+    with pytest.raises(ValueError, match="Unknown pricing backend"):
+        connect("XGBPricer", "ssh")
+
+
+def test_local_warmup_reports_each_service():
+    """Tests that the ensemble warms every service it will call, with timings."""
+    with patch.object(EnsemblePriceAgent, "log") as mock_log:
+        agent = EnsemblePriceAgent(backend="local")
+        timings = agent.warmup()
+
+    assert set(timings) == {"FTPricer", "E5Pricer", "EnsemblePricer"}
+    assert all(elapsed is not None for elapsed in timings.values())
+    assert any("warm in" in c.args[0] for c in mock_log.call_args_list)
+
+
+@pytest.mark.filterwarnings("ignore:The FTPricer")
+def test_ft_modal_class_prices_a_batch():
+    """Tests the Modal FT class itself: its methods call each other locally."""
+    with patch.object(
+        FTService, "setup", lambda self: apply_stand_ins("FTPricer", self)
+    ):
+        pricer = FTPricer()
+        single = pricer.price.local(DESCRIPTIONS[1])
+        batch = pricer.price_batch.local(DESCRIPTIONS)
+
+    assert single > 0
+    assert batch[1] == pytest.approx(single, abs=0.01)
+    assert len(batch) == len(DESCRIPTIONS)
@@ -0,0 +1,87 @@
+"""Test module for single-flight scans shared by identical requests."""
+
+from concurrent.futures import Future
+from unittest.mock import Mock, patch
+
+from src.agents.coalescer import ScanCoalescer, scan_key
+
+
+def _coalescer(ttl_s: float = 120):
+    """Coalescer whose runs finish when the test resolves their future."""
+    futures = []
+
+    def start(run, categories, deadline_s):
+        futures.append(Future())
+        return futures[-1]
+
+    return ScanCoalescer(Mock(side_effect=start), ttl_s), futures
+
+
+def test_scan_key_ignores_order_and_duplicates():
+    """Tests the normalized category set."""
+    assert scan_key(["Electronics", " Computers", "Electronics"]) == (
+        "Computers",
+        "Electronics",
+    )
+
+
+def test_identical_requests_share_the_run_in_flight():
+    """Tests that a duplicate attaches to the running scan without admission."""
+    coalescer, futures = _coalescer()
+    admit = Mock(return_value=True)
+
+    run, source, _ = coalescer.submit(["Electronics", "Computers"], admit=admit)
+    same, joined, _ = coalescer.submit(["Computers", "Electronics"], admit=admit)
+    other, _, _ = coalescer.submit(["Automotive"], admit=admit)
+
+    assert (source, joined) == ("new", "joined")
+    assert same is run and other is not run
+    assert coalescer.start.call_count == 2
+    assert admit.call_count == 2
+
+
+def test_finished_run_is_served_within_ttl():
+    """Tests that a successful run's results are reused until the TTL expires."""
+    coalescer, futures = _coalescer(ttl_s=60)
+    run, _, _ = coalescer.submit(["Electronics"])
+    futures[0].set_result(None)
+
+    cached, source, _ = coalescer.submit(["Electronics"])
+    assert cached is run and source == "cached"
+
+    with patch("src.agents.coalescer.time.monotonic", return_value=1e12):
+        fresh, source, _ = coalescer.submit(["Electronics"])
+    assert fresh is not run and source == "new"
+
+
+def test_failed_run_is_not_reused():
+    """Tests that a failed scan is retried by the next request."""
+    coalescer, futures = _coalescer()
+    run, _, _ = coalescer.submit(["Electronics"])
+    run.error = "OpenAI is down"
+    futures[0].set_result(None)
+
+    retry, source, _ = coalescer.submit(["Electronics"])
+    assert retry is not run and source == "new"
+
+
+def test_refused_admission_starts_nothing():
+    """Tests that a request over the demo limit gets no run."""
+    coalescer, _ = _coalescer()
+    run, _, _ = coalescer.submit(["Electronics"], admit=lambda: False)
+
+    assert run is None
+    coalescer.start.assert_not_called()
+
+
+def test_runs_are_shared_only_with_the_same_deadline():
+    """Tests that a run degraded for a short deadline is not served to others."""
+    coalescer, futures = _coalescer()
+
+    rushed, _, _ = coalescer.submit(["Electronics"], deadline_s=5)
+    unhurried, source, _ = coalescer.submit(["Electronics"])
+    same, joined, _ = coalescer.submit(["Electronics"], deadline_s=5)
+
+    assert unhurried is not rushed and source == "new"
+    assert same is rushed and joined == "joined"
+    assert [c.args[2] for c in coalescer.start.call_args_list] == [5, None]
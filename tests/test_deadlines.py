@@ -0,0 +1,74 @@
+"""Test module for client-side deadlines and hedged remote calls."""
+
+import threading
+import time
+
+import pytest
+
+from src.agents.deadlines import DeadlineExceeded, RemoteCaller
+from src.agents.run_context import RunContext, run_scope
+
+
+def test_call_within_deadline_returns_result():
+    """Tests a call that answers in time."""
+    caller = RemoteCaller("ft", deadline_s=1.0)
+    assert caller(lambda x: x * 2, 21) == 42
+
+
+def test_slow_call_misses_deadline():
+    """Tests that the caller stops waiting at the deadline."""
+    caller = RemoteCaller("ft", deadline_s=0.05)
+    start = time.monotonic()
+
+    with pytest.raises(DeadlineExceeded, match="ft did not answer within"):
+        caller(time.sleep, 1.0)
+    assert time.monotonic() - start < 0.5
+
+
+def test_errors_propagate():
+    """Tests that a failing call raises its own error, not a timeout."""
+    caller = RemoteCaller("rag", deadline_s=1.0)
+    with pytest.raises(ValueError, match="boom"):
+        caller(lambda: (_ for _ in ()).throw(ValueError("boom")))
+
+
+def test_hedged_request_after_p95():
+    """Tests that a call slower than the recent p95 is duplicated."""
+    caller = RemoteCaller("xgb", deadline_s=2.0, hedge=True)
+    for _ in range(20):
+        caller._record(0.01)
+    calls = []
+    lock = threading.Lock()
+
+    def stuck_once() -> str:
+        with lock:
+            calls.append(None)
+            first = len(calls) == 1
+        if first:
+            time.sleep(1.0)  # The first container is stuck
+            return "slow"
+        return "fast"
+
+    assert caller(stuck_once) == "fast"
+    assert caller.hedged == 1
+
+
+def test_calls_never_outlast_the_run_deadline():
+    """Tests that the run's deadline cuts the model's own deadline."""
+    caller = RemoteCaller("ft", deadline_s=60.0)
+    run = RunContext()
+    run.start_deadline(0.05)
+    with run_scope(run):
+        with pytest.raises(DeadlineExceeded):
+            caller(time.sleep, 1.0)
+        with pytest.raises(DeadlineExceeded, match="run deadline passed"):
+            caller(lambda: 42)
+
+
+def test_warm_after_an_answer():
+    """Tests that a service counts as warm only shortly after answering."""
+    caller = RemoteCaller("ft")
+    assert not caller.is_warm(300)
+    caller.touch()
+    assert caller.is_warm(300)
+    assert not caller.is_warm(0)
@@ -166,7 +166,7 @@ def test_scan_with_deals(
 
     result = agent.scan(categories=TEST_CATEGORIES)
 
-    mock_fetch_deals.assert_called_once_with(TEST_CATEGORIES)
+    mock_fetch_deals.assert_called_once_with(TEST_CATEGORIES, None, True)
     mock_openai.beta.chat.completions.parse.assert_called_once()
 
     call_args = mock_openai.beta.chat.completions.parse.call_args
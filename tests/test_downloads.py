@@ -0,0 +1,149 @@
+"""Test module for streaming, resumable archive downloads."""
+
+import hashlib
+import io
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.modal_services.downloads import (
+    COMPLETE_MARKER,
+    download_file,
+    ensure_extracted_archive,
+    is_complete,
+)
+
+
+def _make_zip() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("chroma.sqlite3", b"sqlite" * 1000)
+        zf.writestr("index/data_level0.bin", os.urandom(4096))
+    return buffer.getvalue()
+
+
+PAYLOAD = _make_zip()
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD with single-range support and records request headers."""
+
+    requests_seen = []
+
+    def do_GET(self):  # noqa: N802
+        """Serve the full payload or the requested byte range."""
+        RangeHandler.requests_seen.append(self.headers.get("Range"))
+        byte_range = self.headers.get("Range")
+        if byte_range:
+            start = int(byte_range.split("=")[1].rstrip("-"))
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.end_headers()
+                return
+            body = PAYLOAD[start:]
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}"
+            )
+        else:
+            body = PAYLOAD
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Keep test output quiet."""
+
+
+@pytest.fixture
+def server_url():
+    """Local HTTP server serving the archive."""
+    RangeHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/chroma.zip"
+    server.shutdown()
+
+
+def test_download_streams_and_verifies(tmp_path, server_url):
+    """Tests a full download with checksum verification."""
+    dest = str(tmp_path / "chroma.zip")
+    digest = download_file(server_url, dest, sha256=PAYLOAD_SHA256, chunk_size=512)
+
+    assert digest == PAYLOAD_SHA256
+    assert open(dest, "rb").read() == PAYLOAD
+    assert not os.path.exists(f"{dest}.part")
+
+
+def test_download_resumes_with_range_request(tmp_path, server_url):
+    """Tests that an interrupted download resumes from the partial file."""
+    dest = str(tmp_path / "chroma.zip")
+    with open(f"{dest}.part", "wb") as f:
+        f.write(PAYLOAD[:1000])
+
+    download_file(server_url, dest, sha256=PAYLOAD_SHA256)
+
+    assert RangeHandler.requests_seen == ["bytes=1000-"]
+    assert open(dest, "rb").read() == PAYLOAD
+
+
+def test_checksum_mismatch_discards_partial(tmp_path, server_url):
+    """Tests that a bad checksum raises and leaves nothing behind."""
+    dest = str(tmp_path / "chroma.zip")
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        download_file(server_url, dest, sha256="0" * 64)
+
+    assert not os.path.exists(dest)
+    assert not os.path.exists(f"{dest}.part")
+
+
+def test_ensure_extracted_archive_is_atomic_and_idempotent(tmp_path, server_url):
+    """Tests atomic extraction, and that a half-extracted directory is rebuilt."""
+    target = str(tmp_path / "chroma")
+    os.makedirs(target)
+    open(os.path.join(target, "chroma.sqlite3"), "w").close()  # broken leftover
+    assert not is_complete(target)
+
+    ensure_extracted_archive(server_url, target, PAYLOAD_SHA256)
+
+    assert is_complete(target)
+    assert open(os.path.join(target, COMPLETE_MARKER)).read() == PAYLOAD_SHA256
+    assert os.path.getsize(os.path.join(target, "chroma.sqlite3")) == 6000
+    assert not os.path.exists(f"{target}.zip")
+    assert sorted(os.listdir(tmp_path)) == ["chroma"]
+
+    ensure_extracted_archive(server_url, target, PAYLOAD_SHA256)
+    assert len(RangeHandler.requests_seen) == 1
+
+
+@pytest.mark.parametrize("sha256", [None, PAYLOAD_SHA256])
+def test_corrupt_leftover_zip_is_downloaded_again(tmp_path, server_url, sha256):
+    """Tests that a corrupt archive from an earlier run is discarded, not reused."""
+    target = str(tmp_path / "chroma")
+    with open(f"{target}.zip", "wb") as f:
+        f.write(PAYLOAD[:-100] + b"\0" * 100)
+
+    ensure_extracted_archive(server_url, target, sha256)
+
+    assert is_complete(target)
+    assert RangeHandler.requests_seen == [None]
+    assert sorted(os.listdir(tmp_path)) == ["chroma"]
+
+
+def test_corrupt_resumed_download_is_fetched_again(tmp_path, server_url):
+    """Tests that an archive failing extraction is deleted with its partial file."""
+    target = str(tmp_path / "chroma")
+    with open(f"{target}.zip.part", "wb") as f:
+        f.write(b"garbage!" * 125)  # resumed at byte 1000, the zip is unreadable
+
+    ensure_extracted_archive(server_url, target)
+
+    assert is_complete(target)
+    assert RangeHandler.requests_seen == ["bytes=1000-", None]
+    assert sorted(os.listdir(tmp_path)) == ["chroma"]
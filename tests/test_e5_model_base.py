@@ -0,0 +1,156 @@
+"""Test module for E5 model loading, ONNX export and parity checks."""
+
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from src.modal_services import e5_model_base
+from src.modal_services.artifacts import ArtifactResolver, LocalDirSource
+from src.modal_services.e5_model_base import (
+    E5_ONNX_NAME,
+    E5ModelBase,
+    load_e5_model,
+    parity_report,
+    resolve_device,
+)
+
+
+class StubSentenceTransformer:
+    """Records how it was built and writes an ONNX graph on save."""
+
+    instances = []
+
+    def __init__(self, model_dir, device=None, backend="torch", model_kwargs=None):
+        self.model_dir = model_dir
+        self.device = device
+        self.backend = backend
+        self.model_kwargs = model_kwargs or {}
+        StubSentenceTransformer.instances.append(self)
+
+    def save_pretrained(self, path):
+        """Write the fp32 graph, as the ONNX backend does."""
+        os.makedirs(os.path.join(path, "onnx"), exist_ok=True)
+        with open(os.path.join(path, "onnx", "model.onnx"), "wb") as f:
+            f.write(b"fp32" * 10)
+
+    def encode(self, texts):
+        """Constant 3-d embeddings."""
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+
+def _export_int8(model, qconfig, path):
+    with open(os.path.join(path, "onnx", f"model_qint8_{qconfig}.onnx"), "wb") as f:
+        f.write(b"int8" * 10)
+
+
+@pytest.fixture
+def sentence_transformers(monkeypatch):
+    """Stub `sentence_transformers` module."""
+    StubSentenceTransformer.instances = []
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = StubSentenceTransformer
+    module.export_dynamic_quantized_onnx_model = _export_int8
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    return module
+
+
+@pytest.fixture
+def resolver(tmp_path, monkeypatch):
+    """Resolver over a local copy of the E5 repository."""
+    repo_dir = tmp_path / "source" / "intfloat" / "e5-small-v2"
+    repo_dir.mkdir(parents=True)
+    (repo_dir / "config.json").write_text('{"hidden_size": 384}')
+    (repo_dir / "model.safetensors").write_bytes(b"weights" * 100)
+    resolver = ArtifactResolver(
+        str(tmp_path / "cache"), LocalDirSource(str(tmp_path / "source"))
+    )
+    monkeypatch.setattr(e5_model_base, "get_resolver", lambda: resolver)
+    return resolver
+
+
+@pytest.mark.parametrize("cuda", [True, False])
+def test_resolve_device(monkeypatch, cuda):
+    """Tests that "auto" follows GPU visibility and explicit devices pass through."""
+    torch = types.SimpleNamespace(cuda=types.SimpleNamespace(is_available=lambda: cuda))
+    monkeypatch.setitem(sys.modules, "torch", torch)
+
+    assert resolve_device("auto") == ("cuda" if cuda else "cpu")
+    assert resolve_device("cpu") == "cpu"
+    assert resolve_device("cuda") == "cuda"
+
+
+def test_unknown_backend_is_rejected():
+    """Tests that a typo in the backend fails before anything is downloaded."""
+    with pytest.raises(ValueError, match="Unknown E5 backend"):
+        load_e5_model("cpu", "tensorrt")
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_onnx_backends_reject_cuda(backend):
+    """Tests that asking for cuda with a CPU-only backend is an error."""
+    with pytest.raises(ValueError, match="CPU only"):
+        load_e5_model("cuda", backend)
+
+
+def test_torch_backend_loads_resolved_model(sentence_transformers, resolver):
+    """Tests that the torch backend loads the cached model on the given device."""
+    model = load_e5_model("cpu", "torch")
+
+    assert model.model_dir == resolver.local_dir("e5_model")
+    assert model.device == "cpu"
+
+
+def test_onnx_export_is_staged_then_recorded(sentence_transformers, resolver):
+    """Tests that the export lands in place before the manifest records it."""
+    onnx_dir = resolver.local_dir(E5_ONNX_NAME)
+    recorded = []
+    original_record = resolver.record
+
+    def record(name):
+        recorded.append(sorted(os.listdir(os.path.join(onnx_dir, "onnx"))))
+        assert not [d for d in os.listdir(resolver.cache_dir) if d.endswith(".tmp")]
+        original_record(name)
+
+    resolver.record = record
+    model = load_e5_model("auto", "onnx-int8")
+
+    assert recorded == [["model.onnx", "model_qint8_avx2.onnx"]]
+    assert model.device == "cpu"
+    assert model.model_kwargs == {"file_name": "onnx/model_qint8_avx2.onnx"}
+    assert resolver.lookup(E5_ONNX_NAME) == onnx_dir
+
+    load_e5_model("cpu", "onnx")  # Exported once, then reused
+    assert len(recorded) == 1
+    assert StubSentenceTransformer.instances[-1].model_kwargs == {
+        "file_name": "onnx/model.onnx"
+    }
+
+
+def test_parity_report_compares_normalized_rows():
+    """Tests the cosine and max-difference maths on known vectors."""
+    reference = np.array([[1.0, 0.0], [0.0, 2.0]])
+    candidate = np.array([[2.0, 0.0], [1.0, 1.0]])
+
+    report = parity_report(reference, candidate)
+
+    assert report["max_abs_diff"] == pytest.approx(np.sqrt(0.5))
+    assert report["min_cosine"] == pytest.approx(np.sqrt(0.5))
+    assert report["mean_cosine"] == pytest.approx((1 + np.sqrt(0.5)) / 2)
+    assert parity_report(reference, reference * 3)["min_cosine"] == pytest.approx(1)
+
+
+def test_embed_memoizes_stub_encoder():
+    """Tests that repeated descriptions are encoded once."""
+    base = E5ModelBase()
+    encoder = StubSentenceTransformer("unused")
+    calls = []
+    encoder.encode = lambda texts: calls.append(texts) or np.ones((len(texts), 3))
+    base.attach_e5_model(encoder)
+
+    base.embed("iPhone 15")
+    base.embed("iPhone 15")
+
+    assert calls == [["passage: iPhone 15"]]
@@ -0,0 +1,55 @@
+"""Test module for E5PriceAgent."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.agents.e5_price_agent import E5PriceAgent
+from src.modal_services.app_config import APP_NAME
+
+
+@pytest.fixture
+def mock_modal():
+    """Mocks Modal remote class."""
+    with patch("modal.Cls.from_name") as mock_from_name:
+        mock_remote_instance = MagicMock()
+        mock_remote_cls = MagicMock(return_value=mock_remote_instance)
+        mock_from_name.return_value = mock_remote_cls
+        yield mock_from_name, mock_remote_instance
+
+
+@pytest.fixture
+def agent(mock_modal):
+    """Returns an agent with mocked remote."""
+    with patch.object(E5PriceAgent, "log") as mock_log:
+        agent = E5PriceAgent()
+        yield agent, mock_log
+
+
+def test_initialization(agent, mock_modal):
+    """Tests that the agent connects to the co-located E5Pricer."""
+    agent_instance, mock_log = agent
+    mock_from_name, _ = mock_modal
+
+    mock_from_name.assert_called_once_with(APP_NAME, "E5Pricer")
+    assert agent_instance.e5 is not None
+    mock_log.assert_called()
+
+
+def test_price_returns_rag_and_xgb(agent):
+    """Tests that one remote call yields both RAG and XGB estimates."""
+    agent_instance, _ = agent
+    agent_instance.e5.price.remote = MagicMock(return_value={"rag": 49.99, "xgb": 45.5})
+
+    assert agent_instance.price("Wireless earbuds") == (49.99, 45.5)
+    agent_instance.e5.price.remote.assert_called_once_with("Wireless earbuds")
+
+
+def test_price_remote_exception(agent):
+    """Tests that remote failures are logged and raised as RuntimeError."""
+    agent_instance, mock_log = agent
+    agent_instance.e5.price.remote = MagicMock(side_effect=Exception("GPU lost"))
+
+    with pytest.raises(RuntimeError, match="E5PriceAgent failed to get prices"):
+        agent_instance.price("Broken item")
+    mock_log.assert_any_call("[ERROR] Remote E5Pricer failed: GPU lost")
@@ -1,14 +1,22 @@
 """Unit tests for EnsemblePriceAgent.
 
-Calls a remote Modal class to predict final prices.
+Combines predictions locally or through a remote Modal class.
 """
 
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, call, patch
 
+import numpy as np
 import pytest
 
+from src.agents import ensemble_price_agent
 from src.agents.ensemble_price_agent import EnsemblePriceAgent
+from src.agents.run_context import run_scope
 from src.modal_services.app_config import APP_NAME
+from src.modal_services.stand_ins import get_stand_in_models
+from src.models.ensemble_model import LinearEnsemble
+from src.utils.estimate_cache import EstimateCache
 
 
 @pytest.fixture
@@ -16,6 +24,7 @@ def mock_modal():
     """Fixture that mocks the Modal remote class instantiation."""
     with patch("modal.Cls.from_name") as mock_from_name:
         mock_remote_instance = MagicMock()
+        mock_remote_instance.model_versions.remote.return_value = {}
         mock_remote_cls = MagicMock(return_value=mock_remote_instance)
         mock_from_name.return_value = mock_remote_cls
         yield mock_from_name, mock_remote_instance
@@ -25,7 +34,7 @@ def mock_modal():
 def agent(mock_modal):
     """Fixture returning a mocked EnsemblePriceAgent with patched logging."""
     with patch.object(EnsemblePriceAgent, "log") as mock_log:
-        agent = EnsemblePriceAgent()
+        agent = EnsemblePriceAgent(shared_embedding=False, ensemble_backend="remote")
         yield agent, mock_log
 
 
@@ -70,7 +79,7 @@ def test_price_remote_exception(mock_modal):
     mock_remote_instance.price.remote.side_effect = Exception("Modal failed")
 
     with patch.object(EnsemblePriceAgent, "log") as mock_log:
-        agent = EnsemblePriceAgent()
+        agent = EnsemblePriceAgent(shared_embedding=False, ensemble_backend="remote")
 
         # Mock sub-agent predictions
         with (
@@ -89,3 +98,437 @@ def test_price_remote_exception(mock_modal):
             mock_log.assert_any_call(
                 "[ERROR] Remote EnsemblePricer failed: Modal failed"
             )
+
+
+def test_price_shared_embedding(mock_modal):
+    """Tests that RAG and XGB come from one E5 call in shared-embedding mode."""
+    mock_from_name, _ = mock_modal
+    with patch.object(EnsemblePriceAgent, "log"):
+        agent = EnsemblePriceAgent(shared_embedding=True, ensemble_backend="remote")
+
+    assert call(APP_NAME, "E5Pricer") in mock_from_name.call_args_list
+    assert call(APP_NAME, "RAGPricer") not in mock_from_name.call_args_list
+
+    with (
+        patch.object(agent, "ft_agent") as mock_ft,
+        patch.object(agent, "e5_agent") as mock_e5,
+    ):
+        mock_ft.price.return_value = 100.0
+        mock_e5.price.return_value = (120.0, 130.0)
+        agent.ensemble.price.remote = MagicMock(return_value=115.0)
+
+        assert agent.price("Shared description") == 115.0
+        mock_e5.price.assert_called_once_with("Shared description")
+        agent.ensemble.price.remote.assert_called_once_with(100.0, 120.0, 130.0)
+
+
+def test_price_local_backend(mock_modal, tmp_path):
+    """Tests the in-process ensemble, fetching coefficients once and caching them."""
+    _, mock_remote_instance = mock_modal
+    coefficients = LinearEnsemble([0.5, 0.2, 0.1, 0.1, 0.1], 1.0).to_dict()
+    mock_remote_instance.coefficients.remote.return_value = coefficients
+    cache_file = tmp_path / "ensemble_coefficients.json"
+
+    with (
+        patch.object(ensemble_price_agent, "ENSEMBLE_COEFFICIENTS_FILE", cache_file),
+        patch.object(
+            ensemble_price_agent, "model_versions", return_value={"ensemble": "v1"}
+        ),
+        patch.object(EnsemblePriceAgent, "log"),
+    ):
+        agent = EnsemblePriceAgent(shared_embedding=True, ensemble_backend="local")
+        with (
+            patch.object(agent, "ft_agent") as mock_ft,
+            patch.object(agent, "e5_agent") as mock_e5,
+        ):
+            mock_ft.price.return_value = 100.0
+            mock_e5.price.return_value = (120.0, 130.0)
+
+            # 0.5*100 + 0.2*120 + 0.1*130 + 0.1*130 + 0.1*116.67 + 1
+            assert agent.price("Local description") == 112.67
+            agent.price("Local description")
+
+        mock_remote_instance.price.remote.assert_not_called()
+        mock_remote_instance.coefficients.remote.assert_called_once()
+        assert LinearEnsemble.load(cache_file).to_dict() == {
+            **coefficients,
+            "version": "v1",
+        }
+
+        # A new agent reads the cached coefficients without calling Modal
+        EnsemblePriceAgent(ensemble_backend="local")._load_combiner()
+        mock_remote_instance.coefficients.remote.assert_called_once()
+
+
+def test_local_backend_refetches_coefficients_of_a_new_ensemble(mock_modal, tmp_path):
+    """Tests that cached coefficients of another ensemble artifact are replaced."""
+    _, mock_remote_instance = mock_modal
+    mock_remote_instance.coefficients.remote.return_value = LinearEnsemble(
+        [0.0, 0.0, 0.0, 0.0, 1.0], 2.0
+    ).to_dict()
+    cache_file = tmp_path / "ensemble_coefficients.json"
+    LinearEnsemble([1.0, 0.0, 0.0, 0.0, 0.0], 0.0, version="v1").save(cache_file)
+
+    with (
+        patch.object(ensemble_price_agent, "ENSEMBLE_COEFFICIENTS_FILE", cache_file),
+        patch.object(
+            ensemble_price_agent, "model_versions", return_value={"ensemble": "v2"}
+        ),
+        patch.object(EnsemblePriceAgent, "log"),
+    ):
+        combiner = EnsemblePriceAgent(ensemble_backend="local")._load_combiner()
+
+    mock_remote_instance.coefficients.remote.assert_called_once()
+    assert combiner.intercept == 2.0
+    assert LinearEnsemble.load(cache_file).version == "v2"
+
+
+def _with_subsets(subsets):
+    """Default test ensemble with the given subset models (JSON form)."""
+    return LinearEnsemble.from_dict(
+        {**LinearEnsemble([0.3, 0.3, 0.4, 0.0, 0.0], 0.0).to_dict(), "subsets": subsets}
+    )
+
+
+@pytest.mark.parametrize(
+    ("xgb_pred", "expect_full"),
+    [(160.0, True), (400.0, False), (80.0, False)],
+)
+def test_price_cascade(mock_modal, xgb_pred, expect_full):
+    """Tests that FT and RAG only run for deals near the threshold."""
+    with patch.object(EnsemblePriceAgent, "log"):
+        agent = EnsemblePriceAgent(shared_embedding=True, cascade=True)
+    agent.combiner = _with_subsets(
+        {"XGBoost": {"coef": {"XGBoost": 1.0}, "intercept": 0.0}}
+    )
+    agent.reset_cascade_stats()
+
+    with (
+        patch.object(agent, "ft_agent") as mock_ft,
+        patch.object(agent, "e5_agent") as mock_e5,
+    ):
+        mock_ft.price.return_value = 150.0
+        mock_e5.price_models.side_effect = lambda _, models: {
+            "xgb": xgb_pred,
+            "rag": 140.0,
+        }
+        result = agent.price("Cascade description", listed_price=100.0)
+
+    assert mock_ft.price.called == expect_full
+    if expect_full:
+        assert result == 0.3 * 150.0 + 0.3 * 140.0 + 0.4 * xgb_pred
+        assert agent.cascade_stats == {"priced": 1, "ft_skipped": 0, "rag_skipped": 0}
+    else:
+        assert result == xgb_pred  # XGB-only subset model
+        assert agent.cascade_stats == {"priced": 1, "ft_skipped": 1, "rag_skipped": 1}
+
+
+def test_cascade_needs_xgb_only_subset_model(mock_modal):
+    """Tests that without an XGB-only model every deal gets the full ensemble."""
+    with patch.object(EnsemblePriceAgent, "log") as mock_log:
+        agent = EnsemblePriceAgent(shared_embedding=True, cascade=True)
+        agent.combiner = LinearEnsemble([0.3, 0.3, 0.4, 0.0, 0.0], 0.0)
+
+        with (
+            run_scope(),
+            patch.object(agent, "ft_agent") as mock_ft,
+            patch.object(agent, "e5_agent") as mock_e5,
+        ):
+            mock_ft.price.return_value = 150.0
+            mock_e5.price.return_value = (140.0, 400.0)
+            agent.price("Acme laptop", listed_price=100.0)
+            agent.price("Acme TV", listed_price=100.0)
+
+    assert mock_ft.price.call_count == 2
+    mock_e5.price_models.assert_not_called()
+    warnings = [c for c in mock_log.call_args_list if "cascade" in c.args[0]]
+    assert len(warnings) == 1
+
+
+def test_subset_model_overrides_imputation():
+    """Tests that a shipped XGB-only model is used for skipped predictions."""
+    combiner = _with_subsets({"XGBoost": {"coef": {"XGBoost": 0.9}, "intercept": 5.0}})
+
+    assert combiner.predict_partial(xgb=100.0) == 95.0
+    assert combiner.predict_partial(rag=100.0, xgb=50.0) == 0.3 * 75 + 30 + 20
+    assert LinearEnsemble.from_dict(combiner.to_dict()).subsets.keys() == {"XGBoost"}
+
+
+def test_price_reuses_cached_estimate(mock_modal, tmp_path):
+    """Tests that a cached estimate skips every model call."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"))
+    with (
+        patch.object(EnsemblePriceAgent, "log"),
+        patch.object(
+            ensemble_price_agent, "model_versions", return_value={"ft": "v1"}
+        ) as mock_versions,
+    ):
+        agent = EnsemblePriceAgent(shared_embedding=True, estimate_cache=cache)
+        agent.combiner = LinearEnsemble([0.3, 0.3, 0.4, 0.0, 0.0], 0.0)
+
+        with (
+            patch.object(agent, "ft_agent") as mock_ft,
+            patch.object(agent, "e5_agent") as mock_e5,
+        ):
+            mock_ft.price.return_value = 150.0
+            mock_e5.price.return_value = (140.0, 160.0)
+            first = agent.price("Acme laptop")
+            second = agent.price("  ACME laptop ")
+
+    assert first == second
+    mock_ft.price.assert_called_once()
+    mock_versions.assert_called_once()
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_model_versions_are_reread(mock_modal, tmp_path):
+    """Tests that a model changed since the last read invalidates its estimates."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"))
+    with (
+        patch.object(EnsemblePriceAgent, "log"),
+        patch.object(
+            ensemble_price_agent,
+            "model_versions",
+            side_effect=[{"ft": "v1"}, {"ft": "v2"}],
+        ),
+    ):
+        agent = EnsemblePriceAgent(shared_embedding=True, estimate_cache=cache)
+        agent.combiner = LinearEnsemble([0.3, 0.3, 0.4, 0.0, 0.0], 0.0)
+
+        with (
+            patch.object(agent, "ft_agent") as mock_ft,
+            patch.object(agent, "e5_agent") as mock_e5,
+        ):
+            mock_ft.price.return_value = 150.0
+            mock_e5.price.return_value = (140.0, 160.0)
+            agent.price("Acme laptop")
+            agent.price("Acme laptop")
+            with patch.object(ensemble_price_agent, "MODEL_VERSIONS_TTL_S", 0):
+                agent.price("Acme laptop")
+
+    assert mock_ft.price.call_count == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_concurrent_runs_share_one_versions_read(mock_modal):
+    """Tests that runs starting together wait for a single versions read."""
+
+    def slow_versions(backend):
+        time.sleep(0.05)
+        return {"ft": "v1"}
+
+    with (
+        patch.object(EnsemblePriceAgent, "log"),
+        patch.object(
+            ensemble_price_agent, "model_versions", side_effect=slow_versions
+        ) as mock_versions,
+    ):
+        agent = EnsemblePriceAgent(shared_embedding=True)
+
+        def run():
+            with run_scope():
+                return agent._model_versions()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: run(), range(4)))
+
+    assert results == [{"ft": "v1"}] * 4
+    mock_versions.assert_called_once()
+
+
+def test_cascade_entry_is_not_reused_for_a_full_estimate(mock_modal, tmp_path):
+    """Tests that an XGB-only entry is recomputed once the deal is borderline."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"))
+    with (
+        patch.object(EnsemblePriceAgent, "log"),
+        patch.object(ensemble_price_agent, "model_versions", return_value={}),
+    ):
+        agent = EnsemblePriceAgent(
+            shared_embedding=True, cascade=True, estimate_cache=cache
+        )
+        agent.combiner = _with_subsets(
+            {"XGBoost": {"coef": {"XGBoost": 1.0}, "intercept": 0.0}}
+        )
+
+        with (
+            patch.object(agent, "ft_agent") as mock_ft,
+            patch.object(agent, "e5_agent") as mock_e5,
+        ):
+            mock_ft.price.return_value = 150.0
+            mock_e5.price_models.side_effect = lambda _, models: {
+                "xgb": 400.0,
+                "rag": 140.0,
+            }
+            assert agent.price("Acme laptop", listed_price=100.0) == 400.0
+            assert agent.price("Acme laptop", listed_price=100.0) == 400.0
+            mock_ft.price.assert_not_called()
+
+            # Listed at 300, the same XGB estimate falls in the uncertainty band
+            agent.price("Acme laptop", listed_price=300.0)
+            mock_ft.price.assert_called_once()
+
+
+def test_price_reuses_estimate_of_similar_description(mock_modal, tmp_path):
+    """Tests the semantic tier: a close paraphrase reuses the cached estimate."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"))
+    embeddings = {
+        "Acme laptop, 16GB RAM": np.array([1.0, 0.0], dtype=np.float32),
+        "16GB RAM Acme laptop": np.array([0.99, 0.141], dtype=np.float32),
+        "Nova phone": np.array([0.0, 1.0], dtype=np.float32),
+    }
+    with (
+        patch.object(EnsemblePriceAgent, "log"),
+        patch.object(ensemble_price_agent, "model_versions", return_value={}),
+    ):
+        agent = EnsemblePriceAgent(shared_embedding=True, estimate_cache=cache)
+        agent.combiner = LinearEnsemble([0.3, 0.3, 0.4, 0.0, 0.0], 0.0)
+        agent.reset_cache_stats()
+
+        with (
+            patch.object(agent, "ft_agent") as mock_ft,
+            patch.object(agent, "e5_agent") as mock_e5,
+        ):
+            mock_ft.price.return_value = 150.0
+            mock_e5.price_with_embedding.side_effect = lambda d, models: (
+                embeddings[d],
+                {"xgb": 160.0},
+            )
+            mock_e5.price_models.return_value = {"rag": 140.0}
+            first = agent.price("Acme laptop, 16GB RAM")
+            assert agent.price("16GB RAM Acme laptop") == first
+            agent.price("Nova phone")
+
+    assert first == 0.3 * 150.0 + 0.3 * 140.0 + 0.4 * 160.0
+    assert mock_ft.price.call_count == 2
+    # The XGB estimate comes with the embedding; only RAG is asked separately
+    mock_e5.price.assert_not_called()
+    assert mock_e5.price_models.call_args_list == [
+        call("Acme laptop, 16GB RAM", ["rag"]),
+        call("Nova phone", ["rag"]),
+    ]
+    assert agent.cache_stats == {"exact_hits": 0, "semantic_hits": 1, "misses": 2}
+    assert agent.similarities[0] > 0.99
+    assert agent.cache_report().startswith("1/3 estimates from cache")
+
+
+def test_fitted_subsets_recover_linear_models():
+    """Tests the least-squares fit of one fallback model per subset."""
+    rng = np.random.default_rng(0)
+    predictions = rng.uniform(10, 500, size=(50, 3))
+    prices = 0.5 * predictions[:, 1] + 0.5 * predictions[:, 2] + 5.0
+
+    combiner = LinearEnsemble([0.3, 0.3, 0.4, 0.0, 0.0], 0.0).with_fitted_subsets(
+        predictions, prices
+    )
+
+    assert len(combiner.subsets) == 6  # 3 singles + 3 pairs
+    assert combiner.predict_partial(rag=100.0, xgb=200.0) == pytest.approx(155.0)
+    assert LinearEnsemble.from_dict(combiner.to_dict()).subsets.keys() == (
+        combiner.subsets.keys()
+    )
+
+
+def test_subset_models_ship_with_the_estimator():
+    """Tests that subsets fitted in notebook 05 are read from the pickled model."""
+    model = MagicMock(
+        coef_=np.array([0.3, 0.3, 0.4, 0.0, 0.0]),
+        intercept_=0.0,
+        subsets_={"XGBoost": {"coef": {"XGBoost": 0.9}, "intercept": 5.0}},
+        spec=["coef_", "intercept_", "subsets_"],
+    )
+
+    combiner = LinearEnsemble.from_estimator(model)
+
+    assert combiner.has_subset_model(xgb=100.0)
+    assert not combiner.has_subset_model(ft=100.0, xgb=100.0)
+    assert combiner.predict_partial(xgb=100.0) == 95.0
+
+
+def test_local_stand_in_ensemble_has_subset_models():
+    """Tests that the local backend ships a fallback for every subset."""
+    combiner = get_stand_in_models().combiner
+
+    assert len(combiner.subsets) == 6
+    assert combiner.predict_partial(xgb=900.0) > combiner.predict_partial(xgb=60.0)
+
+
+def test_model_past_deadline_is_left_out(mock_modal, tmp_path):
+    """Tests that a late FT call still yields an estimate, which is not cached."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"))
+    with (
+        patch.object(EnsemblePriceAgent, "log") as mock_log,
+        patch.object(ensemble_price_agent, "model_versions", return_value={}),
+    ):
+        agent = EnsemblePriceAgent(
+            shared_embedding=True, estimate_cache=cache, semantic_cache=False
+        )
+        agent.combiner = _with_subsets(
+            {
+                "GPT4oMini+XGBoost": {
+                    "coef": {"GPT4oMini": 0.5, "XGBoost": 0.5},
+                    "intercept": 1.0,
+                }
+            }
+        )
+
+        with (
+            run_scope() as run,
+            patch.object(agent, "ft_agent") as mock_ft,
+            patch.object(agent, "e5_agent") as mock_e5,
+        ):
+            mock_ft.price.side_effect = RuntimeError("FTPricer timed out")
+            mock_e5.price.return_value = (140.0, 160.0)
+            result = agent.price("Acme laptop")
+
+    assert result == pytest.approx(151.0)  # RAG (GPT4oMini) + XGBoost subset model
+    assert any("FT unavailable" in c.args[0] for c in mock_log.call_args_list)
+    assert run.missing_predictions == {"ft": 1}
+    assert len(cache) == 0
+
+
+def test_missing_subset_model_leaves_deal_unpriced(mock_modal):
+    """Tests that a partial estimate is refused rather than imputed."""
+    with patch.object(EnsemblePriceAgent, "log") as mock_log:
+        agent = EnsemblePriceAgent(shared_embedding=True, semantic_cache=False)
+        agent.combiner = LinearEnsemble([0.3, 0.3, 0.4, 0.0, 0.0], 0.0)
+
+        with (
+            run_scope(),
+            patch.object(agent, "ft_agent") as mock_ft,
+            patch.object(agent, "e5_agent") as mock_e5,
+        ):
+            mock_ft.price.side_effect = RuntimeError("FTPricer timed out")
+            mock_e5.price.return_value = (140.0, 160.0)
+            with pytest.raises(RuntimeError, match="failed to get final price"):
+                agent.price("Acme laptop")
+
+    assert any(
+        "No fallback model without FT" in c.args[0] for c in mock_log.call_args_list
+    )
+
+
+def test_skipped_model_is_not_called(mock_modal):
+    """Tests that a model the run skips is left out without being called."""
+    with patch.object(EnsemblePriceAgent, "log"):
+        agent = EnsemblePriceAgent(shared_embedding=True, estimate_cache=None)
+        agent.combiner = _with_subsets(
+            {
+                "GPT4oMini+XGBoost": {
+                    "coef": {"GPT4oMini": 0.5, "XGBoost": 0.5},
+                    "intercept": 1.0,
+                }
+            }
+        )
+
+        with (
+            run_scope() as run,
+            patch.object(agent, "ft_agent") as mock_ft,
+            patch.object(agent, "e5_agent") as mock_e5,
+        ):
+            run.skipped_models.add("ft")
+            mock_e5.price.return_value = (140.0, 160.0)
+            result = agent.price("Acme laptop")
+
+    mock_ft.price.assert_not_called()
+    assert result == pytest.approx(151.0)
+    assert run.missing_predictions == {}
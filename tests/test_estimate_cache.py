@@ -0,0 +1,107 @@
+"""Test module for the persistent price-estimate cache."""
+
+import time
+from unittest.mock import patch
+
+import numpy as np
+
+from src.utils.estimate_cache import CachedEstimate, EstimateCache, description_hash
+
+ENTRY = CachedEstimate(ft=100.0, rag=110.0, xgb=120.0, estimate=112.5)
+
+
+def test_hit_on_normalized_description(tmp_path):
+    """Tests that case and whitespace variants share one entry."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"))
+    assert cache.get("Acme  Laptop", "v1") is None
+
+    cache.put("Acme  Laptop", "v1", ENTRY)
+
+    assert cache.get("  acme laptop\n", "v1") == ENTRY
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_model_versions_are_part_of_the_key(tmp_path):
+    """Tests that a new model version never serves an old estimate."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"))
+    cache.put("Acme laptop", "v1", ENTRY)
+
+    assert cache.get("Acme laptop", "v2") is None
+
+
+def test_entries_expire(tmp_path):
+    """Tests the TTL."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"), ttl_hours=1)
+    cache.put("Acme laptop", "v1", ENTRY)
+
+    with patch("src.utils.estimate_cache.time.time", return_value=time.time() + 7200):
+        assert cache.get("Acme laptop", "v1") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    """Tests that the cache stays within max_entries."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"), max_entries=2)
+    cache.put("first", "v1", ENTRY)
+    time.sleep(0.01)
+    cache.put("second", "v1", ENTRY)
+    time.sleep(0.01)
+    cache.get("first", "v1")
+    time.sleep(0.01)
+    cache.put("third", "v1", ENTRY)
+
+    assert len(cache) == 2
+    assert cache.get("second", "v1") is None
+    assert cache.get("first", "v1") == ENTRY
+
+
+def test_nearest_matches_by_embedding(tmp_path):
+    """Tests that a reworded description finds the closest stored embedding."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"))
+    laptop, phone = np.eye(4, dtype=np.float32)[:2]
+    cache.put("Acme laptop", "v1", ENTRY, embedding=laptop)
+    cache.put("Nova phone", "v1", CachedEstimate(None, None, 50.0, 50.0), phone)
+
+    query = np.array([0.99, 0.1, 0.0, 0.0], dtype=np.float32)
+    entry, similarity = cache.nearest(query / np.linalg.norm(query), "v1")
+    assert entry == ENTRY
+    assert 0.99 < similarity < 1.0
+
+    # A new process reads the stored embeddings back
+    reopened = EstimateCache(cache.path)
+    assert reopened.nearest(phone, "v1") == (cache.get("Nova phone", "v1"), 1.0)
+    assert reopened.nearest(phone, "v2") == (None, 0.0)
+
+
+def test_nearest_index_follows_replacements_and_evictions(tmp_path):
+    """Tests that re-stored and evicted entries do not pile up in memory."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"), max_entries=3)
+    vectors = np.eye(8, dtype=np.float32)
+    cache.put("Acme laptop", "v1", ENTRY, embedding=vectors[0])
+    cache.nearest(vectors[0], "v1")  # Loads the in-process index
+
+    cache.put("Acme laptop", "v1", ENTRY, embedding=vectors[1])
+    assert cache._vectors["v1"].rows.keys() == {description_hash("Acme laptop")}
+    assert cache.nearest(vectors[1], "v1") == (ENTRY, 1.0)
+
+    for i in range(2, 8):
+        time.sleep(0.01)
+        cache.put(f"Item {i}", "v1", ENTRY, embedding=vectors[i])
+    assert len(cache._vectors["v1"].rows) == 3
+
+
+def test_nearest_skips_every_dead_neighbour(tmp_path):
+    """Tests that a live neighbour is found behind many expired ones."""
+    cache = EstimateCache(str(tmp_path / "estimates.sqlite3"), ttl_hours=1)
+    now = time.time()
+    close = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    with patch("src.utils.estimate_cache.time.time", return_value=now - 3000):
+        for i in range(5):
+            cache.put(f"Old item {i}", "v1", ENTRY, embedding=close)
+    fresh = CachedEstimate(None, None, 50.0, 50.0)
+    cache.put("Fresh item", "v1", fresh, embedding=np.array([0.0, 0.0, 1.0]))
+    assert cache.nearest(close, "v1") == (ENTRY, 1.0)
+
+    # The old items expire while still in the in-process index
+    with patch("src.utils.estimate_cache.time.time", return_value=now + 1000):
+        assert cache.nearest(close, "v1") == (fresh, 0.0)
+    assert len(cache._vectors["v1"].rows) == 1
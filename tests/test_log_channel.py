@@ -0,0 +1,126 @@
+"""Test module for the per-run log channel and its subscribers."""
+
+import os
+import threading
+import time
+
+import pytest
+
+from src.utils.log_channel import LogChannel
+
+MARKER = object()
+
+
+def test_subscribers_read_independently():
+    """Tests that every subscriber, even a late one, reads the whole log."""
+    channel = LogChannel()
+    first = channel.subscribe()
+    channel.put("a")
+    channel.put("b")
+    assert first.next_burst(0.1, 0.0) == (["a", "b"], False)
+
+    channel.put("c")
+    channel.close()
+    late = channel.subscribe()
+    assert late.next_burst(0.1, 0.0) == (["a", "b", "c"], True)
+    assert first.next_burst(0.1, 0.0) == (["c"], True)
+
+
+def test_burst_is_coalesced_until_urgent_marker():
+    """Tests that lines arriving together form one burst, cut by a marker."""
+    channel = LogChannel()
+    subscription = channel.subscribe()
+
+    def writer() -> None:
+        for line in ("one", "two", MARKER, "three"):
+            channel.put(line)
+            time.sleep(0.01)
+
+    threading.Thread(target=writer).start()
+    items, closed = subscription.next_burst(1.0, 5.0, urgent=(MARKER,))
+
+    assert items[:3] == ["one", "two", MARKER] and not closed
+
+
+def test_idle_channel_returns_nothing_after_timeout():
+    """Tests that a reader wakes up empty-handed when nothing is logged."""
+    subscription = LogChannel().subscribe()
+    start = time.monotonic()
+    assert subscription.next_burst(0.05, 1.0) == ([], False)
+    assert time.monotonic() - start < 0.5
+
+
+@pytest.mark.parametrize("policy", ["drop-oldest", "summarize"])
+def test_ring_buffer_drops_oldest_lines(policy):
+    """Tests the bounded buffer and what a reader that fell behind gets."""
+    channel = LogChannel(capacity=3, policy=policy)
+    subscription = channel.subscribe()
+    for i in range(5):
+        channel.put(f"line {i}")
+
+    items, _ = subscription.next_burst(0.1, 0.0)
+
+    assert channel.dropped == 2
+    assert channel.lines() == ["line 2", "line 3", "line 4"]
+    expected = ["line 2", "line 3", "line 4"]
+    if policy == "summarize":
+        expected.insert(0, "… 2 log lines dropped (over the 3-line capacity)")
+    assert items == expected
+
+
+def test_full_log_spills_to_disk(tmp_path, monkeypatch):
+    """Tests that every line reaches the spill file, as plain text."""
+    monkeypatch.setenv("SNAPR_LOG_SPILL_DIR", str(tmp_path))
+    channel = LogChannel.for_run()
+    channel.capacity = 1
+    channel.put("<span style='color:red'>first &amp; foremost</span><br>")
+    channel.put("second")
+    channel.close()
+
+    assert channel.lines() == ["second"]
+    with open(channel.spill_path, encoding="utf-8") as f:
+        assert f.read() == "first & foremost\nsecond\n"
+
+
+def test_spill_file_is_created_on_first_line(tmp_path, monkeypatch):
+    """Tests that a channel nothing is logged to leaves no file behind."""
+    monkeypatch.setenv("SNAPR_LOG_SPILL_DIR", str(tmp_path))
+    channel = LogChannel.for_run()
+    channel.put(MARKER)
+    assert not os.path.exists(channel.spill_path)
+
+    channel.put("first")
+    assert os.path.exists(channel.spill_path)
+    channel.close()
+
+
+def test_old_spill_files_are_pruned(tmp_path, monkeypatch):
+    """Tests that spilled logs past their retention are deleted."""
+    monkeypatch.setenv("SNAPR_LOG_SPILL_DIR", str(tmp_path))
+    old, recent = tmp_path / "run-old.log", tmp_path / "run-recent.log"
+    for path in (old, recent):
+        path.write_text("line\n")
+    os.utime(old, (time.time() - 8 * 86400,) * 2)
+
+    LogChannel.prune_spills(max_age_days=7)
+
+    assert not old.exists() and recent.exists()
+
+
+def test_unknown_policy_is_rejected():
+    """Tests the policy validation."""
+    with pytest.raises(ValueError, match="overflow policy"):
+        LogChannel(policy="grow")
+
+
+def test_evicted_markers_are_not_counted_as_lines():
+    """Tests that only log lines are reported as dropped."""
+    channel = LogChannel(capacity=2, policy="summarize")
+    subscription = channel.subscribe()
+    for item in ("line 0", MARKER, MARKER, "line 1", "line 2"):
+        channel.put(item)
+
+    items, _ = subscription.next_burst(0.1, 0.0)
+
+    assert channel.dropped == 1
+    assert items[0] == "… 1 log lines dropped (over the 2-line capacity)"
@@ -1,10 +1,17 @@
 """Unit tests for the pipeline module."""
 
+import threading
+import time
 from unittest.mock import Mock, patch
 
+import gradio as gr
+
 from src.agents import pipeline
+from src.agents.base_agent import Agent
 from src.agents.pipeline import validate_categories
-from src.config.constants import MAX_CATEGORY_SELECTION
+from src.agents.run_context import RunContext, current_run
+from src.config.constants import MAX_CATEGORY_SELECTION, MAX_LOG_LINES
+from src.deals.structured_deals import Opportunity
 
 
 def test_validate_categories_none_selected():
@@ -66,43 +73,70 @@ def test_check_demo_restrictions_demo_on():
 
 
 def test_run_pipeline_success():
-    """Tests that run_pipeline handles deals without logging errors."""
-    mock_queue = Mock()
+    """Tests that run_pipeline stores the run's deals without logging errors."""
+    run = RunContext()
+    opportunity = Opportunity(product_description="Item A", price=10, url="http://item")
+
+    def plan(categories, deadline_s=None):
+        opportunity.estimate, opportunity.discount = 20.0, 10.0
+        current_run().add_result(opportunity)
+        return [opportunity]
 
     with (
         patch("src.agents.pipeline.delete_if_old"),
-        patch("src.agents.pipeline.PlanningAgent") as MockAgent,
+        patch.object(pipeline.planning_agents, "factory") as MockAgent,
+        patch.object(pipeline.planning_agents, "_agent", None),
     ):
-        # Mock PlanningAgent.plan() to return a list with one mock opportunity
-        mock_instance = Mock()
-        mock_instance.plan.return_value = [
-            Mock(
-                product_description="Item A",
-                price=10,
-                estimate=20,
-                discount=10,
-                url="http://item",
-            )
-        ]
-        MockAgent.return_value = mock_instance
+        MockAgent.return_value.plan.side_effect = plan
+
+        pipeline.run_pipeline(run, ["tech"])
+
+        rows = pipeline.deal_rows(run.results)
+        assert rows == [["Item A", "$10.00", "$20.00", "$10.00", "http://item"]]
+        assert run.logs.lines() == [] and run.error is None
 
-        pipeline.run_pipeline(mock_queue, ["tech"])
+        # The next run reuses the same agents
+        pipeline.run_pipeline(RunContext(), ["tech"])
+        MockAgent.assert_called_once()
 
-        assert isinstance(pipeline.accepted_deals, list)
-        assert len(pipeline.accepted_deals) == 1
-        assert "Item A" in pipeline.accepted_deals[0][0]
-        assert mock_queue.put.call_count == 0
+
+def test_failed_run_rebuilds_agents():
+    """Tests that a failing run drops the shared agents for the next run."""
+    run = RunContext()
+    broken, fresh = Mock(), Mock()
+    broken.plan.side_effect = RuntimeError("Modal handle is gone")
+    fresh.plan.return_value = []
+
+    with (
+        patch("src.agents.pipeline.delete_if_old"),
+        patch.object(pipeline.planning_agents, "factory", side_effect=[broken, fresh]),
+        patch.object(pipeline.planning_agents, "_agent", None),
+    ):
+        pipeline.run_pipeline(run, ["tech"])
+        assert run.error == "Modal handle is gone"
+        assert "Modal handle is gone" in run.logs.lines()[0]
+
+        pipeline.run_pipeline(RunContext(), ["tech"])
+        fresh.plan.assert_called_once_with(["tech"], deadline_s=None)
 
 
 def test_run_pipeline_threaded():
     """Tests that run_pipeline_threaded streams logs and updates the UI."""
-    # Patch run_pipeline so it doesn't actually run logic
-    with patch("src.agents.pipeline.run_pipeline"):
-        # Set up log queue and accepted deals
-        pipeline.log_queue.queue.clear()
-        pipeline.log_queue.put("Processing...")
-        pipeline.accepted_deals = [["desc", "$10", "$20", "$10", "url"]]
 
+    def fake_run(run, categories, deadline_s):
+        run.log("Processing...")
+        run.add_result(
+            Opportunity(
+                product_description="desc",
+                price=10,
+                url="url",
+                estimate=20,
+                discount=10,
+            )
+        )
+
+    # Patch run_pipeline so it doesn't actually run logic
+    with patch("src.agents.pipeline.run_pipeline", side_effect=fake_run):
         # Call the generator and collect results
         updates = list(
             pipeline.run_pipeline_threaded(
@@ -115,9 +149,122 @@ def test_run_pipeline_threaded():
 
         # Assert updates contain expected log output
         assert any("Processing..." in html for html, *_ in updates)
+        assert "desc" in updates[-1][1]
         assert all(isinstance(update, tuple) and len(update) == 4 for update in updates)
 
 
+def test_stream_coalesces_bursts():
+    """Tests that a burst of lines gives one frame, and an idle run none."""
+
+    def fake_run(run, categories, deadline_s):
+        for i in range(20):
+            run.log(f"line {i}")
+        time.sleep(0.3)  # Longer than STREAM_COALESCE_S
+        run.log("last line")
+
+    with patch("src.agents.pipeline.run_pipeline", side_effect=fake_run):
+        updates = list(
+            pipeline.run_pipeline_threaded(["tech"], [], "Running...", "enabled")
+        )
+
+    assert len(updates) == 2  # The burst, then the final update
+    assert "line 19" in updates[0][0] and "last line" not in updates[0][0]
+    assert "last line" in updates[1][0] and updates[1][2] == "enabled"
+
+
+def test_session_log_stays_bounded():
+    """Tests that a session keeps only the lines it renders."""
+    log_data = []
+    view = pipeline.StreamView(log_data, RunContext())
+    view.add_logs([f"line {i}" for i in range(MAX_LOG_LINES * 3)])
+
+    assert len(log_data) == MAX_LOG_LINES
+    assert log_data[-1] == f"line {MAX_LOG_LINES * 3 - 1}"
+
+
+def test_accepted_deal_is_shown_before_the_run_ends():
+    """Tests that the table shows a deal as soon as it is accepted."""
+    shown = threading.Event()
+
+    def fake_run(run, categories, deadline_s):
+        run.add_result(
+            Opportunity(
+                product_description="early deal",
+                price=1,
+                url="u",
+                estimate=90,
+                discount=89,
+            )
+        )
+        shown.wait(timeout=5)  # The run goes on until the deal is on screen
+
+    with patch("src.agents.pipeline.run_pipeline", side_effect=fake_run):
+        stream = pipeline.run_pipeline_threaded(["tech"], [], "Running...", "on")
+        first = next(stream)
+        assert "early deal" in first[1] and first[2] != "on"
+        shown.set()
+        assert list(stream)[-1][2] == "on"
+
+
+def test_stream_view_renders_only_on_change():
+    """Tests memoized rendering and no-op updates for unchanged components."""
+    run = RunContext()
+    view = pipeline.StreamView([], run)
+    with patch("src.agents.pipeline.html_for", wraps=pipeline.html_for) as html:
+        view.add_logs(["hello"])
+        logs, deals = view.update()
+        assert "hello" in logs and "deal-table" in deals
+
+        assert not view.changed
+        assert view.update() == (gr.update(), gr.update())
+        view.logs_html()
+        assert html.call_count == 1
+
+        run.results.append(
+            Opportunity(
+                product_description="desc", price=1, url="u", estimate=2, discount=1
+            )
+        )
+        logs, deals = view.update()
+        assert logs == gr.update() and "desc" in deals
+
+
+def test_concurrent_runs_keep_their_own_logs_and_deals():
+    """Tests that two sessions running at once do not see each other's output."""
+    barrier = threading.Barrier(2)
+
+    def plan(categories, deadline_s=None):
+        barrier.wait(timeout=5)  # Both runs are in flight together
+        Agent().log(f"scanning {categories[0]}")
+        deal = Opportunity(
+            product_description=categories[0],
+            price=10,
+            url=categories[0],
+            estimate=100,
+            discount=90,
+        )
+        current_run().add_result(deal)
+        return [deal]
+
+    agent = Mock(plan=Mock(side_effect=plan))
+    runs = {"tech": RunContext(), "home": RunContext()}
+    with (
+        patch("src.agents.pipeline.delete_if_old"),
+        patch.object(pipeline.planning_agents, "get", return_value=agent),
+    ):
+        futures = [
+            pipeline.run_pool.submit(pipeline.run_pipeline, run, [category])
+            for category, run in runs.items()
+        ]
+        for future in futures:
+            future.result(timeout=10)
+
+    for category, run in runs.items():
+        assert [deal.url for deal in run.results] == [category]
+        lines = run.logs.lines()
+        assert len(lines) == 1 and f"scanning {category}" in lines[0]
+
+
 def test_handle_pipeline_error():
     """Tests that handle_pipeline_error logs the exception and updates the UI."""
     logs = []
@@ -160,3 +307,69 @@ def test_run_and_stream_logs_demo_blocked():
         assert "Blocked" in result[0][0]  # Message is in the rendered log
         assert result[0][2]["interactive"] is True
         assert result[0][3] == "Blocked"  # Status message
+
+
+def test_identical_scan_shares_the_run_and_spares_a_demo_run():
+    """Tests that a duplicate request streams the same run, uncounted."""
+
+    def fake_run(run, categories, deadline_s):
+        run.log(f"scanning {categories}")
+
+    coalescer = pipeline.ScanCoalescer(pipeline.start_run)
+    with (
+        patch("src.agents.pipeline.run_pipeline", side_effect=fake_run) as mock_run,
+        patch.object(pipeline, "scan_coalescer", coalescer),
+        patch(
+            "src.agents.pipeline.check_demo_restrictions",
+            return_value=(True, None, "4 runs left"),
+        ) as mock_demo,
+        patch("src.agents.pipeline.IS_DEMO_VERSION", True),
+    ):
+        first = list(pipeline.run_and_stream_logs(["Electronics", "Computers"]))
+        second = list(pipeline.run_and_stream_logs(["Computers", "Electronics"]))
+
+    mock_run.assert_called_once()
+    mock_demo.assert_called_once()
+    assert first[-1][3] == "4 runs left"
+    assert "identical scan" in second[-1][3] and "not counted" in second[-1][3]
+    assert "scanning" in second[-1][0]
+
+
+def test_shared_scan_status_reports_degradations():
+    """Tests that a shared run says what it gave up to meet its deadline."""
+    run = RunContext(logs=None)
+    assert "deadline" not in pipeline.shared_scan_status("joined", 0, run)
+
+    run.degrade("scanned at most 3 deals per feed")
+    status = pipeline.shared_scan_status("cached", 12, run)
+
+    assert "from 12s ago" in status
+    assert "to meet its deadline: scanned at most 3 deals per feed" in status
+
+
+def test_start_warmup_is_throttled():
+    """Tests that repeated UI events start a single background warm-up."""
+    agent = Mock()
+    with (
+        patch("src.agents.pipeline.can_run_app", return_value=(True, "")),
+        patch.object(pipeline, "_last_warmup", float("-inf")),
+        patch.object(pipeline.planning_agents, "get", return_value=agent),
+        patch("src.agents.pipeline.threading.Thread") as MockThread,
+    ):
+        MockThread.side_effect = lambda target, daemon: Mock(start=target)
+        pipeline.start_warmup()
+        pipeline.start_warmup()
+
+    agent.warmup.assert_called_once()
+
+
+def test_start_warmup_skipped_when_app_cannot_run():
+    """Tests that no containers are started once the demo limit is reached."""
+    with (
+        patch("src.agents.pipeline.can_run_app", return_value=(False, "Limit")),
+        patch.object(pipeline, "_last_warmup", float("-inf")),
+        patch("src.agents.pipeline.threading.Thread") as MockThread,
+    ):
+        pipeline.start_warmup()
+
+    MockThread.assert_not_called()
@@ -6,6 +6,8 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from src.agents.planning_agent import PlanningAgent
+from src.agents.run_context import run_scope
+from src.config.constants import BUDGET_DEALS_PER_FEED
 from src.deals.structured_deals import Opportunity
 
 
@@ -56,6 +58,8 @@ def test_plan_flow(
     # Mock ensemble to return a higher market price → discount = 80
     mock_ensemble = MagicMock()
     mock_ensemble.price.return_value = 180.0
+    mock_ensemble.cascade = False
+    mock_ensemble.cache_report.return_value = None
     mock_ensemble_cls.return_value = mock_ensemble
 
     agent = PlanningAgent()
@@ -68,12 +72,88 @@ def test_plan_flow(
     assert enriched.estimate == 180.0
 
     # Ensure calls were made correctly
-    mock_scanner.scan.assert_called_once_with(["tech", "home"])
-    mock_ensemble.price.assert_called_once_with(fake_opportunity.product_description)
+    mock_scanner.scan.assert_called_once_with(
+        ["tech", "home"], max_per_feed=None, fetch_details=True
+    )
+    mock_ensemble.price.assert_called_once_with(
+        fake_opportunity.product_description, listed_price=fake_opportunity.price
+    )
     mock_save_memory.assert_called_once()
     assert len(mock_save_memory.call_args[0][0]) == 1
 
 
+@patch("src.agents.planning_agent.save_opportunities_to_memory")
+@patch("src.agents.planning_agent.EnsemblePriceAgent")
+@patch("src.agents.planning_agent.DealScannerAgent")
+def test_plan_degrades_to_meet_deadline(
+    mock_scanner_cls: MagicMock,
+    mock_ensemble_cls: MagicMock,
+    mock_save_memory: MagicMock,
+) -> None:
+    """Tests a run with almost no time left: every degradation applies."""
+    deals = [
+        Opportunity(product_description=f"Deal {i}", price=100.0, url=f"url{i}")
+        for i in range(2)
+    ]
+    mock_scanner_cls.return_value.scan.return_value.opportunities = deals
+    mock_ensemble = mock_ensemble_cls.return_value
+    mock_ensemble.cascade = False
+    mock_ensemble.cache_report.return_value = None
+    mock_ensemble.missing_predictions = {}
+    mock_ensemble.ft_agent.is_warm.return_value = False
+    mock_ensemble.cached_price.side_effect = [180.0, None]  # Second one uncached
+
+    agent = PlanningAgent()
+    with run_scope() as run:
+        results = agent.plan(categories=["tech"], deadline_s=2.0)
+
+    mock_scanner_cls.return_value.scan.assert_called_once_with(
+        ["tech"], max_per_feed=BUDGET_DEALS_PER_FEED, fetch_details=False
+    )
+    mock_ensemble.price.assert_not_called()
+    assert [opp.estimate for opp in results] == [180.0]
+    assert run.skipped_models == {"ft"}
+    assert run.degradations == [
+        f"scanned at most {BUDGET_DEALS_PER_FEED} deals per feed",
+        "described deals from the RSS summaries, not their pages",
+        "skipped the fine-tuned LLM (cold)",
+        "priced the last deals from the estimate cache only",
+        "left 1/2 deals unpriced",
+    ]
+
+
+@patch("src.agents.planning_agent.save_opportunities_to_memory")
+@patch("src.agents.planning_agent.EnsemblePriceAgent")
+@patch("src.agents.planning_agent.DealScannerAgent")
+def test_plan_reports_each_accepted_deal(
+    mock_scanner_cls: MagicMock,
+    mock_ensemble_cls: MagicMock,
+    mock_save_memory: MagicMock,
+) -> None:
+    """Tests that accepted deals are streamed one by one as they are priced."""
+    deals = [
+        Opportunity(product_description=f"Deal {i}", price=100.0, url=f"url{i}")
+        for i in range(3)
+    ]
+    mock_scanner_cls.return_value.scan.return_value.opportunities = deals
+    mock_ensemble = mock_ensemble_cls.return_value
+    mock_ensemble.cascade = False
+    mock_ensemble.cache_report.return_value = None
+    mock_ensemble.missing_predictions = {}
+    mock_ensemble.price.side_effect = [200.0, 110.0, 300.0]  # Second is rejected
+
+    seen = []
+    agent = PlanningAgent()
+    with run_scope() as run:
+        results = agent.plan(
+            categories=["tech"],
+            on_deal=lambda opp: seen.append((opp.url, len(run.results))),
+        )
+
+    assert seen == [("url0", 1), ("url2", 2)]
+    assert run.results == results
+
+
 @patch("src.agents.planning_agent.DealScannerAgent")
 def test_no_deals_found(mock_scanner_cls: MagicMock) -> None:
     """Tests that an empty result is returned when scanner finds nothing."""
@@ -0,0 +1,95 @@
+"""Test module for the RAG pricing service and its kNN fast path."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.modal_services.rag_pricer import RAGService, knn_price, parse_batch_prices
+from src.modal_services.stand_ins import apply_stand_ins, synthetic_catalog
+
+
+def _stand_in_service() -> RAGService:
+    service = RAGService()
+    apply_stand_ins("RAGPricer", service)
+    service.llm = MagicMock(side_effect=service.llm)
+    return service
+
+
+def test_knn_price_is_similarity_weighted():
+    """Tests the weighted average when the neighbours agree."""
+    assert knn_price([100.0, 110.0], [0.9, 0.9]) == pytest.approx(105.0)
+    assert knn_price([100.0, 110.0], [0.9, 0.0], min_similarity=0.0) == 100.0
+
+
+@pytest.mark.parametrize(
+    ("prices", "similarities"),
+    [
+        ([100.0, 300.0, 120.0], [0.95, 0.95, 0.95]),  # Prices disagree
+        ([100.0, 101.0, 99.0], [0.95, 0.95, 0.6]),  # One neighbour too far
+        ([], []),
+    ],
+)
+def test_knn_price_falls_back(prices, similarities):
+    """Tests that dispersed or distant neighbours defer to the LLM."""
+    assert knn_price(prices, similarities) is None
+
+
+@pytest.mark.parametrize("agree", [True, False])
+def test_fast_mode_calls_llm_only_when_neighbours_disagree(agree):
+    """Tests that the fast path skips the LLM call for tight neighbours."""
+    service = _stand_in_service()
+    service.rag_mode = "fast"
+    service.llm = MagicMock(return_value="42.00")
+    prices = [100.0, 102.0, 98.0] if agree else [100.0, 400.0, 20.0]
+    service._find_similar_items = MagicMock(
+        return_value=(["a", "b", "c"], prices, [0.95, 0.93, 0.9])
+    )
+
+    price = service.price("Acme wireless laptop")
+
+    assert service.llm.called != agree
+    assert price == (pytest.approx(100.0, abs=1.0) if agree else 42.0)
+
+
+@pytest.mark.parametrize(
+    ("reply", "expected"),
+    [
+        ('{"prices": [10, 20.5]}', [10.0, 20.5]),
+        ("[10, 20.5]", [10.0, 20.5]),
+        ('{"prices": [10]}', None),  # Wrong length
+        ('{"prices": [10, "20"]}', None),
+        ("Price is $10", None),
+    ],
+)
+def test_parse_batch_prices(reply, expected):
+    """Tests parsing and validation of batched replies."""
+    assert parse_batch_prices(reply, 2) == expected
+
+
+def test_batched_prompts_match_single_item_prices():
+    """Tests that N products are priced in one call, with the same results."""
+    service = _stand_in_service()
+    descriptions, _ = synthetic_catalog(6, seed=1)
+    embeddings = service.normalize(service.encode(descriptions))
+
+    batched = service.predict_rag_batch(descriptions, embeddings, batch_size=4)
+    assert service.llm.call_count == 2  # 4 + 2 products
+
+    singles = [service.predict_rag(d, e) for d, e in zip(descriptions, embeddings)]
+    assert batched == pytest.approx(singles)
+
+
+def test_unparseable_batch_falls_back_to_single_items():
+    """Tests the per-item fallback when the batched reply is malformed."""
+    service = _stand_in_service()
+    answer = service.llm.side_effect
+    service.llm.side_effect = lambda messages: (
+        "not json" if "### Product" in messages[1]["content"] else answer(messages)
+    )
+    descriptions, _ = synthetic_catalog(3, seed=1)
+    embeddings = service.normalize(service.encode(descriptions))
+
+    prices = service.predict_rag_batch(descriptions, embeddings, batch_size=3)
+
+    assert service.llm.call_count == 4  # 1 batched + 3 single-item retries
+    assert all(price > 0 for price in prices)
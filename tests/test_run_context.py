@@ -0,0 +1,38 @@
+"""Test module for per-run state kept apart from the shared agents."""
+
+import threading
+from unittest.mock import patch
+
+from src.agents.ensemble_price_agent import EnsemblePriceAgent
+from src.agents.run_context import RunContext, current_run, run_scope
+
+
+def test_first_call_is_per_run():
+    """Tests that each run announces a service once."""
+    with run_scope() as run:
+        assert run.first_call("FTPrice Agent")
+        assert not run.first_call("FTPrice Agent")
+    with run_scope():
+        assert current_run().first_call("FTPrice Agent")
+
+
+def test_concurrent_runs_keep_separate_stats():
+    """Tests that a shared agent counts cascade decisions per run thread."""
+    with patch.object(EnsemblePriceAgent, "log"):
+        agent = EnsemblePriceAgent(backend="local")
+    runs = [RunContext(), RunContext()]
+    outside = agent.cascade_stats["priced"]
+
+    def run(context: RunContext, deals: int) -> None:
+        with run_scope(context):
+            for _ in range(deals):
+                agent.cascade_stats["priced"] += 1
+
+    threads = [threading.Thread(target=run, args=(c, n)) for c, n in zip(runs, (2, 3))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [c.cascade_stats["priced"] for c in runs] == [2, 3]
+    assert agent.cascade_stats["priced"] == outside  # Untouched outside the runs
@@ -0,0 +1,128 @@
+"""Test module for the headless scan job API."""
+
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.agents import pipeline
+from src.agents.coalescer import ScanCoalescer
+from src.api import scans
+from src.deals.structured_deals import Opportunity
+
+
+def fake_run(run, categories, deadline_s):
+    """A run that logs one line and accepts one deal."""
+    run.log("<span style='color:cyan'>[Planning Agent] scanning &amp; pricing</span>")
+    run.add_result(
+        Opportunity(
+            product_description="Acme laptop",
+            price=500.0,
+            url="https://example.com/laptop",
+            estimate=800.0,
+            discount=300.0,
+        )
+    )
+
+
+@pytest.fixture
+def client():
+    """API client with stubbed runs and a fresh coalescer."""
+    app = FastAPI()
+    app.include_router(scans.router)
+    with (
+        patch("src.agents.pipeline.run_pipeline", side_effect=fake_run),
+        patch.object(pipeline, "scan_coalescer", ScanCoalescer(pipeline.start_run)),
+        patch(
+            "src.agents.pipeline.check_demo_restrictions",
+            return_value=(True, None, ""),
+        ),
+        patch.dict(scans._jobs, clear=True),
+    ):
+        yield TestClient(app)
+
+
+def _events(body: str):
+    """Parse a server-sent events body into (event, data) pairs."""
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n")
+        yield name.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+def test_submit_stream_and_fetch(client):
+    """Tests a scan job from submission to its final JSON results."""
+    response = client.post("/api/scans", json={"categories": ["Electronics"]})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["source"] == "new"
+
+    with client.stream("GET", job["events_url"]) as stream:
+        assert stream.headers["content-type"].startswith("text/event-stream")
+        events = list(_events(stream.read().decode()))
+
+    assert events[0] == ("log", {"line": "[Planning Agent] scanning & pricing"})
+    assert events[1][0] == "deal" and events[1][1]["discount"] == 300.0
+    assert events[-1][0] == "done" and events[-1][1]["status"] == "done"
+
+    final = client.get(f"/api/scans/{job['id']}").json()
+    assert [deal["url"] for deal in final["deals"]] == ["https://example.com/laptop"]
+
+
+def test_identical_submission_shares_the_job_run(client):
+    """Tests that a second identical scan is served by the first run."""
+    first = client.post("/api/scans", json={"categories": ["Electronics"]}).json()
+    client.get(first["events_url"])  # Wait for the run to finish
+    second = client.post("/api/scans", json={"categories": ["Electronics"]}).json()
+
+    assert second["id"] != first["id"]
+    assert second["source"] == "cached"
+    assert second["status"] == "done" and len(second["deals"]) == 1
+
+
+def test_invalid_and_unknown_jobs(client):
+    """Tests the error responses."""
+    assert client.post("/api/scans", json={"categories": []}).status_code == 422
+    assert client.get("/api/scans/nope").status_code == 404
+    assert client.get("/api/scans/nope/events").status_code == 404
+
+
+def test_full_log_download(client, tmp_path, monkeypatch):
+    """Tests the post-mortem download of a job's spilled log."""
+    monkeypatch.setenv("SNAPR_LOG_SPILL_DIR", str(tmp_path))
+    job = client.post("/api/scans", json={"categories": ["Computers"]}).json()
+    client.get(job["events_url"])  # Wait for the run to finish
+
+    response = client.get(job["log_url"])
+    assert response.status_code == 200
+    assert response.text == "[Planning Agent] scanning & pricing\n"
+
+
+def test_failing_run_reports_failed_only_after_its_last_line(client):
+    """Tests submit → events → done for a run that fails mid-way."""
+    failed = threading.Event()
+    release = threading.Event()
+
+    def failing_run(run, categories, deadline_s):
+        run.log("scanning")
+        run.error = "OpenAI is down"
+        failed.set()
+        release.wait(5)
+        run.log("❌ Error during pipeline execution: OpenAI is down")
+
+    with patch("src.agents.pipeline.run_pipeline", side_effect=failing_run):
+        job = client.post("/api/scans", json={"categories": ["Automotive"]}).json()
+        assert failed.wait(5)
+        assert client.get(f"/api/scans/{job['id']}").json()["status"] == "running"
+
+        release.set()
+        with client.stream("GET", job["events_url"]) as stream:
+            events = list(_events(stream.read().decode()))
+
+    assert [name for name, _ in events] == ["log", "log", "done"]
+    assert events[1][1]["line"].endswith("OpenAI is down")
+    assert events[2][1]["status"] == "failed"
+    assert events[2][1]["error"] == "OpenAI is down"
+    assert client.get(f"/api/scans/{job['id']}").json()["status"] == "failed"
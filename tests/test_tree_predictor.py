@@ -0,0 +1,69 @@
+"""Test module for the XGBoost inference engines."""
+
+from unittest.mock import patch
+
+import numpy as np
+
+from src.modal_services.tree_predictor import (
+    InplacePredictor,
+    SklearnPredictor,
+    as_rows,
+)
+from src.modal_services.xgb_pricer import XGBModelBase
+
+
+class FakeBooster:
+    """Records the arrays passed to `inplace_predict`."""
+
+    def __init__(self):
+        self.inputs = []
+
+    def inplace_predict(self, rows):
+        self.inputs.append(rows)
+        return rows.sum(axis=1) - 1.0
+
+
+class FakeRegressor:
+    """Stands in for the unpickled scikit-learn `XGBRegressor`."""
+
+    def __init__(self):
+        self.booster = FakeBooster()
+
+    def get_booster(self):
+        return self.booster
+
+    def predict(self, rows):
+        return rows.sum(axis=1)
+
+
+def test_as_rows_is_contiguous_float32():
+    """Tests that single vectors and strided views become float32 rows."""
+    rows = as_rows(np.arange(6, dtype=np.float64))
+    assert rows.shape == (1, 6) and rows.dtype == np.float32
+
+    strided = np.ones((4, 6), dtype=np.float32)[:, ::2]
+    assert as_rows(strided).flags["C_CONTIGUOUS"]
+
+
+def test_predict_xgb_uses_inplace_predict_and_clamps():
+    """Tests the default engine: booster in-place prediction, batch-friendly."""
+    base = XGBModelBase()
+    base.model = FakeRegressor()
+    base.predictor = base._load_predictor("inplace")
+
+    vectors = np.array([[1.0, 2.0], [0.25, 0.25]], dtype=np.float64)
+
+    assert isinstance(base.predictor, InplacePredictor)
+    assert base.predict_xgb(vectors) == [2.0, 0.0]
+    assert base.model.booster.inputs[0].dtype == np.float32
+
+
+def test_compiled_engine_falls_back_to_inplace():
+    """Tests that a failed compile falls back to in-place prediction."""
+    base = XGBModelBase()
+    base.model = FakeRegressor()
+    with patch.object(
+        XGBModelBase, "_load_compiled_predictor", side_effect=ImportError("tl2cgen")
+    ):
+        assert isinstance(base._load_predictor("compiled"), InplacePredictor)
+    assert isinstance(base._load_predictor("sklearn"), SklearnPredictor)
@@ -0,0 +1,93 @@
+"""Test module for FlatVectorIndex."""
+
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from src.modal_services.vector_index import FlatVectorIndex
+
+
+def _normalized(rng: np.random.Generator, n: int, dim: int = 16) -> np.ndarray:
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def data():
+    """Random normalized embeddings with prices and documents."""
+    rng = np.random.default_rng(0)
+    embeddings = _normalized(rng, 200)
+    prices = rng.uniform(1, 500, 200).astype(np.float32)
+    documents = [f"Item {i} — café edition" for i in range(200)]
+    return embeddings, prices, documents
+
+
+def _brute_force(embeddings, query, k):
+    return list(np.argsort(-(embeddings @ query))[:k])
+
+
+def test_query_matches_brute_force(tmp_path, data):
+    """Tests exact top-k retrieval from a memory-mapped float32 index."""
+    embeddings, prices, documents = data
+    FlatVectorIndex.export(str(tmp_path), embeddings, prices, documents)
+    index = FlatVectorIndex.load(str(tmp_path))
+
+    query = embeddings[42] * 0.9 + embeddings[7] * 0.1
+    docs, found_prices, scores = index.query(query, k=5)
+
+    expected = _brute_force(embeddings, query, 5)
+    assert docs == [documents[i] for i in expected]
+    assert found_prices == pytest.approx([prices[i] for i in expected])
+    assert scores == sorted(scores, reverse=True)
+    assert isinstance(index.embeddings, np.memmap)
+
+
+def test_float16_index_and_batch_queries(tmp_path, data):
+    """Tests that a float16 index and batched queries return the same neighbours."""
+    embeddings, prices, documents = data
+    FlatVectorIndex.export(str(tmp_path), embeddings, prices, documents, "float16")
+    index = FlatVectorIndex.load(str(tmp_path))
+    assert index.embeddings.dtype == np.float16
+
+    queries = embeddings[:10]
+    batched = index.query_batch(queries, k=3, block=4)
+    single = [index.query(q, k=3) for q in queries]
+
+    assert [b[0] for b in batched] == [s[0] for s in single]
+    assert [b[0][0] for b in batched] == documents[:10]
+
+
+def test_export_from_chroma_pages_collection(tmp_path, data):
+    """Tests that a Chroma collection is exported page by page."""
+    embeddings, prices, documents = data
+    collection = MagicMock()
+    collection.count.return_value = len(documents)
+
+    def get(include, limit, offset):
+        rows = slice(offset, offset + limit)
+        return {
+            "embeddings": embeddings[rows].tolist(),
+            "documents": documents[rows],
+            "metadatas": [{"price": float(p)} for p in prices[rows]],
+        }
+
+    collection.get.side_effect = get
+    FlatVectorIndex.export_from_chroma(collection, str(tmp_path), batch_size=64)
+    index = FlatVectorIndex.load(str(tmp_path), mmap=False)
+
+    assert collection.get.call_count == 4
+    assert len(index) == 200
+    assert index.document(199) == documents[199]
+    assert index.query(embeddings[150], k=1)[0] == [documents[150]]
+
+
+def test_export_from_empty_chroma_collection_fails(tmp_path):
+    """Tests that an empty collection is rejected before any file is written."""
+    collection = MagicMock()
+    collection.name = "price_items"
+    collection.count.return_value = 0
+
+    with pytest.raises(ValueError, match="'price_items' is empty"):
+        FlatVectorIndex.export_from_chroma(collection, str(tmp_path / "index"))
+    assert not (tmp_path / "index").exists()